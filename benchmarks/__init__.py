@@ -0,0 +1,5 @@
+"""
+The benchmark suite of the voting engine (see run.py): micro kernels, single manipulation moves and full voting
+iterations on fixed and seeded synthetic profiles, compared against a stored baseline, and a replay that checks the
+optimized paths against the reference implementation.
+"""
@@ -0,0 +1,171 @@
+"""
+This module includes the benchmark cases. A case is a dict with its name, its group ('kernels', 'moves' or
+'iterations'), the parameters it runs with and the function that is timed. The cases of full voting iterations also
+have an outcome (convergence, number of rounds and final winner, or "hard_exit"), which is compared with the one of
+the baseline like the timings. Every call starts from the same random state, so the outcomes of the same code on the
+same profiles never change.
+"""
+
+import random
+from typing import Callable, Iterator, List, Tuple
+
+import numpy as np
+
+from benchmarks import reference
+from main.data_processing import check_transitivity, evaluate_profile, get_score_of_alternative_by_voter, stack_profile
+from main.manipulation import Manipulation
+from main.electorate import large_electorate_iteration
+from main.manipulation_utils import one_cost_children_generation, two_cost_children_generation
+from main.orchestration import voting_iteration
+from main.profile import Profile
+from main.search import ManipulationSearch
+from main.transitivity import check_transitivity_batch
+
+GROUPS = ['kernels', 'moves', 'iterations']
+SEARCHES = {'astar_oracle': ('astar', True), 'astar': ('astar', False), 'levels': ('levels', False)}  # (search,
+# use_oracle) of Manipulation and voting_iteration
+ITERATIONS = {'voting_iteration': voting_iteration, 'large_electorate_iteration': large_electorate_iteration}
+MAX_REFERENCE_VOTERS = 100  # the pandas reference kernels only run on profiles with at most this many voters
+MAX_MOVE_VOTERS = 10  # the moves (and the children generators) only run for the first voters of a profile
+TIME_LIMIT = 600
+
+
+def get_rules(num_alt: int) -> List[Tuple[str, int]]:
+    """
+    The (method, k) rules of the paper: k = 1 and k = m - 1 under both methods.
+    """
+    return [(method, k) for k in sorted({1, num_alt - 1}) for method in ['approval', 'veto']]
+
+
+def seeded(function: Callable, seed: int = 0) -> Callable:
+    def seeded_function():
+        random.seed(seed)
+        np.random.seed(seed)
+        return function()
+    return seeded_function
+
+
+def get_case(name: str, group: str, profile: dict, function: Callable, **params) -> dict:
+    return {
+        'name': f'{group}/{name}/{profile["name"]}' + ''.join(f'/{key}={value}' for key, value in params.items()),
+        'group': group,
+        'params': {'profile': profile['name'], 'num_alt': profile['num_alt'], 'num_voters': profile['num_voters'],
+                   **params},
+        'function': seeded(function)
+    }
+
+
+def get_kernel_cases(profile: dict) -> Iterator[dict]:
+    preferences = profile['preferences']
+    num_alt = len(preferences[0])
+    order = {i: i for i in range(num_alt)}
+    stacked = stack_profile(preferences)
+    yield get_case('check_transitivity', 'kernels', profile, lambda: [check_transitivity(p) for p in preferences])
+    yield get_case('check_transitivity_batch', 'kernels', profile, lambda: check_transitivity_batch(stacked))
+    yield get_case(
+        'get_score_of_alternative_by_voter', 'kernels', profile,
+        lambda: [get_score_of_alternative_by_voter(p, 'approval', 1, a) for p in preferences for a in range(num_alt)]
+    )
+    yield get_case('evaluate_profile', 'kernels', profile, lambda: evaluate_profile(preferences, 1, 'approval', order))
+    yield get_case('Profile.evaluate', 'kernels', profile,
+                   lambda: Profile(preferences).evaluate(1, 'approval', order))
+    if len(preferences) <= MAX_REFERENCE_VOTERS:
+        frames = [p.to_dataframe() for p in preferences]
+        yield get_case('reference.check_transitivity', 'kernels', profile,
+                       lambda: [reference.check_transitivity(frame) for frame in frames])
+        yield get_case(
+            'reference.get_score_of_alternative_by_voter', 'kernels', profile,
+            lambda: [reference.get_score_of_alternative_by_voter(f, 'approval', 1, a) for f in frames
+                     for a in range(num_alt)]
+        )
+        yield get_case('reference.evaluate_profile', 'kernels', profile,
+                       lambda: reference.evaluate_profile(frames, 1, 'approval', order))
+
+    parents = preferences[:MAX_MOVE_VOTERS]
+    p, w = num_alt - 1, 0
+    yield get_case('one_cost_children_generation', 'kernels', profile, lambda: [
+        one_cost_children_generation(
+            parent, 0, list(range(num_alt)), [p, w], index_of_p=p, index_of_w=w, rule='approval',
+            matrices_not_to_generate=set(), do_additions=True, do_omissions=True
+        ) for parent in parents
+    ])
+    yield get_case('two_cost_children_generation', 'kernels', profile, lambda: [
+        two_cost_children_generation(
+            parent, 0, list(range(num_alt)), [p, w], index_of_p=p, index_of_w=w, rule='approval',
+            matrices_not_to_generate=set(), do_flips=True
+        ) for parent in parents
+    ])
+    searches = [
+        ManipulationSearch(parent, np.zeros((1, num_alt), dtype=np.int64), 1, 'approval', True, True, True)
+        for parent in parents
+    ]
+    yield get_case('ManipulationSearch.children', 'kernels', profile, lambda: [
+        search.children(search.preference.successor_masks, search.counts(search.preference.successor_masks))
+        for search in searches
+    ])
+
+
+def run_moves(profile: Profile, method: str, k: int, search: str, use_oracle: bool) -> list:
+    """
+    The manipulation moves of the first voters on the truthful profile.
+    """
+    order = {i: i for i in range(len(profile[0]))}
+    winner, possible_winners, scores = profile.evaluate(k, method, order)
+    return [
+        Manipulation(profile, voter, profile, winner, possible_winners, scores, order, method, k, True, True, True,
+                     False, TIME_LIMIT, search=search, use_oracle=use_oracle).manipulation_move()
+        for voter in range(min(len(profile), MAX_MOVE_VOTERS))
+    ]
+
+
+def get_move_cases(profile: dict, searches: List[str]) -> Iterator[dict]:
+    truthful_profile = Profile.from_preferences(profile['preferences'])
+    for method, k in get_rules(profile['num_alt']):
+        for search_name in searches:
+            search, use_oracle = SEARCHES[search_name]
+            yield get_case(
+                'manipulation_move', 'moves', profile,
+                lambda method=method, k=k, search=search, use_oracle=use_oracle: run_moves(
+                    truthful_profile, method, k, search, use_oracle
+                ), method=method, k=k, search=search_name
+            )
+
+
+def get_outcome(result) -> list:
+    if result == 'hard_exit':
+        return ['hard_exit']
+    convergence_happened, res_dict = result
+    return [bool(convergence_happened), len(res_dict), int(res_dict[max(res_dict)][0]) if res_dict else None]
+
+
+def get_iteration_cases(profile: dict, searches: List[str], iterations: List[str]) -> Iterator[dict]:
+    preferences = profile['preferences']
+    order = {i: i for i in range(profile['num_alt'])}
+    for iteration_name in iterations:
+        for method, k in get_rules(profile['num_alt']):
+            for search_name in searches:
+                search, use_oracle = SEARCHES[search_name]
+                case = get_case(
+                    iteration_name, 'iterations', profile,
+                    lambda iteration=ITERATIONS[iteration_name], method=method, k=k, search=search,
+                    use_oracle=use_oracle: iteration(
+                        preferences, False, k, method, order, True, True, True, TIME_LIMIT, search=search,
+                        use_oracle=use_oracle
+                    ), method=method, k=k, search=search_name
+                )
+                case['outcome'] = get_outcome
+                yield case
+
+
+def get_cases(profiles: List[dict], groups: List[str], move_searches: List[str], iteration_searches: List[str],
+              iterations: List[str] = ('voting_iteration', )) -> List[dict]:
+    cases = []
+    for profile in profiles:
+        first_of_cell = profile['cell_index'] == 0
+        if 'kernels' in groups and first_of_cell:
+            cases += get_kernel_cases(profile)
+        if 'moves' in groups and first_of_cell:
+            cases += get_move_cases(profile, move_searches)
+        if 'iterations' in groups:
+            cases += get_iteration_cases(profile, iteration_searches, iterations)
+    return cases
@@ -0,0 +1,175 @@
+"""
+This module includes the equivalence replay: a full voting iteration runs on the optimized path (the given search,
+the oracle, the persistent profiles, ...) while every manipulation move it makes is recorded, and then the run is
+replayed round by round with the reference implementation (reference.py) and the reference searches:
+    - the new preference of the voter is transitive,
+    - the voter truthfully prefers the new winner to the old one,
+    - the reference scores of the profile give the same old and new winner of the round as the optimized ones,
+    - the A* search without the oracle makes the same alternative win with the same cost, and the original search
+      (search='levels') is never cheaper when it makes the same alternative win (it only makes the "useful" changes,
+      so it may also find no manipulation, or only one for another alternative),
+    - when the run converged, the A* search finds no manipulation for any voter of the final profile.
+Several manipulations can be equally cheap and any of them may be picked, so the replay checks what the reference
+implementation guarantees (winners, costs and rounds) rather than the exact preferences.
+"""
+
+import itertools
+import random
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks import reference
+from benchmarks.cases import ITERATIONS, SEARCHES, TIME_LIMIT, get_rules
+from main.data_processing import get_winners_from_scores
+from main.manipulation import Manipulation
+from main.manipulation_cache import ManipulationCache
+from main.oracle import get_cell_costs
+from main.preference import Preference
+from main.profile import Profile
+
+MAX_CONVERGENCE_CHECK_VOTERS = 100  # the final profile is only checked for profiles with at most this many voters
+
+
+class MoveRecorder(ManipulationCache):
+    """
+    A manipulation cache that never has the outcome of a move, so every move is made, and that keeps the outcomes of
+    all the moves in the order they were made.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.outcomes: List[Optional[Tuple[Preference, int]]] = []
+
+    def lookup(self, key: tuple) -> Tuple[bool, None]:
+        return False, None
+
+    def put(self, key: tuple, outcome: Optional[Tuple[Preference, int]]):
+        self.outcomes.append(outcome)
+
+
+def get_manipulation_cost(preference: Preference, new_preference: Preference) -> int:
+    cell_costs = get_cell_costs(True, True, True)
+    upper_rows, upper_columns = np.triu_indices(len(preference), 1)
+    old_cells = preference.matrix[upper_rows, upper_columns].astype(np.int64) + 1
+    new_cells = new_preference.matrix[upper_rows, upper_columns].astype(np.int64) + 1
+    return int(cell_costs[old_cells, new_cells].sum())
+
+
+def reference_move(profile: Profile, truthful_profile: Profile, voter: int, method: str, k: int,
+                   search: str) -> Optional[Tuple[int, int]]:
+    """
+    Returns:
+        (new_winner, cost) of the move of the voter with the given search (without the oracle), or None if the voter
+        cannot manipulate.
+    """
+    order = {i: i for i in range(len(profile[0]))}
+    winner, possible_winners, scores = profile.evaluate(k, method, order)
+    outcome = Manipulation(
+        profile, voter, truthful_profile, winner, possible_winners, scores, order, method, k, True, True, True, False,
+        TIME_LIMIT, search=search, use_oracle=False
+    ).manipulation_move()
+    assert outcome != 'hard_exit', 'the reference move took too long'
+    if outcome is None:
+        return None
+    return outcome[1], get_manipulation_cost(profile[voter], outcome[0][voter])
+
+
+def replay_run(profile: dict, method: str, k: int, search_name: str, seed: int = 0,
+               iteration_name: str = 'voting_iteration') -> Tuple[int, List[str]]:
+    """
+    Runs a voting iteration (voting_iteration or large_electorate_iteration, see cases.ITERATIONS) on the profile and
+    replays it with the reference implementation.
+
+    Returns:
+        (number of rounds replayed, the descriptions of everything the reference implementation does not agree with).
+    """
+    preferences = profile['preferences']
+    order = {i: i for i in range(profile['num_alt'])}
+    search, use_oracle = SEARCHES[search_name]
+    recorder = MoveRecorder()
+    random.seed(seed)
+    np.random.seed(seed)
+    result = ITERATIONS[iteration_name](preferences, False, k, method, order, True, True, True, TIME_LIMIT,
+                                        search=search, use_oracle=use_oracle, cache=recorder)
+    if result == 'hard_exit':
+        return 0, ['hard_exit']
+    convergence_happened, res_dict = result
+    moves = [outcome for outcome in recorder.outcomes if outcome is not None]
+    if len(moves) != len(res_dict):
+        return 0, [f'{len(moves)} manipulations were made in {len(res_dict)} rounds']
+
+    mismatches = []
+    truthful_profile = Profile.from_preferences(preferences)
+    profile = truthful_profile
+    truthful_frames = [p.to_dataframe() for p in preferences]
+    frames = list(truthful_frames)
+    # the reference scores are calculated once and then only updated with the ones of the preference that changed
+    scores = reference.find_sum_of_alternatives(frames, k, method, len(order))
+    old_winner = get_winners_from_scores(scores, order)[0]
+    for round_number in range(len(res_dict)):
+        new_winner, voter = res_dict[round_number]
+        new_preference, move_winner = moves[round_number]
+        where = f'round {round_number} (voter {voter})'
+        if profile.evaluate(k, method, order)[0] != old_winner:
+            mismatches.append(f'{where}: the winner is {profile.evaluate(k, method, order)[0]}, the reference scores '
+                              f'make {old_winner} win')
+        if move_winner != new_winner:
+            mismatches.append(f'{where}: the move made {move_winner} win, the round recorded {new_winner}')
+        if not reference.check_transitivity(new_preference.to_dataframe()):
+            mismatches.append(f'{where}: the new preference is not transitive')
+        if truthful_frames[voter].loc[new_winner, old_winner] != 1:
+            mismatches.append(f'{where}: the voter does not prefer {new_winner} to {old_winner}')
+        cost = get_manipulation_cost(profile[voter], new_preference)
+        cheapest = reference_move(profile, truthful_profile, voter, method, k, 'astar')
+        if cheapest != (new_winner, cost):
+            mismatches.append(f'{where}: (winner, cost) is {(new_winner, cost)}, the A* search gives {cheapest}')
+        original = reference_move(profile, truthful_profile, voter, method, k, 'levels')
+        if original is not None and original[0] == new_winner and original[1] < cost:
+            mismatches.append(f'{where}: (winner, cost) is {(new_winner, cost)}, the original search gives {original}')
+        profile = profile.with_preference(voter, new_preference)
+        new_frame = new_preference.to_dataframe()
+        for alternative in range(len(order)):
+            scores[str(alternative)] += (
+                reference.get_score_of_alternative_by_voter(new_frame, method, k, alternative) -
+                reference.get_score_of_alternative_by_voter(frames[voter], method, k, alternative)
+            )
+        frames[voter] = new_frame
+        old_winner = get_winners_from_scores(scores, order)[0]
+        if old_winner != new_winner:
+            mismatches.append(f'{where}: the reference scores make {old_winner} win instead of {new_winner}')
+
+    if convergence_happened and len(preferences) <= MAX_CONVERGENCE_CHECK_VOTERS:
+        checked = set()
+        for voter in range(len(preferences)):
+            situation = (profile.type_of(voter), truthful_profile.type_of(voter))
+            if situation in checked:
+                continue  # the voters with the same current and truthful preference make the same moves
+            checked.add(situation)
+            move = reference_move(profile, truthful_profile, voter, method, k, 'astar')
+            if move is not None:
+                mismatches.append(f'the run converged but voter {voter} can still make {move[0]} win')
+    return len(res_dict), mismatches
+
+
+def replay_runs(profiles: List[dict], search_names: List[str], seed: int = 0,
+                iteration_names: List[str] = ('voting_iteration', )) -> dict:
+    """
+    Replays the runs of all the profiles under all the rules of the paper.
+
+    Returns:
+        {'runs': number of runs replayed, 'rounds': number of rounds replayed, 'mismatches': {run: descriptions}}
+    """
+    summary = {'runs': 0, 'rounds': 0, 'mismatches': {}}
+    for profile in profiles:
+        for iteration_name, (method, k), search_name in itertools.product(
+            iteration_names, get_rules(profile['num_alt']), search_names
+        ):
+            rounds, mismatches = replay_run(profile, method, k, search_name, seed, iteration_name)
+            summary['runs'] += 1
+            summary['rounds'] += rounds
+            if mismatches:
+                summary['mismatches'][
+                    f'{profile["name"]}/{iteration_name}/method={method}/k={k}/search={search_name}'
+                ] = mismatches
+    return summary
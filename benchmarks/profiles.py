@@ -0,0 +1,68 @@
+"""
+This module includes the profiles that the benchmarks run on: the manual examples of data/testing_examples and a grid
+of synthetic profiles, generated with a seed derived from the root seed and the cell of the grid (like the datasets of
+main/dataset.py), so the same arguments always give the same profiles.
+"""
+
+import glob
+import re
+from typing import List
+
+import dill
+import numpy as np
+
+from main.data_generation import generate_profiles
+from main.dataset import DATA_TYPES, get_cell_seed
+from main.preference import Preference, as_preference
+
+MANUAL_EXAMPLES_PATTERN = 'data/testing_examples/profile_manual_example_*.pkl'
+DEFAULT_NUM_ALT = [3, 4, 5, 6]
+DEFAULT_NUM_VOTERS = [10, 100, 1000]
+
+
+def get_profile(name: str, preferences: List[Preference], cell_index: int = 0) -> dict:
+    """
+    A profile of the benchmarks: its name, its size and its preferences. cell_index is the number of the profile in
+    its cell of the grid (the kernels and the moves only run on the first profile of every cell).
+    """
+    return {
+        'name': name,
+        'num_alt': len(preferences[0]),
+        'num_voters': len(preferences),
+        'cell_index': cell_index,
+        'preferences': preferences
+    }
+
+
+def load_manual_examples(pattern: str = MANUAL_EXAMPLES_PATTERN) -> List[dict]:
+    profiles = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path, 'rb') as f:
+            graphs = dill.load(f)
+        number = re.search(r'(\d+)\.pkl$', path).group(1)
+        profiles.append(get_profile(f'manual_{number}', [as_preference(graph) for graph in graphs]))
+    return profiles
+
+
+def generate_synthetic_profiles(root_seed: int, num_alt: List[int], num_voters: List[int], data_types: List[str],
+                                complete_profiles: List[bool], profiles_per_cell: int) -> List[dict]:
+    profiles = []
+    for m in num_alt:
+        for n in num_voters:
+            for data_type in data_types:
+                assert data_type in DATA_TYPES
+                for complete in complete_profiles:
+                    rng = np.random.default_rng(get_cell_seed(root_seed, n, m, data_type, complete))
+                    cell = generate_profiles(rng, profiles_per_cell, n, m, data_type, complete)
+                    kind = 'complete' if complete else 'incomplete'
+                    for i, matrices in enumerate(cell):
+                        profiles.append(get_profile(
+                            f'{data_type}_{kind}_m{m}_n{n}_{i}', [Preference(matrix) for matrix in matrices], i
+                        ))
+    return profiles
+
+
+def get_benchmark_profiles(args) -> List[dict]:
+    return load_manual_examples() + generate_synthetic_profiles(
+        args.seed, args.num_alt, args.num_voters, args.data_type, args.complete_profiles, args.profiles_per_cell
+    )
@@ -0,0 +1,196 @@
+"""
+This is the entrypoint script of the benchmark suite. It times the cases of cases.py (micro kernels, manipulation
+moves and full voting iterations) on the manual examples and a seeded synthetic grid (see profiles.py), writes the
+results to a JSON file, compares them with a baseline and replays the runs against the reference implementation (see
+equivalence.py).
+
+E.g. of script calls (from the root of the repository):
+```
+ python -m benchmarks.run --save_baseline true
+ python -m benchmarks.run --num_alt 3 4 --num_voters 10 100 --groups kernels moves
+ ```
+A case is flagged as a regression when its best time is more than `--tolerance` (relative) slower than the one of the
+baseline, and as changed when its outcome (convergence, number of rounds and final winner of a voting iteration) is not
+the one of the baseline. The script exits with status 1 if there are regressions, changed outcomes or replayed runs that
+the reference implementation does not agree with. The timings of the baseline are only comparable on the same machine.
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+from typing import List
+
+import numpy as np
+from tqdm import tqdm
+
+from benchmarks.cases import GROUPS, ITERATIONS, SEARCHES, get_cases
+from benchmarks.equivalence import replay_runs
+from benchmarks.profiles import DEFAULT_NUM_ALT, DEFAULT_NUM_VOTERS, get_benchmark_profiles
+from main.dataset import DATA_TYPES
+from orchestration import str2bool
+
+RESULTS_DIR = 'benchmarks/results'
+BASELINE_PATH = 'benchmarks/baseline.json'
+MIN_TIMING_SECONDS = 0.05
+
+
+def time_case(case: dict, repeat: int) -> dict:
+    """
+    Runs the case once to warm up (e.g. to load the catalogues and the oracles) and then 'repeat' times. The fast cases
+    are called as many times per timing as it takes for the timing to last at least MIN_TIMING_SECONDS (like timeit),
+    and the seconds of a single call are kept.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):  # the engine prints its progress
+        start = time.perf_counter()
+        result = case['function']()
+        number = max(1, math.ceil(MIN_TIMING_SECONDS / max(time.perf_counter() - start, 1e-9)))
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                case['function']()
+            times.append((time.perf_counter() - start) / number)
+    timing = {
+        'group': case['group'],
+        'params': case['params'],
+        'best_seconds': min(times),
+        'median_seconds': float(np.median(times)),
+        'repeat': repeat,
+        'number': number
+    }
+    if 'outcome' in case:
+        timing['outcome'] = case['outcome'](result)
+    return timing
+
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def compare_with_baseline(cases: dict, baseline_cases: dict, tolerance: float) -> dict:
+    """
+    Returns:
+        The names of the cases that are regressions, improvements and changed outcomes, and the ones of the baseline
+        that did not run.
+    """
+    comparison = {'regressions': [], 'improvements': [], 'changed_outcomes': [], 'missing': []}
+    for name, baseline_case in baseline_cases.items():
+        if name not in cases:
+            comparison['missing'].append(name)
+            continue
+        case = cases[name]
+        ratio = case['best_seconds'] / max(baseline_case['best_seconds'], 1e-9)
+        case['baseline_ratio'] = ratio
+        if ratio > 1 + tolerance:
+            comparison['regressions'].append(name)
+        elif ratio < 1 / (1 + tolerance):
+            comparison['improvements'].append(name)
+        if 'outcome' in baseline_case and case.get('outcome') != baseline_case['outcome']:
+            comparison['changed_outcomes'].append(name)
+    return comparison
+
+
+def print_report(cases: dict, comparison: dict, equivalence: dict):
+    for name in comparison['regressions']:
+        print(f'REGRESSION {cases[name]["baseline_ratio"]:.2f}x {name}')
+    for name in comparison['changed_outcomes']:
+        print(f'CHANGED OUTCOME {name}: {cases[name].get("outcome")}')
+    for run, mismatches in equivalence.get('mismatches', {}).items():
+        for mismatch in mismatches:
+            print(f'NOT EQUIVALENT {run}: {mismatch}')
+    ratios = [case['baseline_ratio'] for case in cases.values() if 'baseline_ratio' in case]
+    if ratios:
+        print(f'{len(ratios)} cases compared with the baseline: {len(comparison["regressions"])} regressions, '
+              f'{len(comparison["improvements"])} improvements, {len(comparison["changed_outcomes"])} changed '
+              f'outcomes, geometric mean ratio {np.exp(np.mean(np.log(ratios))):.3f}')
+    if comparison['missing']:
+        print(f'{len(comparison["missing"])} cases of the baseline did not run')
+    if equivalence:
+        print(f'equivalence replay: {equivalence["runs"]} runs, {equivalence["rounds"]} rounds, '
+              f'{len(equivalence["mismatches"])} runs not equivalent')
+
+
+def main(args) -> int:
+    profiles = get_benchmark_profiles(args)
+    cases = get_cases(profiles, args.groups, args.move_searches, args.iteration_searches, args.iterations)
+    timings = {}
+    for case in tqdm(cases, desc='benchmarks'):
+        timings[case['name']] = time_case(case, args.repeat)
+
+    equivalence = {}
+    if args.replay:
+        with contextlib.redirect_stdout(io.StringIO()):
+            equivalence = replay_runs(
+                [profile for profile in profiles
+                 if profile['cell_index'] == 0 and profile['num_voters'] <= args.replay_max_voters],
+                args.iteration_searches, args.seed, args.iterations
+            )
+
+    comparison = {'regressions': [], 'improvements': [], 'changed_outcomes': [], 'missing': []}
+    if not args.save_baseline and os.path.isfile(args.baseline):
+        with open(args.baseline) as f:
+            comparison = compare_with_baseline(timings, json.load(f)['cases'], args.tolerance)
+
+    results = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'git_commit': get_git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'args': vars(args)
+        },
+        'cases': timings,
+        'comparison': comparison,
+        'equivalence': equivalence
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f'benchmarks_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+    )
+    for path in [output] + ([args.baseline] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=1)
+    print(f'results written to {output}' + (f' and {args.baseline}' if args.save_baseline else ''))
+    print_report(timings, comparison, equivalence)
+    failed = comparison['regressions'] or comparison['changed_outcomes'] or equivalence.get('mismatches')
+    return 1 if failed else 0
+
+
+def parse_args(arguments: List[str] = None):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--num_alt', type=int, nargs='+', default=DEFAULT_NUM_ALT)
+    parser.add_argument('--num_voters', type=int, nargs='+', default=DEFAULT_NUM_VOTERS)
+    parser.add_argument('--data_type', type=str, nargs='+', default=DATA_TYPES)
+    parser.add_argument('--complete_profiles', type=str2bool, nargs='+', default=[True, False])
+    parser.add_argument('--profiles_per_cell', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--groups', type=str, nargs='+', default=GROUPS, choices=GROUPS)
+    parser.add_argument('--move_searches', type=str, nargs='+', default=list(SEARCHES), choices=list(SEARCHES))
+    parser.add_argument('--iteration_searches', type=str, nargs='+', default=['astar_oracle'],
+                        choices=list(SEARCHES))
+    parser.add_argument('--iterations', type=str, nargs='+', default=['voting_iteration'], choices=list(ITERATIONS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--replay', type=str2bool, default=True)
+    parser.add_argument('--replay_max_voters', type=int, default=100)
+    parser.add_argument('--baseline', type=str, default=BASELINE_PATH)
+    parser.add_argument('--save_baseline', type=str2bool, default=False)
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--output', type=str, default=None)
+
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(parse_args()))
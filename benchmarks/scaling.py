@@ -0,0 +1,217 @@
+"""
+This is the scaling benchmark of the large-electorate mode (see main/electorate.py). It shows how the cost of a round
+of a voting iteration, apart from the manipulation move itself, grows with the number of voters in the default mode
+(voting_iteration) and in the large-electorate mode (large_electorate_iteration), in two ways:
+    - bookkeeping: the same seeded sequence of changes of preferences is applied to the profile of both modes, with
+      everything a round does besides the manipulation move (change the preference, find the winner, update the index
+      of the voters that cannot manipulate and draw the next voter),
+    - iterations: the full voting iterations with a tracer (see main/tracing.py), whose time without the manipulation
+      moves is divided by the number of moves. This includes the final round that finds the convergence, which looks
+      at every voter once in both modes. The default mode only runs up to `--max_default_voters` voters.
+
+The profiles are a small seeded synthetic profile (see profiles.py) plus balanced blocks of complete rankings (the m
+cyclic shifts of 0 > 1 > ... > m - 1), which add the same score to every alternative under every rule. So the voters
+of the small profile manipulate the large one just like the small one (and the voters of the blocks may manipulate
+too), which a large uniformly random profile, with its wide margins, would hardly let anyone do. The profiles are
+complete since the partial preferences of more than 6 alternatives are sampled by rejection, which is too slow for 10.
+
+E.g. of script call (from the root of the repository):
+```
+ python -m benchmarks.scaling --num_alt 5 8 10 --num_voters 1000 10000 100000
+ ```
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import random
+import time
+from typing import List
+
+import numpy as np
+
+from benchmarks.cases import ITERATIONS, SEARCHES, get_rules
+from benchmarks.profiles import generate_synthetic_profiles
+from benchmarks.run import RESULTS_DIR, get_git_commit
+from main.data_processing import get_tie_breaking_ranks
+from main.dataset import DATA_TYPES
+from main.electorate import Electorate, SituationIndex
+from main.manipulability import ManipulabilityIndex
+from main.orchestration import select_new_random_voter
+from main.preference import Preference
+from main.profile import Profile
+from main.tracing import SearchTracer
+
+
+def get_ranking(order: List[int]) -> Preference:
+    """
+    The complete preference where order[0] is preferred to order[1], which is preferred to order[2] and so on.
+    """
+    matrix = -np.ones((len(order), len(order)), dtype=np.int8)
+    for position, alternative in enumerate(order):
+        matrix[alternative, order[position + 1:]] = 1
+    np.fill_diagonal(matrix, 0)
+    return Preference(matrix)
+
+
+def get_scaling_profile(root_seed: int, num_alt: int, num_voters: int, data_type: str,
+                        base_voters: int) -> List[Preference]:
+    """
+    A synthetic complete profile of base_voters voters plus as many blocks of the cyclic rankings as fit in
+    num_voters voters (see above).
+    """
+    base = generate_synthetic_profiles(root_seed, [num_alt], [base_voters], [data_type], [True], 1)[0]['preferences']
+    cyclic_rankings = [get_ranking([(shift + i) % num_alt for i in range(num_alt)]) for shift in range(num_alt)]
+    return base + cyclic_rankings * ((num_voters - base_voters) // num_alt)
+
+
+def time_bookkeeping(preferences: List[Preference], k: int, method: str, rounds: int, seed: int) -> dict:
+    """
+    The mean seconds per round of the bookkeeping of both modes (see above), for the same 'rounds' changes: a random
+    voter takes the truthful preference of another random voter.
+    """
+    num_voters = len(preferences)
+    alphabetical_order = {i: i for i in range(len(preferences[0]))}
+    rng = np.random.default_rng(seed)
+    changes = [(int(voter), preferences[int(other)]) for voter, other in rng.integers(num_voters, size=(rounds, 2))]
+    truthful_profile = Profile(preferences)
+
+    np.random.seed(seed)
+    profile = truthful_profile
+    index = ManipulabilityIndex(k, method, alphabetical_order, truthful_profile)
+    start = time.perf_counter()
+    for voter, pref in changes:
+        profile = profile.with_preference(voter, pref)
+        profile.evaluate(k, method, alphabetical_order)
+        index.update(profile)
+        select_new_random_voter(index, num_voters, voter)
+    default_seconds = (time.perf_counter() - start) / rounds
+
+    np.random.seed(seed)
+    electorate = Electorate(truthful_profile, k, method)
+    ranks = get_tie_breaking_ranks(alphabetical_order)
+    situations = SituationIndex(k, method, alphabetical_order, electorate, truthful_profile)
+    start = time.perf_counter()
+    for voter, pref in changes:
+        electorate.set_preference(voter, pref)
+        situations.move(voter)
+        winner, possible_winners = electorate.get_winners(ranks)
+        scores_of_alternatives = {  # as the iteration gives them to the manipulation moves
+            str(alternative): int(score) for alternative, score in enumerate(electorate.scores(k, method).tolist())
+        }
+        situations.update(electorate, winner, possible_winners)
+        situations.draw(voter)
+    large_seconds = (time.perf_counter() - start) / rounds
+
+    return {'default_seconds_per_round': default_seconds, 'large_seconds_per_round': large_seconds}
+
+
+def time_iteration(preferences: List[Preference], iteration_name: str, k: int, method: str, search_name: str,
+                   time_limit: int, move_time_limit: int, seed: int) -> dict:
+    """
+    Runs the voting iteration with a tracer. 'overhead_seconds_per_move' is its time without the manipulation moves
+    per move (None if no voter manipulated).
+    """
+    search, use_oracle = SEARCHES[search_name]
+    tracer = SearchTracer()
+    random.seed(seed)
+    np.random.seed(seed)
+    with contextlib.redirect_stdout(io.StringIO()):  # the engine prints its progress
+        result = ITERATIONS[iteration_name](
+            preferences, False, k, method, {i: i for i in range(len(preferences[0]))}, True, True, True, time_limit,
+            move_time_limit=move_time_limit, search=search, use_oracle=use_oracle, tracer=tracer
+        )
+    summary = tracer.summary()
+    overhead_seconds = summary['seconds'] - summary['move_seconds_total']
+    return {
+        'outcome': result if result == 'hard_exit' else 'converged',
+        'seconds': summary['seconds'],
+        'moves': summary['moves'],
+        'move_seconds_total': summary['move_seconds_total'],
+        'overhead_seconds': overhead_seconds,
+        'overhead_seconds_per_move': overhead_seconds / summary['moves'] if summary['moves'] else None
+    }
+
+
+def format_ms(seconds: float) -> str:
+    return '-' if seconds is None else f'{seconds * 1000:.3f}'
+
+
+def main(args):
+    cases = {}
+    for m in args.num_alt:
+        for n in args.num_voters:
+            preferences = get_scaling_profile(args.seed, m, n, args.data_type, args.base_voters)
+            for method, k in get_rules(m):
+                if method not in args.methods or k not in args.k:
+                    continue
+                name = f'{args.data_type}_m{m}_n{len(preferences)}/method={method}/k={k}'
+                case = {
+                    'num_alt': m,
+                    'num_voters': len(preferences),
+                    'method': method,
+                    'k': k,
+                    'bookkeeping': time_bookkeeping(preferences, k, method, args.rounds, args.seed),
+                    'iterations': {}
+                }
+                for iteration_name in ['large_electorate_iteration', 'voting_iteration']:
+                    if iteration_name == 'voting_iteration' and len(preferences) > args.max_default_voters:
+                        continue
+                    case['iterations'][iteration_name] = time_iteration(
+                        preferences, iteration_name, k, method, args.search, args.time_limit, args.move_time_limit,
+                        args.seed
+                    )
+                cases[name] = case
+                bookkeeping = case['bookkeeping']
+                iterations = ', '.join(
+                    f'{iteration_name} {format_ms(result["overhead_seconds_per_move"])} ({result["moves"]} moves, '
+                    f'{result["outcome"]})' for iteration_name, result in case['iterations'].items()
+                )
+                print(
+                    f'{name}: bookkeeping (ms/round) default {format_ms(bookkeeping["default_seconds_per_round"])} '
+                    f'large {format_ms(bookkeeping["large_seconds_per_round"])}, iterations (ms/move without the '
+                    f'moves) {iterations}'
+                )
+
+    results = {
+        'meta': {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'git_commit': get_git_commit(),
+            'args': vars(args)
+        },
+        'cases': cases
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f'scaling_{datetime.datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+    )
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f'results written to {output}')
+
+
+def parse_args(arguments: List[str] = None):
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--num_alt', type=int, nargs='+', default=[5, 8, 10])
+    parser.add_argument('--num_voters', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--data_type', type=str, default='ic', choices=DATA_TYPES)
+    parser.add_argument('--base_voters', type=int, default=10)
+    parser.add_argument('--methods', type=str, nargs='+', default=['approval', 'veto'])
+    parser.add_argument('--k', type=int, nargs='+', default=[1])
+    parser.add_argument('--search', type=str, default='astar_oracle', choices=list(SEARCHES))
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--max_default_voters', type=int, default=10000)
+    parser.add_argument('--time_limit', type=int, default=60)
+    parser.add_argument('--move_time_limit', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None)
+
+    return parser.parse_args(arguments)
+
+
+if __name__ == '__main__':
+    main(parse_args())
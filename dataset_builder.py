@@ -0,0 +1,123 @@
+"""
+This is the entrypoint script that builds the datasets of profiles that the experiments run on (see main/dataset.py).
+Every cell of the grid (number of voters, number of alternatives, data type) is built in a worker process with its own
+seed derived from `--seed` and written to its own file as soon as it is done, and the manifest of the dataset is
+updated after every cell. Running the script again only builds the cells that are missing (e.g. after a crash), and the
+same seed always gives exactly the same files.
+
+E.g. of script call (the data of the paper, with 200 profiles per cell):
+```
+ python dataset_builder.py --num_voters 10 20 50 --num_alt 3 4 5 --data_type ic 2urn --complete_profiles true false
+  --workers 8
+ ```
+`--verify` checks the files of the cells that are already built against the SHA-256 of the manifest and builds the
+ones that do not match again. `--from_pickles true` converts the older data/our_data_complete.pkl and
+data/our_data_incomplete.pkl to datasets instead, keeping the numbers of the profiles (and so the results that were
+calculated on them). `--truthful_tables true` (the default) also precomputes the truthful winners, scores and social
+welfare of the profiles of every cell for the analysis of the results (see TruthfulTable in main/analytics.py).
+"""
+
+import argparse
+import os
+
+from tqdm import tqdm
+
+from main.analytics import get_truthful_table
+from main.catalogue import MAX_ALTERNATIVES_IN_CATALOGUE, get_catalogue
+from main.dataset import Dataset, build_cell, convert_pickled_data, get_cell_name, get_dataset_dir, get_pickle_path, \
+    is_cell_built, load_manifest, save_manifest
+from main.parallel import WorkerPool
+from orchestration import str2bool
+
+
+def build_cell_job(*cell_args):
+    yield build_cell(*cell_args)
+
+
+def get_cells_to_build(args, directory: str, manifest: dict) -> list:
+    cells = []
+    for num_voters in args.num_voters:
+        for num_alt in args.num_alt:
+            for data_type in args.data_type:
+                entry = manifest['cells'].get(get_cell_name(num_voters, num_alt, data_type))
+                if not is_cell_built(directory, entry, check_hash=args.verify):
+                    cells.append((num_voters, num_alt, data_type))
+    return cells
+
+
+def build_dataset(args, complete_profiles: bool):
+    directory = get_dataset_dir(complete_profiles)
+    os.makedirs(directory, exist_ok=True)
+    manifest = load_manifest(directory) or {
+        'root_seed': args.seed,
+        'num_profiles': args.num_profiles,
+        'complete_profiles': complete_profiles,
+        'cells': {}
+    }
+    if (manifest['root_seed'], manifest['num_profiles']) != (args.seed, args.num_profiles):
+        raise ValueError(
+            f'{directory} was built with seed {manifest["root_seed"]} and {manifest["num_profiles"]} profiles per '
+            f'cell, remove it first to build it with seed {args.seed} and {args.num_profiles} profiles per cell'
+        )
+    save_manifest(directory, manifest)
+
+    cells = get_cells_to_build(args, directory, manifest)
+    print(f'{directory}: {len(cells)} cells to build')
+    # the catalogues are loaded (or built and saved) once here, instead of by every worker at the same time
+    for num_alt in {num_alt for _, num_alt, _ in cells if num_alt <= MAX_ALTERNATIVES_IN_CATALOGUE}:
+        get_catalogue(num_alt)
+
+    jobs = [(get_cell_name(*cell), (directory, args.seed, args.num_profiles, *cell, complete_profiles))
+            for cell in cells]
+    with tqdm(total=len(jobs), desc='cells') as pbar:
+        if args.workers > 1:
+            with WorkerPool(args.workers, build_cell_job) as pool:
+                for cell_name, entry, job_finished in pool.imap_unordered(jobs):
+                    if job_finished:
+                        pbar.update()
+                    else:
+                        # the manifest is only written by this process
+                        manifest['cells'][cell_name] = entry
+                        save_manifest(directory, manifest)
+        else:
+            for cell_name, job_args in jobs:
+                manifest['cells'][cell_name] = build_cell(*job_args)
+                save_manifest(directory, manifest)
+                pbar.update()
+
+
+def build_truthful_tables(complete_profiles: bool):
+    dataset = Dataset(get_dataset_dir(complete_profiles))
+    for cell in tqdm(list(dataset), desc='truthful tables'):
+        get_truthful_table(dataset, cell)  # builds and saves the table of the cell, unless it is up to date
+
+
+def main(args):
+    for complete_profiles in args.complete_profiles:
+        if args.from_pickles:
+            directory = get_dataset_dir(complete_profiles)
+            if load_manifest(directory) is not None:
+                raise ValueError(f'there is already a dataset in {directory}, remove it first to convert the pickles')
+            convert_pickled_data(get_pickle_path(complete_profiles), directory, complete_profiles)
+            print(f'converted {get_pickle_path(complete_profiles)} to {directory}')
+        else:
+            build_dataset(args, complete_profiles)
+        if args.truthful_tables:
+            build_truthful_tables(complete_profiles)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--num_voters', type=int, nargs='+', default=[10, 20, 50])
+    parser.add_argument('--num_alt', type=int, nargs='+', default=[3, 4, 5])
+    parser.add_argument('--data_type', type=str, nargs='+', default=['ic', '2urn'])
+    parser.add_argument('--complete_profiles', type=str2bool, nargs='+', default=[True, False])
+    parser.add_argument('--num_profiles', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verify', type=str2bool, default=False)
+    parser.add_argument('--from_pickles', type=str2bool, default=False)
+    parser.add_argument('--truthful_tables', type=str2bool, default=True)
+    parser.add_argument('--workers', type=int, default=1)
+
+    main(parser.parse_args())
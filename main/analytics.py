@@ -0,0 +1,349 @@
+"""
+This module includes the analysis of the results that the plots of the paper are made of.
+
+The results are flattened once into a typed table with one row per run (see 'get_results_table'): the key of the run,
+whether it was a hard exit, whether it converged, its number of rounds and its final winner. Given the profiles,
+'add_truthful_columns' adds the truthful (initial) winner and the quality of the final winner. The quality is the social
+welfare of the final winner minus the one of the truthful winner, where the social welfare of an alternative is the sum
+of #1s - #(-1)s in its row over all the voters. All the metrics of the paper are then group-bys over this table:
+    - non_manipulable_share: the share of the profiles where nobody manipulates (0 rounds)
+    - winner_invariance: the share of the manipulated profiles whose final winner is the truthful one
+    - rounds_distribution: the distribution of the number of rounds until convergence
+    - quality_distribution: the distribution of the quality of the final winner
+The hard exits are left out of all the metrics.
+
+The truthful winners and the social welfare come from the truthful table of every cell of profiles (see
+'TruthfulTable'), which is precomputed once for all the rules and kept next to the dataset (see also
+dataset_builder.py).
+"""
+
+import os
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from main.data_processing import get_tie_breaking_ranks, get_winners_batch
+from main.dataset import Dataset, as_profile_array, get_cell_name
+from main.results_store import KEY_COLUMNS, RESULTS_PATH, SUMMARY_COLUMNS, ResultsStore, get_full_key, get_summary
+
+RESULTS_TABLE_PATH = 'data/results/results_table.pkl'
+TRUTHFUL_DIR = 'truthful'
+TRUTHFUL_TABLE_VERSION = 2  # the saved tables of older versions are built again (2: the rules with k = m too)
+CONFIGURATION_COLUMNS = ['num_alt', 'num_voters', 'data_type', 'complete_profiles', 'method', 'k']
+NO_WINNER = -1  # the final winner of the runs where nobody manipulated (before add_truthful_columns) or hard exits
+_COLUMN_TYPES = {
+    'num_alt': np.int8,
+    'num_voters': np.int32,
+    'data_type': 'category',
+    'profile': np.int32,
+    'k': np.int8,
+    'method': 'category',
+    'meta_counter': np.int32,
+    'do_additions': bool,
+    'do_omissions': bool,
+    'do_flips': bool,
+    'complete_profiles': bool,
+    'large_electorate': bool,
+    'hard_exit': bool,
+}
+
+
+def get_store_state(path: str) -> list:
+    """
+    Changes whenever a result is written to the store at the path (the SQLite file and its write-ahead log).
+    """
+    files = [file for file in [path, path + '-wal'] if os.path.isfile(file)]
+    return [(os.stat(file).st_mtime_ns, os.stat(file).st_size) for file in files]
+
+
+def get_results_table(results: Union[str, ResultsStore, dict] = RESULTS_PATH,
+                      cache_path: Optional[str] = RESULTS_TABLE_PATH) -> pd.DataFrame:
+    """
+    Flattens the results into a table with one row per run, the KEY_COLUMNS and the SUMMARY_COLUMNS of the results
+    store. The number of rounds of the hard exits is -1 and their final winner NO_WINNER.
+    Args:
+        results: The path of a results store, a results store or a total_result dict.
+        cache_path: Where the table of a results store is kept (None to not keep it). Reading all the rows from SQLite
+         is most of the time of the analysis, so it is only done again when the store changed.
+    """
+    if isinstance(results, dict):
+        table = pd.DataFrame([get_full_key(key) + get_summary(result) for key, result in results.items()],
+                             columns=list(KEY_COLUMNS + SUMMARY_COLUMNS))
+        return _to_typed_table(table)
+    path = results if isinstance(results, str) else results.path
+    if cache_path and os.path.isfile(cache_path):
+        table = pd.read_pickle(cache_path)
+        if table.attrs.get('store') == [os.path.abspath(path), get_store_state(path)]:
+            return table
+    if isinstance(results, str):
+        with ResultsStore(results) as store:
+            table = _to_typed_table(store.to_frame())
+    else:
+        table = _to_typed_table(results.to_frame())
+    if cache_path:
+        table.attrs['store'] = [os.path.abspath(path), get_store_state(path)]
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        table.to_pickle(cache_path + '.tmp')
+        os.replace(cache_path + '.tmp', cache_path)
+    return table
+
+
+def _to_typed_table(table: pd.DataFrame) -> pd.DataFrame:
+    table = table.astype(_COLUMN_TYPES)
+    table['convergence'] = table['convergence'].fillna(0).astype(bool)
+    table['num_rounds'] = table['num_rounds'].fillna(-1).astype(np.int32)
+    table['final_winner'] = table['final_winner'].fillna(NO_WINNER).astype(np.int8)
+    return table
+
+
+def select_paper_runs(table: pd.DataFrame) -> pd.DataFrame:
+    """
+    The runs of the experiments of the paper: the first meta counter, all the changes (additions, omissions and flips)
+    allowed and the default mode (not the large-electorate one).
+    """
+    return table[(table['meta_counter'] == 0) & table['do_additions'] & table['do_omissions'] & table['do_flips'] &
+                 ~table['large_electorate']]
+
+
+def _count_in_rows(cells: np.ndarray) -> np.ndarray:
+    """
+    The number of True cells in every row of a (..., m, m) boolean array. Adding the m columns one by one is several
+    times faster than .sum(axis=-1) over such a short axis.
+    """
+    counts = cells[..., 0].astype(np.int16)
+    for column in range(1, cells.shape[-1]):
+        counts += cells[..., column]
+    return counts
+
+
+def get_cell_statistics(profiles: np.ndarray) -> dict:
+    """
+    What the truthful scores and the social welfare of the (B, n, m, m) profiles of a cell are calculated from, in a
+    single pass over the profiles for all the rules: the numbers of 1s and -1s in the row of every alternative for every
+    voter, as (B, m, n) arrays (the voters last, so that summing over them is fast).
+    """
+    return {
+        'preferred': np.ascontiguousarray(_count_in_rows(profiles == 1).swapaxes(1, 2)),
+        'dispreferred': np.ascontiguousarray(_count_in_rows(profiles == -1).swapaxes(1, 2))
+    }
+
+
+def get_truthful_scores(statistics: dict, k: int, method: str) -> np.ndarray:
+    """
+    The (B, m) scores of the alternatives in every profile of a cell (see get_cell_statistics), the same as the ones of
+    'get_scores_of_voters' in data_processing.py summed over the voters.
+    """
+    assert method in ['approval', 'veto']
+    if method == 'approval':
+        voter_scores = statistics['dispreferred'] < k
+    else:
+        voter_scores = statistics['preferred'] > k - 1
+    return voter_scores.sum(axis=-1, dtype=np.int32)
+
+
+class TruthfulTable:
+    """
+    The truthful profiles of a cell, precomputed for every rule (both methods and every k from 1 to m): the (B, m)
+    scores and the (B, ) winners under every rule, with the alternatives in the tie-breaking order 0, 1, ... (as in the
+    experiments), and the (B, m) social welfare of every alternative. Row i is the profile number i, so the table joins
+    with the results (see get_results_table) by their profile column.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+
+    @classmethod
+    def build(cls, profiles: np.ndarray) -> 'TruthfulTable':
+        num_alt = profiles.shape[-1]
+        statistics = get_cell_statistics(profiles)
+        ranks = get_tie_breaking_ranks({i: i for i in range(num_alt)})
+        arrays = {'welfare': (statistics['preferred'].sum(axis=-1, dtype=np.int32) -
+                              statistics['dispreferred'].sum(axis=-1, dtype=np.int32))}
+        for method in ['approval', 'veto']:
+            for k in range(1, num_alt + 1):  # every k that orchestration.py and sweep.py accept
+                scores = get_truthful_scores(statistics, k, method)
+                arrays[f'scores_{method}_{k}'] = scores
+                arrays[f'winners_{method}_{k}'] = get_winners_batch(scores, ranks).astype(np.int8)
+        return cls(arrays)
+
+    @property
+    def welfare(self) -> np.ndarray:
+        return self.arrays['welfare']
+
+    def scores(self, k: int, method: str) -> np.ndarray:
+        return self.arrays[f'scores_{method}_{k}']
+
+    def winners(self, k: int, method: str) -> np.ndarray:
+        return self.arrays[f'winners_{method}_{k}']
+
+    def to_frame(self, k: int, method: str) -> pd.DataFrame:
+        """
+        One row per profile with its truthful winner, the scores (score_0, ...) and the social welfare (welfare_0, ...)
+        of the alternatives under the given rule.
+        """
+        num_alt = self.welfare.shape[1]
+        frame = pd.DataFrame({'initial_winner': self.winners(k, method)})
+        for alternative in range(num_alt):
+            frame[f'score_{alternative}'] = self.scores(k, method)[:, alternative]
+        for alternative in range(num_alt):
+            frame[f'welfare_{alternative}'] = self.welfare[:, alternative]
+        frame.index.name = 'profile'
+        return frame
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **self.arrays)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path: str) -> 'TruthfulTable':
+        with np.load(path) as arrays:
+            return cls(dict(arrays))
+
+
+def get_truthful_table_path(dataset: Dataset, cell: tuple) -> str:
+    return os.path.join(dataset.directory, TRUTHFUL_DIR, get_cell_name(*cell) + '.npz')
+
+
+def get_truthful_table(profiles: Mapping, cell: tuple) -> TruthfulTable:
+    """
+    The truthful table of a cell {(num_voters, num_alt, data_type): profiles}. The table of a cell of a dataset (see
+    dataset.py) is kept next to it, under truthful/, and only built again when the file of the cell (or
+    TRUTHFUL_TABLE_VERSION) changed. The one of the older pickled data is built every time.
+    """
+    if not isinstance(profiles, Dataset):
+        return TruthfulTable.build(as_profile_array(profiles[cell]))
+    path = get_truthful_table_path(profiles, cell)
+    source = profiles.get_entry(cell)['sha256']
+    if os.path.isfile(path):
+        table = TruthfulTable.load(path)
+        if str(table.arrays.get('source')) == source and int(table.arrays.get('version', 1)) == TRUTHFUL_TABLE_VERSION:
+            return table
+    table = TruthfulTable.build(profiles[cell])
+    table.arrays['source'] = np.array(source)
+    table.arrays['version'] = np.array(TRUTHFUL_TABLE_VERSION)
+    table.save(path)
+    return table
+
+
+def add_truthful_columns(table: pd.DataFrame, profiles: Dict[bool, Mapping]) -> pd.DataFrame:
+    """
+    Adds the columns initial_winner and quality to a copy of the table, and sets the final winner of the runs where
+    nobody manipulated to the initial winner. The runs whose profiles are not given keep NO_WINNER and quality 0.
+    Args:
+        table: The output of 'get_results_table'.
+        profiles: {complete_profiles: {(num_voters, num_alt, data_type): profiles}}, e.g. the output of load_profiles
+         (see dataset.py) for both kinds of profiles.
+    """
+    table = table.copy()
+    profile_numbers = table['profile'].to_numpy()
+    final_winners = table['final_winner'].to_numpy().astype(np.int64)
+    initial_winners = np.full(len(table), NO_WINNER, dtype=np.int64)
+    qualities = np.zeros(len(table), dtype=np.int64)
+    truthful_tables = {}
+    for (complete, num_voters, num_alt, data_type, method, k), rows in table.groupby(
+        ['complete_profiles', 'num_voters', 'num_alt', 'data_type', 'method', 'k'], observed=True, sort=False
+    ).indices.items():
+        cell = (num_voters, num_alt, data_type)
+        if (complete, cell) not in truthful_tables:
+            cells = profiles.get(complete, {})
+            truthful_tables[complete, cell] = get_truthful_table(cells, cell) if cell in cells else None
+        truthful_table = truthful_tables[complete, cell]
+        if truthful_table is None:
+            continue
+        numbers = profile_numbers[rows]
+        initial_winners[rows] = truthful_table.winners(k, method)[numbers]
+        final_winners[rows] = np.where(final_winners[rows] == NO_WINNER, initial_winners[rows], final_winners[rows])
+        qualities[rows] = (truthful_table.welfare[numbers, final_winners[rows]] -
+                           truthful_table.welfare[numbers, initial_winners[rows]])
+    hard_exits = table['hard_exit'].to_numpy()
+    final_winners[hard_exits] = NO_WINNER
+    qualities[hard_exits] = 0
+    table['final_winner'] = final_winners.astype(np.int8)
+    table['initial_winner'] = initial_winners.astype(np.int8)
+    table['quality'] = qualities.astype(np.int32)
+    return table
+
+
+def _finished_runs(table: pd.DataFrame) -> pd.DataFrame:
+    return table[~table['hard_exit']]
+
+
+def non_manipulable_share(table: pd.DataFrame, group_columns: List[str] = None) -> pd.Series:
+    """
+    The share of the runs where nobody manipulated, per group (per configuration by default).
+    """
+    runs = _finished_runs(table)
+    return (runs['num_rounds'] == 0).groupby([runs[column] for column in group_columns or CONFIGURATION_COLUMNS],
+                                             observed=True).mean()
+
+
+def winner_invariance(table: pd.DataFrame, group_columns: List[str] = None) -> pd.Series:
+    """
+    The share of the runs with at least one manipulation whose final winner is the truthful one, per group. Needs the
+    columns of 'add_truthful_columns'.
+    """
+    runs = _finished_runs(table)
+    runs = runs[runs['num_rounds'] > 0]
+    return (runs['final_winner'] == runs['initial_winner']).groupby(
+        [runs[column] for column in group_columns or CONFIGURATION_COLUMNS], observed=True
+    ).mean()
+
+
+def _distribution(runs: pd.DataFrame, column: str, group_columns: List[str]) -> pd.Series:
+    counts = runs.groupby(group_columns + [column], observed=True).size()
+    totals = runs.groupby(group_columns, observed=True).size()
+    return counts / totals.reindex(counts.index.droplevel(-1)).to_numpy()
+
+
+def rounds_distribution(table: pd.DataFrame, group_columns: List[str] = None, max_rounds: int = 50) -> pd.Series:
+    """
+    The share of the runs (with at least one and less than max_rounds manipulations) per number of rounds, per group.
+    """
+    runs = _finished_runs(table)
+    runs = runs[(runs['num_rounds'] > 0) & (runs['num_rounds'] < max_rounds)]
+    return _distribution(runs, 'num_rounds', group_columns or CONFIGURATION_COLUMNS)
+
+
+def quality_distribution(table: pd.DataFrame, group_columns: List[str] = None) -> pd.Series:
+    """
+    The share of the runs (with at least one manipulation) per quality of the final winner, per group. Needs the
+    columns of 'add_truthful_columns'.
+    """
+    runs = _finished_runs(table)
+    runs = runs[runs['num_rounds'] > 0]
+    return _distribution(runs, 'quality', group_columns or CONFIGURATION_COLUMNS)
+
+
+def summarize_configurations(table: pd.DataFrame, group_columns: List[str] = None) -> pd.DataFrame:
+    """
+    One row per group with the share of the runs that converged and the statistics of the number of rounds, the mean
+    quality and the number of manipulated runs whose winner did not change.
+    """
+    runs = _finished_runs(table)
+    groups = runs.groupby(group_columns or CONFIGURATION_COLUMNS, observed=True)
+    summary = groups.agg(
+        converged=('convergence', 'mean'),
+        rounds_mean=('num_rounds', 'mean'),
+        rounds_max=('num_rounds', 'max'),
+        rounds_std=('num_rounds', 'std')
+    )
+    if 'quality' in runs:
+        manipulated = runs[runs['num_rounds'] > 0]
+        manipulated_groups = manipulated.groupby(group_columns or CONFIGURATION_COLUMNS, observed=True)
+        summary['quality_mean'] = manipulated_groups['quality'].mean()
+        summary['same_winner'] = (manipulated['final_winner'] == manipulated['initial_winner']).groupby(
+            [manipulated[column] for column in group_columns or CONFIGURATION_COLUMNS], observed=True
+        ).sum()
+    return summary
+
+
+def get_rule_labels(table: pd.DataFrame) -> pd.Series:
+    """
+    The labels of the rules in the plots: "1 - approval", "(m -1) - veto", ...
+    """
+    k_labels = np.where(table['k'].to_numpy() == 1, '1', '(m -1)')
+    return pd.Series(k_labels, index=table.index) + ' - ' + table['method'].astype(str)
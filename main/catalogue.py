@@ -0,0 +1,161 @@
+"""
+This module includes the catalogue of all the transitive (partial) preferences over a small number of alternatives.
+
+For m <= 6 alternatives the number of partial preferences is small enough (1, 3, 19, 219, 4231 and 130023 for m = 1..6)
+to enumerate them all once, give each one an integer id and store them on disk. Preferences can then be sampled
+directly by id instead of rejection-sampling random matrices, and the rest of the engine can refer to a preference by
+its id. The catalogue is built the first time it is needed and is saved under data/catalogue.
+"""
+
+import os
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from main.preference import Preference, as_preference
+from main.transitivity import masks_to_matrix
+
+MAX_ALTERNATIVES_IN_CATALOGUE = 6
+CATALOGUE_DIR = 'data/catalogue'
+
+_loaded_catalogues: Dict[int, 'PreferenceCatalogue'] = {}
+
+
+class PreferenceCatalogue:
+    """
+    All the partial preferences over a fixed number of alternatives. The id of a preference is its index in
+    'matrices'. The per-row counts of 1s and -1s are kept for all the preferences at once so that the approval/veto
+    scores of any preference for any k are available without touching the matrices.
+    """
+
+    def __init__(self, matrices: np.ndarray):
+        self.matrices = matrices  # (number_of_preferences, m, m) int8 array, sorted by key.
+        self.num_of_alternatives = matrices.shape[-1]
+        self.ones_per_row = (matrices == 1).sum(axis=-1).astype(np.int8)
+        self.minus_ones_per_row = (matrices == -1).sum(axis=-1).astype(np.int8)
+        self.complete_ids = np.flatnonzero(
+            (self.ones_per_row + self.minus_ones_per_row == self.num_of_alternatives - 1).all(axis=-1)
+        )
+        self._ids_of_keys: Optional[Dict[bytes, int]] = None
+        self._scores: Dict[Tuple[str, int], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.matrices)
+
+    def preference(self, preference_id: int) -> Preference:
+        return Preference(self.matrices[preference_id])
+
+    def preference_id(self, pref: Union[Preference, np.ndarray]) -> int:
+        """
+        The id of a preference. Raises a KeyError if the given preference is not transitive.
+        """
+        if self._ids_of_keys is None:
+            self._ids_of_keys = {matrix.tobytes(): i for i, matrix in enumerate(self.matrices)}
+        return self._ids_of_keys[as_preference(pref).key]
+
+    def scores(self, method: str, k: int) -> np.ndarray:
+        """
+        Returns the (number_of_preferences, m) 0/1 array with the score every preference gives to every alternative
+        under the given rule (see also 'get_scores_of_voters' in data_processing.py).
+        """
+        assert method in ['approval', 'veto']
+        if (method, k) not in self._scores:
+            if method == 'approval':
+                self._scores[(method, k)] = (self.minus_ones_per_row < k).astype(np.int8)
+            else:
+                self._scores[(method, k)] = (self.ones_per_row > k - 1).astype(np.int8)
+        return self._scores[(method, k)]
+
+    def sample_ids(self,
+                   size: int,
+                   complete: bool = False,
+                   weights: np.ndarray = None,
+                   rng: np.random.Generator = None) -> np.ndarray:
+        """
+        Samples preference ids (with replacement).
+        Args:
+            size: How many ids to sample.
+            complete: Whether to sample only among the complete preferences.
+            weights: Optional non-negative weight of every preference in the catalogue. Uniform if not given.
+            rng: The random generator to use. The global numpy random state is used if not given.
+
+        Returns:
+            An int array of ids.
+        """
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)
+            if complete:
+                weights = np.where(np.isin(np.arange(len(self)), self.complete_ids), weights, 0)
+            p = weights / weights.sum()
+            return rng.choice(len(self), size=size, p=p) if rng is not None else np.random.choice(
+                len(self), size=size, p=p
+            )
+        number_of_candidates = len(self.complete_ids) if complete else len(self)
+        ids = rng.integers(number_of_candidates, size=size) if rng is not None else np.random.randint(
+            number_of_candidates, size=size
+        )
+        return self.complete_ids[ids] if complete else ids
+
+
+def enumerate_partial_preferences(num_of_alternatives: int) -> np.ndarray:
+    """
+    Enumerates all the partial preferences over the given number of alternatives, i.e. all the strict partial orders.
+    They are built by adding the alternatives one at a time: the new alternative t is placed below an up-closed set U
+    and above a down-closed set D of the previous alternatives, such that every alternative of U is preferred to every
+    alternative of D.
+
+    Returns:
+        A (number_of_preferences, m, m) int8 array sorted by the key (see Preference.key) of the preferences.
+    """
+    partial_orders: List[Tuple[int, ...]] = [()]  # every partial order as the successor masks of its alternatives
+    for t in range(num_of_alternatives):
+        new_partial_orders = []
+        for masks in partial_orders:
+            subsets = range(1 << t)
+            up_closed = [u for u in subsets if all(not masks[v] & u or u >> v & 1 for v in range(t))]
+            down_closed = [d for d in subsets if all(not d >> v & 1 or masks[v] & ~d == 0 for v in range(t))]
+            for u in up_closed:
+                common_successors_of_u = (1 << t) - 1
+                for v in range(t):
+                    if u >> v & 1:
+                        common_successors_of_u &= masks[v]
+                for d in down_closed:
+                    if d & ~common_successors_of_u:
+                        continue
+                    new_masks = tuple(mask | (1 << t) if u >> v & 1 else mask for v, mask in enumerate(masks))
+                    new_partial_orders.append(new_masks + (d, ))
+        partial_orders = new_partial_orders
+
+    matrices = np.stack([masks_to_matrix(masks) for masks in partial_orders]) if num_of_alternatives else np.zeros(
+        (1, 0, 0), dtype=np.int8
+    )
+    order = sorted(range(len(matrices)), key=lambda i: matrices[i].tobytes())
+    return matrices[order]
+
+
+def get_catalogue(num_of_alternatives: int) -> PreferenceCatalogue:
+    """
+    Returns the catalogue of the given number of alternatives. It is loaded from disk (or built and saved there if it
+    does not exist yet) only the first time in every process.
+    """
+    assert 0 < num_of_alternatives <= MAX_ALTERNATIVES_IN_CATALOGUE
+    if num_of_alternatives not in _loaded_catalogues:
+        path = os.path.join(CATALOGUE_DIR, f'partial_preferences_{num_of_alternatives}.npy')
+        if os.path.isfile(path):
+            matrices = np.load(path)
+        else:
+            matrices = enumerate_partial_preferences(num_of_alternatives)
+            os.makedirs(CATALOGUE_DIR, exist_ok=True)
+            np.save(path, matrices)
+        _loaded_catalogues[num_of_alternatives] = PreferenceCatalogue(matrices)
+    return _loaded_catalogues[num_of_alternatives]
+
+
+def get_preference_id(pref: Union[Preference, np.ndarray]) -> Optional[int]:
+    """
+    The catalogue id of a preference, or None if it has too many alternatives to be in a catalogue.
+    """
+    pref = as_preference(pref)
+    if len(pref) > MAX_ALTERNATIVES_IN_CATALOGUE:
+        return None
+    return get_catalogue(len(pref)).preference_id(pref)
@@ -16,6 +16,11 @@ if curr_path.split('/iterative_voting/main')[0] not in sys.path:
     sys.path.append(curr_path.split('/iterative_voting/main')[0])
 
 from iterative_voting.main.data_processing import check_transitivity
+from main.catalogue import MAX_ALTERNATIVES_IN_CATALOGUE, PreferenceCatalogue, get_catalogue
+from main.preference import Preference
+from main.transitivity import check_transitivity_batch
+
+REJECTION_BATCH_SIZE = 4096  # the number of random matrices that are checked for transitivity at once
 
 
 def fix_symmetry_diagonal(pref: np.array) -> np.array:
@@ -25,12 +30,9 @@ def fix_symmetry_diagonal(pref: np.array) -> np.array:
         Returns:
         The modified array
     """
-    for i in range(0, len(pref)):
-        for j in range(0, len(pref)):
-            if j > i:
-                pref[i][j] = -pref[j][i]
-            elif j == i:
-                pref[i][j] = 0
+    lower_rows, lower_columns = np.tril_indices(len(pref), -1)
+    pref[lower_columns, lower_rows] = -pref[lower_rows, lower_columns]
+    np.fill_diagonal(pref, 0)
     return pref
 
 
@@ -46,6 +48,16 @@ def profile_generation(alt_number: int, vot_number: int, method: str, complete:
         Returns:
         A profile: a list of arrays
     """
+    assert method in ['ic', '2urn']
+
+    if alt_number <= MAX_ALTERNATIVES_IN_CATALOGUE:
+        catalogue = get_catalogue(alt_number)
+        preference_ids = preference_ids_generation(catalogue, vot_number, method, complete)
+        dataframes = {}  # voters with the same preference share the same DataFrame (as below).
+        for preference_id in set(preference_ids):
+            dataframes[preference_id] = catalogue.preference(preference_id).to_dataframe()
+        return [dataframes[preference_id] for preference_id in preference_ids]
+
     if complete:
         func = generate_complete_random_preference
     else:
@@ -53,8 +65,6 @@ def profile_generation(alt_number: int, vot_number: int, method: str, complete:
 
     gprofile = []
 
-    assert method in ['ic', '2urn']
-
     if method == 'ic':
         for _ in range(vot_number):
             some_pref = func(alt_number)
@@ -80,13 +90,40 @@ def profile_generation(alt_number: int, vot_number: int, method: str, complete:
     return gprofile
 
 
+def preference_ids_generation(catalogue: PreferenceCatalogue, vot_number: int, method: str,
+                              complete: bool) -> List[int]:
+    """
+    Same as 'profile_generation' but samples directly the catalogue ids of the preferences of the voters, which makes
+    every draw O(1) and the comparisons of the 2urn model comparisons of integers.
+    """
+    if method == 'ic':
+        return catalogue.sample_ids(vot_number, complete=complete).tolist()
+
+    id_1 = int(catalogue.sample_ids(1, complete=complete)[0])
+    id_2 = int(catalogue.sample_ids(1, complete=complete)[0])
+    while id_2 == id_1:
+        id_2 = int(catalogue.sample_ids(1, complete=complete)[0])
+
+    preference_ids = []
+    for _ in range(vot_number):
+        random_pref_assignment = random.randrange(3)
+        if random_pref_assignment == 0:
+            preference_ids.append(id_1)
+        elif random_pref_assignment == 1:
+            preference_ids.append(id_2)
+        else:
+            id_3 = int(catalogue.sample_ids(1, complete=complete)[0])
+            while id_3 in (id_1, id_2):
+                id_3 = int(catalogue.sample_ids(1, complete=complete)[0])
+            preference_ids.append(id_3)
+    return preference_ids
+
+
 def generate_incomplete_random_preference(alt_number: int) -> pd.DataFrame:
-    random_pref = np.random.randint(-1, 2, (alt_number, alt_number))
-    some_pref = pd.DataFrame(fix_symmetry_diagonal(random_pref))
-    while not check_transitivity(some_pref):
-        random_pref = np.random.randint(-1, 2, (alt_number, alt_number))
-        some_pref = pd.DataFrame(fix_symmetry_diagonal(random_pref))
-    return some_pref
+    random_pref = fix_symmetry_diagonal(np.random.randint(-1, 2, (alt_number, alt_number)))
+    while not check_transitivity(Preference(random_pref)):
+        random_pref = fix_symmetry_diagonal(np.random.randint(-1, 2, (alt_number, alt_number)))
+    return pd.DataFrame(random_pref)
 
 
 def generate_complete_random_preference(alt_number: int) -> pd.DataFrame:
@@ -98,3 +135,119 @@ def generate_complete_random_preference(alt_number: int) -> pd.DataFrame:
             new_mat[alt, order[i]] = -1
     np.fill_diagonal(new_mat, 0)
     return pd.DataFrame(new_mat).astype(int)
+
+
+def sample_preference_matrices(rng: np.random.Generator, size: int, alt_number: int, complete: bool) -> np.ndarray:
+    """
+    Samples independent preferences uniformly at random (among the complete or among all the partial ones).
+    For m <= 6 they are drawn from the catalogue. Otherwise complete preferences are the orders of random keys and
+    partial ones are random antisymmetric matrices that are rejected (in batches) until they are transitive, like
+    'generate_incomplete_random_preference' does one at a time.
+    Returns:
+        A (size, m, m) int8 array.
+    """
+    if alt_number <= MAX_ALTERNATIVES_IN_CATALOGUE:
+        catalogue = get_catalogue(alt_number)
+        return catalogue.matrices[catalogue.sample_ids(size, complete=complete, rng=rng)]
+    if complete:
+        keys = rng.random((size, alt_number))
+        # alternative i is preferred to j if its key is smaller, i.e. the preference is the argsort of the keys
+        return np.sign(keys[:, None, :] - keys[:, :, None]).astype(np.int8)
+
+    upper_rows, upper_columns = np.triu_indices(alt_number, 1)
+    matrices = np.empty((size, alt_number, alt_number), dtype=np.int8)
+    filled = 0
+    while filled < size:
+        candidates = np.zeros((REJECTION_BATCH_SIZE, alt_number, alt_number), dtype=np.int8)
+        cells = rng.integers(-1, 2, size=(REJECTION_BATCH_SIZE, len(upper_rows)), dtype=np.int8)
+        candidates[:, upper_rows, upper_columns] = cells
+        candidates[:, upper_columns, upper_rows] = -cells
+        transitive = candidates[check_transitivity_batch(candidates)][:size - filled]
+        matrices[filled:filled + len(transitive)] = transitive
+        filled += len(transitive)
+    return matrices
+
+
+def _resample_equal_ones(rng: np.random.Generator, matrices: np.ndarray, forbidden: List[np.ndarray], alt_number: int,
+                         complete: bool) -> np.ndarray:
+    """
+    Samples again (in place) every preference of 'matrices' that is equal to the corresponding preference of any of
+    the 'forbidden' arrays (which are broadcast against it), until there is none. Only the preferences that were
+    sampled again are compared again.
+    """
+    forbidden = [np.broadcast_to(other, matrices.shape) for other in forbidden]
+    to_check = np.ones(matrices.shape[:-2], dtype=bool)
+    while True:
+        equal = np.zeros_like(to_check)
+        for other in forbidden:
+            equal[to_check] |= (matrices[to_check] == other[to_check]).all(axis=(-2, -1))
+        if not equal.any():
+            return matrices
+        matrices[equal] = sample_preference_matrices(rng, int(equal.sum()), alt_number, complete)
+        to_check = equal
+
+
+def generate_profile_ids(rng: np.random.Generator, catalogue: PreferenceCatalogue, num_profiles: int, vot_number: int,
+                         method: str, complete: bool) -> np.ndarray:
+    """
+    The same as 'generate_profiles' for m <= 6, but returns the (B, n) catalogue ids of the preferences. The distinct
+    preferences of the 2urn model are drawn uniformly among the remaining ones directly instead of by rejection.
+    """
+    candidates = catalogue.complete_ids if complete else np.arange(len(catalogue))
+    shape = (num_profiles, vot_number)
+    if method == 'ic':
+        return candidates[rng.integers(len(candidates), size=shape)]
+
+    assert len(candidates) >= 3, 'the 2urn model needs at least 3 different preferences'
+    position_1 = rng.integers(len(candidates), size=(num_profiles, 1))
+    position_2 = rng.integers(len(candidates) - 1, size=(num_profiles, 1))
+    position_2 += position_2 >= position_1  # skip the first preference
+    lower, higher = np.minimum(position_1, position_2), np.maximum(position_1, position_2)
+    position_3 = rng.integers(len(candidates) - 2, size=shape)
+    position_3 += position_3 >= lower  # skip both of them
+    position_3 += position_3 >= higher
+    assignments = rng.integers(3, size=shape)
+    return candidates[np.where(assignments == 0, position_1, np.where(assignments == 1, position_2, position_3))]
+
+
+def generate_profiles(rng: np.random.Generator, num_profiles: int, vot_number: int, alt_number: int, method: str,
+                      complete: bool) -> np.ndarray:
+    """
+    Batch variant of 'profile_generation' that generates many profiles at once from an explicit random generator, so
+    that the same seed always gives the same profiles.
+    Args:
+        rng: The random generator to use.
+        num_profiles: The number of profiles (B).
+        vot_number: The number of voters (n).
+        alt_number: The number of alternatives (m).
+        method: "ic" or "2urn", as in 'profile_generation'.
+        complete: Whether to generate complete or incomplete preferences.
+
+    Returns:
+        A (B, n, m, m) int8 array.
+    """
+    assert method in ['ic', '2urn']
+    if alt_number <= MAX_ALTERNATIVES_IN_CATALOGUE:
+        catalogue = get_catalogue(alt_number)
+        return catalogue.matrices[generate_profile_ids(rng, catalogue, num_profiles, vot_number, method, complete)]
+
+    shape = (num_profiles, vot_number)
+    if method == 'ic':
+        return sample_preference_matrices(rng, num_profiles * vot_number, alt_number,
+                                          complete).reshape(*shape, alt_number, alt_number)
+
+    # 2urn: every profile has two distinct preferences and every voter has the first, the second or a third one that
+    # is different from both with equal probability.
+    pref_1 = sample_preference_matrices(rng, num_profiles, alt_number, complete)[:, None]
+    pref_2 = _resample_equal_ones(
+        rng, sample_preference_matrices(rng, num_profiles, alt_number, complete)[:, None], [pref_1], alt_number,
+        complete
+    )
+    others = _resample_equal_ones(
+        rng,
+        sample_preference_matrices(rng, num_profiles * vot_number, alt_number,
+                                   complete).reshape(*shape, alt_number, alt_number), [pref_1, pref_2], alt_number,
+        complete
+    )
+    assignments = rng.integers(3, size=shape)[..., None, None]
+    return np.where(assignments == 0, pref_1, np.where(assignments == 1, pref_2, others))
@@ -3,38 +3,65 @@ This module includes utility functions that have to do with calculating basic pr
 the score of a specific alternative in a preference or the winner given a profile.
 """
 
-from typing import List, Tuple
+from typing import List, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
+from main.preference import Preference, as_preference
 
-def get_score_of_alternative_by_voter(graph: pd.DataFrame, method: str, k: int, alternative: int) -> int:
+
+def get_score_of_alternative_by_voter(
+    graph: Union[Preference, pd.DataFrame], method: str, k: int, alternative: int
+) -> int:
+    graph = as_preference(graph)
     if method == 'approval':
-        try:
-            if graph.iloc[alternative].value_counts()[-1.0] < k:
-                return 1
-        except KeyError:
+        if graph.num_minus_ones(alternative) < k:
             return 1
         return 0
     elif method == 'veto':
-        try:
-            if graph.iloc[alternative].value_counts()[1.0] > k - 1:
-                return 1
-        except KeyError:
-            return 0
+        if graph.num_ones(alternative) > k - 1:
+            return 1
         return 0
 
 
-def find_sum_of_alternatives(graphs: List[pd.DataFrame], k: int, method: str, num_of_alternatives: int) -> dict:
+def stack_profile(graphs: List[Union[Preference, pd.DataFrame]]) -> np.ndarray:
+    """
+    Stacks the preferences of a profile into a single (n, m, m) int8 tensor (n: voters, m: alternatives).
+    """
+    graphs = [as_preference(g) for g in graphs]
+    num_of_alternatives = len(graphs[0])
+    # joining the raw bytes is considerably faster than np.stack for many tiny matrices.
+    return np.frombuffer(b''.join([g.key for g in graphs]),
+                         dtype=np.int8).reshape(len(graphs), num_of_alternatives, num_of_alternatives)
+
+
+def get_scores_of_voters(profile_tensor: np.ndarray, k: int, method: str) -> np.ndarray:
+    """
+    Calculates in one pass the score that every voter gives to every alternative.
+    Args:
+        profile_tensor: A (..., m, m) tensor of preferences, e.g. the output of 'stack_profile'.
+        k: The k of the k-approval or k-veto rule.
+        method: Either 'approval' or 'veto'.
+
+    Returns:
+        A (..., m) int8 array of 0/1 scores. The same as calling 'get_score_of_alternative_by_voter' for every voter and
+        every alternative.
+    """
     assert method in ['approval', 'veto']
+    if method == 'approval':
+        return ((profile_tensor == -1).sum(axis=-1) < k).astype(np.int8)
+    return ((profile_tensor == 1).sum(axis=-1) > k - 1).astype(np.int8)
+
 
-    d = {}
-    for alternative in range(num_of_alternatives):
-        d[str(alternative)] = 0
-        for g in graphs:
-            d[str(alternative)] += get_score_of_alternative_by_voter(g, method, k, alternative)
+def find_sum_of_alternatives(
+    graphs: List[Union[Preference, pd.DataFrame]], k: int, method: str, num_of_alternatives: int
+) -> dict:
+    assert method in ['approval', 'veto']
 
-    return d
+    scores = get_scores_of_voters(stack_profile(graphs), k, method).sum(axis=0, dtype=np.int64)
+    assert len(scores) == num_of_alternatives
+    return {str(alternative): int(scores[alternative]) for alternative in range(num_of_alternatives)}
 
 
 def get_winners_from_scores(
@@ -50,7 +77,42 @@ def get_winners_from_scores(
     return winner, possible_winners
 
 
-def evaluate_profile(graphs: List[pd.DataFrame], k: int, method: str,
+def get_tie_breaking_ranks(alphabetical_order: dict) -> np.ndarray:
+    """
+    The position of every alternative in the tie-breaking order of 'get_winners_from_scores' (the lowest wins the ties).
+    """
+    ranks = np.empty(len(alphabetical_order), dtype=np.int64)
+    for rank, key in enumerate(sorted(alphabetical_order)):
+        ranks[alphabetical_order[key]] = rank
+    return ranks
+
+
+def get_winners_batch(scores: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+    """
+    Batch variant of the winner of 'get_winners_from_scores'.
+    Args:
+        scores: A (..., m) int array of total scores of the alternatives.
+        ranks: The output of 'get_tie_breaking_ranks'.
+
+    Returns:
+        A (...) array with the winner of every score vector.
+    """
+    # the highest score wins and the ties are broken in favour of the lowest rank
+    return np.argmax(scores * len(ranks) + (len(ranks) - 1 - ranks), axis=-1)
+
+
+def get_winners_from_score_vector(scores: np.ndarray, ranks: np.ndarray) -> Tuple[int, List[int]]:
+    """
+    The same as 'get_winners_from_scores' for the total scores as an (m,) int array indexed by the alternatives and the
+    output of 'get_tie_breaking_ranks', without going through str-keyed dicts.
+    """
+    winner = int(get_winners_batch(scores, ranks))
+    possible_winners = np.flatnonzero(scores >= scores[winner] - 2).tolist()
+    possible_winners.remove(winner)
+    return winner, possible_winners
+
+
+def evaluate_profile(graphs: List[Union[Preference, pd.DataFrame]], k: int, method: str,
                      alphabetical_order: dict) -> Tuple[int, List[int], dict]:
     num_of_alternatives = len(graphs[0])
     scores_of_alternatives = find_sum_of_alternatives(graphs, k, method, num_of_alternatives)
@@ -58,22 +120,17 @@ def evaluate_profile(graphs: List[pd.DataFrame], k: int, method: str,
     return winner, possible_winners, scores_of_alternatives
 
 
-def check_transitivity(graph: pd.DataFrame) -> bool:
-    aces_series = graph.apply(lambda row: row[row == 1].index.tolist(), axis=1)
-    for i, row in enumerate(aces_series):
-        for ace_column in row:
-            for j in aces_series.loc[ace_column]:
-                if graph.loc[i, j] != 1:
-                    return False
-    return True
+def check_transitivity(graph: Union[Preference, pd.DataFrame]) -> bool:
+    return as_preference(graph).is_transitive
 
 
-def get_social_welfare_of_alternative(profile: List[pd.DataFrame], alt: int):
+def get_social_welfare_of_alternative(profile: List[Union[Preference, pd.DataFrame]], alt: int):
     '''
     This function is only neeeded for the orchestration_plots.ipynb notebook that reproduces the plots of the
     original publication.
     '''
     social_welfare = 0
     for vot in profile:
-        social_welfare += ((vot.loc[alt] == 1).sum() - (vot.loc[alt] == -1).sum())
+        vot = as_preference(vot)
+        social_welfare += vot.num_ones(alt) - vot.num_minus_ones(alt)
     return social_welfare
@@ -0,0 +1,203 @@
+"""
+This module includes the datasets of profiles that the experiments run on.
+
+A dataset is a directory with one .npy file per cell of the grid (number of voters, number of alternatives, data type),
+which holds the (B, n, m, m) int8 array of the profiles of the cell (see generate_profiles in data_generation.py), and
+a manifest.json that records how every cell was built: the root seed, the seed of the cell, the shape and the SHA-256
+of the file. The seed of a cell is derived from the root seed and the cell itself (not from its position in the grid),
+so building a cell again always gives exactly the same file, and a build that was interrupted only builds the cells
+that are still missing. The manifest is also the index of the dataset: a run only opens the file of the cell it needs,
+as a read-only memory map (see Dataset).
+
+Older data (data/our_data_complete.pkl and data/our_data_incomplete.pkl) is still used when there is no dataset, and
+'convert_pickled_data' converts it to a dataset with the same profiles in the same order.
+"""
+
+import hashlib
+import json
+import os
+from collections.abc import Mapping
+from typing import Iterator, Optional
+
+import dill
+import numpy as np
+
+from main.data_generation import generate_profiles
+from main.data_processing import stack_profile
+
+DATASETS_DIR = 'data/datasets'
+MANIFEST_FILE = 'manifest.json'
+DATA_TYPES = ['ic', '2urn']
+
+
+def get_dataset_dir(complete_profiles: bool) -> str:
+    return os.path.join(DATASETS_DIR, 'complete' if complete_profiles else 'incomplete')
+
+
+def get_cell_name(num_voters: int, num_alt: int, data_type: str) -> str:
+    return f'{num_voters}_{num_alt}_{data_type}'
+
+
+def get_cell_seed(root_seed: int, num_voters: int, num_alt: int, data_type: str,
+                  complete_profiles: bool) -> np.random.SeedSequence:
+    """
+    The seed of a cell, derived from the root seed of the dataset and the parameters of the cell.
+    """
+    return np.random.SeedSequence(
+        root_seed, spawn_key=(num_voters, num_alt, DATA_TYPES.index(data_type), int(complete_profiles))
+    )
+
+
+def get_file_hash(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def build_cell(directory: str, root_seed: int, num_profiles: int, num_voters: int, num_alt: int, data_type: str,
+               complete_profiles: bool) -> dict:
+    """
+    Generates the profiles of a cell and writes them to the file of the cell.
+
+    Returns:
+        The entry of the cell in the manifest.
+    """
+    seed = get_cell_seed(root_seed, num_voters, num_alt, data_type, complete_profiles)
+    profiles = generate_profiles(
+        np.random.default_rng(seed), num_profiles, num_voters, num_alt, data_type, complete_profiles
+    )
+    entry = write_cell(directory, num_voters, num_alt, data_type, profiles)
+    entry['seed'] = {'entropy': seed.entropy, 'spawn_key': list(seed.spawn_key)}
+    return entry
+
+
+def load_manifest(directory: str) -> Optional[dict]:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(directory: str, manifest: dict):
+    path = os.path.join(directory, MANIFEST_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def is_cell_built(directory: str, entry: Optional[dict], check_hash: bool = False) -> bool:
+    """
+    Whether the file of a cell of the manifest exists and is the one that the manifest describes.
+    """
+    if entry is None:
+        return False
+    path = os.path.join(directory, entry['file'])
+    if not os.path.isfile(path) or os.path.getsize(path) != entry['size']:
+        return False
+    return not check_hash or get_file_hash(path) == entry['sha256']
+
+
+class Dataset(Mapping):
+    """
+    The cells of a dataset as {(num_voters, num_alt, data_type): (B, n, m, m) int8 array}. A cell is only opened the
+    first time it is used, as a read-only memory map of its file: only the pages of the profiles that are actually used
+    are read, and all the processes that use the same cell share them through the page cache.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.manifest = load_manifest(directory)
+        assert self.manifest is not None, f'there is no dataset in {directory}'
+        self._entries = {(entry['num_voters'], entry['num_alt'], entry['data_type']): entry
+                         for entry in self.manifest['cells'].values()}
+        self._cells = {}
+
+    def __getitem__(self, cell: tuple) -> np.ndarray:
+        if cell not in self._cells:
+            path = os.path.join(self.directory, self.get_entry(cell)['file'])
+            self._cells[cell] = np.load(path, mmap_mode='r')
+        return self._cells[cell]
+
+    def get_entry(self, cell: tuple) -> dict:
+        """
+        The entry of a cell in the manifest.
+        """
+        return self._entries[cell]
+
+    def __iter__(self) -> Iterator[tuple]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return f'Dataset({self.directory}, cells={len(self)})'
+
+
+def write_cell(directory: str, num_voters: int, num_alt: int, data_type: str, profiles: np.ndarray) -> dict:
+    """
+    Writes the (B, n, m, m) profiles of a cell to its file.
+
+    Returns:
+        The part of the entry of the cell in the manifest that describes the file.
+    """
+    file_name = get_cell_name(num_voters, num_alt, data_type) + '.npy'
+    path = os.path.join(directory, file_name)
+    with open(path + '.tmp', 'wb') as f:
+        np.save(f, np.ascontiguousarray(profiles, dtype=np.int8))
+    os.replace(path + '.tmp', path)  # a cell file is either complete or missing, never half-written
+    return {
+        'num_voters': num_voters,
+        'num_alt': num_alt,
+        'data_type': data_type,
+        'file': file_name,
+        'shape': list(profiles.shape),
+        'size': os.path.getsize(path),
+        'sha256': get_file_hash(path)
+    }
+
+
+def as_profile_array(profiles) -> np.ndarray:
+    """
+    The profiles of a cell as a (B, n, m, m) int8 array, whether they come from a dataset (already such an array) or
+    from the pickled data ({profile_number: list of DataFrames}).
+    """
+    if isinstance(profiles, np.ndarray):
+        return profiles
+    return np.stack([stack_profile(profiles[i]) for i in range(len(profiles))])
+
+
+def convert_pickled_data(pickle_path: str, directory: str, complete_profiles: bool):
+    """
+    Converts the older pickled data ({(num_voters, num_alt, data_type): {profile_number: list of DataFrames}}) to a
+    dataset. The profiles keep their numbers, so the results that were calculated on the pickled data stay valid.
+    """
+    with open(pickle_path, 'rb') as f:
+        data = dill.load(f)
+    os.makedirs(directory, exist_ok=True)
+    manifest = {'root_seed': None, 'num_profiles': None, 'complete_profiles': complete_profiles, 'cells': {}}
+    for (num_voters, num_alt, data_type), profiles in data.items():
+        assert list(profiles) == list(range(len(profiles))), 'the profiles have to be numbered 0, 1, ...'
+        entry = write_cell(directory, num_voters, num_alt, data_type, as_profile_array(profiles))
+        entry['source'] = os.path.basename(pickle_path)
+        manifest['cells'][get_cell_name(num_voters, num_alt, data_type)] = entry
+    save_manifest(directory, manifest)
+
+
+def get_pickle_path(complete_profiles: bool) -> str:
+    return f'data/our_data_{"complete" if complete_profiles else "incomplete"}.pkl'
+
+
+def load_profiles(complete_profiles: bool) -> Mapping:
+    """
+    Returns {(num_voters, num_alt, data_type): profiles} with the profiles indexed by their number, from the dataset
+    (see Dataset) if there is one, otherwise from the older pickled data.
+    """
+    directory = get_dataset_dir(complete_profiles)
+    if load_manifest(directory) is not None:
+        return Dataset(directory)
+    with open(get_pickle_path(complete_profiles), 'rb') as f:
+        return dill.load(f)
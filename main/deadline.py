@@ -0,0 +1,55 @@
+"""
+This module includes the deadlines that bound how long the experiments may run.
+
+A deadline is a point in (monotonic) time. Deadlines are nested: the deadline of a sweep bounds the deadline of every
+profile of the sweep, which in turn bounds the deadline of every manipulation move of the profile. The search of the
+manipulations checks its deadline in its inner loops (see 'check'), so a slow tree level stops as soon as the time is
+up instead of after the whole level has been generated.
+"""
+
+import math
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised by Deadline.check when the deadline has passed.
+    """
+
+
+class Deadline:
+    """
+    A deadline 'seconds' from now, or no deadline at all if seconds is None. If a parent deadline is given, the
+    deadline is never later than the parent one.
+    """
+
+    def __init__(self, seconds: Optional[float] = None, parent: Optional['Deadline'] = None):
+        self.expires_at = math.inf if seconds is None else time.monotonic() + seconds
+        if parent is not None:
+            self.expires_at = min(self.expires_at, parent.expires_at)
+
+    def __repr__(self) -> str:
+        return f'Deadline(remaining={self.remaining():.1f}s)'
+
+    def child(self, seconds: Optional[float] = None) -> 'Deadline':
+        """
+        A new deadline 'seconds' from now that still ends at the latest together with this one.
+        """
+        return Deadline(seconds, parent=self)
+
+    def remaining(self) -> float:
+        """
+        The seconds left until the deadline (negative if it has passed, inf if there is no deadline).
+        """
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return time.monotonic() > self.expires_at
+
+    def check(self):
+        """
+        Raises DeadlineExceeded if the deadline has passed.
+        """
+        if time.monotonic() > self.expires_at:
+            raise DeadlineExceeded
@@ -0,0 +1,425 @@
+"""
+This module includes the large-electorate mode of the voting iterations, for profiles of thousands of voters (and up to
+10 alternatives).
+
+Outside of the manipulation moves, voting_iteration (see main/orchestration.py) spends O(n) on every round: it rebuilds
+the list of the voters that may still manipulate for every voter it draws, marks the hopeless voters of the whole
+profile after every move (see main/manipulability.py) and goes through the whole profile to find the voters identical
+to one that failed. large_electorate_iteration runs the same iterations with:
+    - an Electorate as the profile: the type of every voter in an int array and the scores of every type and the total
+      scores in arrays, all updated in place in O(m) when a voter changes its preference,
+    - the winner and the possible winners calculated from the score vector with the integer tie-breaking ranks (see
+      get_winners_from_score_vector), instead of from str-keyed dicts,
+    - a SituationIndex instead of the ManipulabilityIndex: the voters are grouped by situation (their current and
+      truthful type), so after a move the hopeless voters are found once per situation in numpy and a failure marks
+      all the voters in the same situation at once. A voter is drawn among the other ones by drawing a situation
+      with probability proportional to its number of voters, so the voter that manipulates next has the same
+      distribution as in voting_iteration (but the random draws, and so the single runs, are not the same).
+So a round costs O(m) plus O(number of situations) in numpy plus O(2^m m) for every own score vector of a voter,
+plus the manipulation moves themselves, whatever the number of voters (the situations are at most the distinct
+preference pairs of the voters, far fewer than n when the preferences repeat).
+"""
+
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from main.data_processing import get_scores_of_voters, get_tie_breaking_ranks, get_winners_from_score_vector
+from main.deadline import Deadline
+from main.manipulability import ManipulabilityIndex, get_winner_table
+from main.manipulation import Manipulation
+from main.manipulation_cache import ManipulationCache, manipulation_key
+from main.preference import Preference, as_preference
+from main.profile import Profile
+from main.tracing import SearchTracer
+
+INITIAL_TYPE_CAPACITY = 64  # the arrays of the types grow (doubling) as new preferences come up
+
+
+class Electorate(Profile):
+    """
+    Mutable profile of n voters under a single rule (k, method), kept in arrays: the type (distinct preference) of
+    every voter, the scores every type gives, the number of voters of every type and the total scores of the
+    alternatives. 'set_preference' changes the preference of a voter in place in O(m).
+
+    It can be given to Manipulation like a Profile. 'with_preference' returns a ChangedElectorate, a view of the
+    electorate with a single voter changed, which is only valid until the electorate itself changes.
+    """
+
+    __slots__ = ('k', 'method', 'type_of_voter', '_type_scores', '_type_counts', '_total_scores')
+
+    def __init__(self, preferences: Sequence[Union[Preference, pd.DataFrame, np.ndarray]], k: int, method: str):
+        assert method in ['approval', 'veto']
+        self.k = k
+        self.method = method
+        self.types: List[Preference] = []
+        self._type_of_key: Dict[bytes, int] = {}
+        self._num_voters = len(preferences)
+        num_of_alternatives = len(as_preference(preferences[0]))
+        self._type_scores = np.zeros((INITIAL_TYPE_CAPACITY, num_of_alternatives), dtype=np.int64)
+        self._type_counts = np.zeros(INITIAL_TYPE_CAPACITY, dtype=np.int64)
+        self.type_of_voter = np.array([self._get_type(as_preference(pref)) for pref in preferences], dtype=np.int64)
+        np.add.at(self._type_counts, self.type_of_voter, 1)
+        self._total_scores = self._type_counts @ self._type_scores
+
+    def _get_type(self, pref: Preference) -> int:
+        """
+        The type of the preference. Preferences that are new to the electorate become a new type.
+        """
+        type_ = self._type_of_key.get(pref.key)
+        if type_ is None:
+            type_ = len(self.types)
+            if type_ == len(self._type_counts):
+                self._type_scores = np.concatenate([self._type_scores, np.zeros_like(self._type_scores)])
+                self._type_counts = np.concatenate([self._type_counts, np.zeros_like(self._type_counts)])
+            self._type_of_key[pref.key] = type_
+            self.types.append(pref)
+            self._type_scores[type_] = get_scores_of_voters(pref.matrix, self.k, self.method)
+        return type_
+
+    def __len__(self) -> int:
+        return self._num_voters
+
+    def __getitem__(self, voter: int) -> Preference:
+        return self.types[self.type_of(voter)]
+
+    def __iter__(self) -> Iterator[Preference]:
+        return (self.types[type_] for type_ in self.type_of_voter.tolist())
+
+    def __repr__(self) -> str:
+        return f'Electorate(voters={len(self)}, types={self.num_types}, k={self.k}, method={self.method})'
+
+    def __reduce__(self) -> tuple:
+        return Electorate, (list(self), self.k, self.method)
+
+    def __copy__(self) -> 'Electorate':
+        return Electorate(list(self), self.k, self.method)
+
+    def __deepcopy__(self, memo: dict) -> 'Electorate':
+        return self.__copy__()
+
+    @property
+    def counts(self) -> np.ndarray:
+        return self._type_counts[:self.num_types].copy()
+
+    def type_of(self, voter: int) -> int:
+        if not 0 <= voter < self._num_voters:
+            raise IndexError(voter)
+        return int(self.type_of_voter[voter])
+
+    def voters_of_type(self, type_: int) -> List[int]:
+        return np.flatnonzero(self.type_of_voter == type_).tolist()
+
+    def type_scores(self, type_: int) -> np.ndarray:
+        """
+        The scores that every voter of the type gives to the alternatives.
+        """
+        return self._type_scores[type_]
+
+    def scores(self, k: int, method: str) -> np.ndarray:
+        assert (k, method) == (self.k, self.method), 'an electorate only keeps the scores of its own rule'
+        return self._total_scores
+
+    def get_winners(self, ranks: np.ndarray) -> Tuple[int, List[int]]:
+        """
+        (winner, possible_winners) as in 'evaluate', with the output of 'get_tie_breaking_ranks'.
+        """
+        return get_winners_from_score_vector(self._total_scores, ranks)
+
+    def set_preference(self, voter: int, pref: Union[Preference, pd.DataFrame, np.ndarray]):
+        """
+        Changes the preference of the voter in place and updates the scores with the difference of its two preferences.
+        """
+        old_type = self.type_of(voter)
+        new_type = self._get_type(as_preference(pref))
+        if new_type == old_type:
+            return
+        self._type_counts[old_type] -= 1
+        self._type_counts[new_type] += 1
+        self._total_scores += self._type_scores[new_type] - self._type_scores[old_type]
+        self.type_of_voter[voter] = new_type
+
+    def with_preference(self, voter: int, pref: Union[Preference, pd.DataFrame, np.ndarray]) -> 'ChangedElectorate':
+        return ChangedElectorate(self, voter, as_preference(pref))
+
+
+class ChangedElectorate(Profile):
+    """
+    The electorate with the preference of a single voter changed, without changing the electorate itself (see
+    Electorate.with_preference). It only supports what the manipulation moves need: the preferences of the voters and
+    the evaluation of the profile.
+    """
+
+    __slots__ = ('electorate', 'voter', 'preference')
+
+    def __init__(self, electorate: Electorate, voter: int, preference: Preference):
+        self.electorate = electorate
+        self.voter = voter
+        self.preference = preference
+
+    def __len__(self) -> int:
+        return len(self.electorate)
+
+    def __getitem__(self, voter: int) -> Preference:
+        return self.preference if voter == self.voter else self.electorate[voter]
+
+    def __iter__(self) -> Iterator[Preference]:
+        return (self[voter] for voter in range(len(self)))
+
+    def __repr__(self) -> str:
+        return f'ChangedElectorate({self.electorate!r}, voter={self.voter})'
+
+    def __reduce__(self) -> tuple:
+        return Profile, (list(self), )
+
+    def scores(self, k: int, method: str) -> np.ndarray:
+        return self.electorate.scores(k, method) - self.electorate.type_scores(self.electorate.type_of(self.voter)) + \
+            get_scores_of_voters(self.preference.matrix, k, method)
+
+    def with_preference(self, voter: int, pref: Union[Preference, pd.DataFrame, np.ndarray]) -> 'ChangedElectorate':
+        assert voter == self.voter, 'only the preference of the same voter can be changed again'
+        return self.electorate.with_preference(voter, pref)
+
+
+class SituationIndex(ManipulabilityIndex):
+    """
+    The ManipulabilityIndex of main/manipulability.py for an electorate, with the voters grouped by situation, i.e. by
+    their current and their truthful type: all the voters in the same situation can make the same alternatives win and
+    prefer them to the winner in the same way, so either all of them or none of them can manipulate. Instead of marking
+    the voters, 'update' marks the situations that are hopeless in the new profile (in numpy, once per situation) and
+    'record_failures' the ones of the voters that failed. 'draw' picks a voter uniformly at random among the voters of
+    the other situations: a situation with probability proportional to its number of voters and then one of its
+    voters. So neither of them goes through the voters.
+    """
+
+    def __init__(self, k: int, method: str, alphabetical_order: dict, electorate: Electorate,
+                 truthful_profile: Profile):
+        super().__init__(k, method, alphabetical_order, truthful_profile)
+        self.electorate = electorate
+        self.members: List[List[int]] = []  # the voters of every situation
+        self._situation_of_key: Dict[Tuple[int, int], int] = {}
+        self._truthful_type_of_situation: List[int] = []
+        self._own_scores_id_of_situation: List[int] = []
+        self._own_scores_ids: Dict[bytes, int] = {}
+        self._own_scores_vectors: List[np.ndarray] = []
+        self._situation_of_voter: List[int] = [0] * len(electorate)
+        self._position_of_voter: List[int] = [0] * len(electorate)  # the position of the voter in its situation
+        self._truthful_matrices = np.stack([pref.matrix for pref in truthful_profile.types])
+        self._preferred_to: Dict[int, np.ndarray] = {}
+        self._weights = np.zeros(0, dtype=np.int64)  # the number of voters of the situations that may manipulate
+        for voter in range(len(electorate)):
+            self._add(voter)
+
+    def _get_situation(self, current_type: int, truthful_type: int) -> int:
+        situation = self._situation_of_key.get((current_type, truthful_type))
+        if situation is None:
+            situation = len(self.members)
+            self._situation_of_key[(current_type, truthful_type)] = situation
+            self.members.append([])
+            self._truthful_type_of_situation.append(truthful_type)
+            own_scores = self.electorate.type_scores(current_type)
+            own_scores_id = self._own_scores_ids.setdefault(own_scores.tobytes(), len(self._own_scores_vectors))
+            if own_scores_id == len(self._own_scores_vectors):
+                self._own_scores_vectors.append(own_scores.copy())
+            self._own_scores_id_of_situation.append(own_scores_id)
+        return situation
+
+    def _add(self, voter: int):
+        situation = self._get_situation(self.electorate.type_of(voter), self.truthful_profile.type_of(voter))
+        self._situation_of_voter[voter] = situation
+        self._position_of_voter[voter] = len(self.members[situation])
+        self.members[situation].append(voter)
+
+    def _swap_to_end(self, voter: int):
+        members = self.members[self._situation_of_voter[voter]]
+        position = self._position_of_voter[voter]
+        members[position], members[-1] = members[-1], voter
+        self._position_of_voter[members[position]] = position
+        self._position_of_voter[voter] = len(members) - 1
+
+    def move(self, voter: int):
+        """
+        Moves the voter to the situation of its new preference in the electorate, in O(1).
+        """
+        self._swap_to_end(voter)
+        self.members[self._situation_of_voter[voter]].pop()
+        self._add(voter)
+
+    def __contains__(self, voter: int) -> bool:
+        return self._weights[self._situation_of_voter[voter]] == 0
+
+    def __len__(self) -> int:
+        return len(self.electorate) - int(self._weights.sum())
+
+    @property
+    def failed(self) -> set:
+        return {voter for situation in np.flatnonzero(self._weights == 0).tolist() for voter in self.members[situation]}
+
+    def preferred_to(self, winner: int) -> np.ndarray:
+        """
+        Whether every truthful type prefers every alternative to the winner, as a (number_of_types, m) bool array.
+        """
+        if winner not in self._preferred_to:
+            self._preferred_to[winner] = self._truthful_matrices[:, :, winner] == 1
+        return self._preferred_to[winner]
+
+    def update(self, profile: Electorate, winner: int = None, possible_winners: List[int] = None):
+        """
+        Starts over for a new profile (the electorate after a change): only the situations that are hopeless in it
+        are marked. The winner and the possible winners of the profile are calculated if they are not given.
+        """
+        if winner is None:
+            winner, possible_winners, _ = profile.evaluate(self.k, self.method, self.alphabetical_order)
+        sizes = np.fromiter(map(len, self.members), dtype=np.int64, count=len(self.members))
+        own_scores_ids = np.array(self._own_scores_id_of_situation, dtype=np.int64)
+        winnable = np.ones((len(self._own_scores_vectors), len(self.alphabetical_order)), dtype=bool)
+        if self.contributions is not None:
+            scores = profile.scores(self.k, self.method)
+            for own_scores_id in np.unique(own_scores_ids[sizes > 0]).tolist():
+                table = get_winner_table(scores - self._own_scores_vectors[own_scores_id], self.contributions,
+                                         self.ranks)
+                winnable[own_scores_id] = np.bincount(table, minlength=len(self.alphabetical_order)) > 0
+        wanted = self.preferred_to(winner) & np.isin(np.arange(len(self.alphabetical_order)), possible_winners)
+        can_manipulate = (winnable[own_scores_ids] & wanted[self._truthful_type_of_situation]).any(axis=1)
+        self._weights = np.where(can_manipulate, sizes, 0)
+
+    def record_failures(self, voters: list):
+        """
+        Records that the given voters, and so all the voters in the same situation, cannot manipulate the current
+        profile.
+        """
+        for voter in voters:
+            self._weights[self._situation_of_voter[voter]] = 0
+
+    def draw(self, voter_to_exclude: Optional[int] = None) -> Optional[int]:
+        """
+        A voter (other than voter_to_exclude) drawn uniformly at random among the ones that may manipulate the current
+        profile, or None if there is none.
+        """
+        weights = self._weights
+        excluded_situation = None
+        if voter_to_exclude is not None and voter_to_exclude not in self:
+            excluded_situation = self._situation_of_voter[voter_to_exclude]
+            self._swap_to_end(voter_to_exclude)  # the excluded voter is last and is not drawn
+            weights = weights.copy()
+            weights[excluded_situation] -= 1
+        cumulative_weights = np.cumsum(weights)
+        if not len(cumulative_weights) or cumulative_weights[-1] == 0:
+            return None
+        situation = int(np.searchsorted(cumulative_weights, np.random.randint(cumulative_weights[-1]), side='right'))
+        size = len(self.members[situation]) - (situation == excluded_situation)
+        return self.members[situation][np.random.randint(size)]
+
+
+def large_electorate_iteration(
+    all_preferences,
+    verbose,
+    k,
+    method,
+    alphabetical_order,
+    do_additions,
+    do_omissions,
+    do_flips,
+    time_limit,
+    move_time_limit: float = None,
+    deadline: Deadline = None,
+    search: str = 'levels',
+    cache: ManipulationCache = None,
+    use_oracle: bool = True,
+    tracer: SearchTracer = None
+) -> Union[str, Tuple[bool, Dict[int, Tuple[int, int]]]]:
+    """
+    The same as voting_iteration (see main/orchestration.py, all the arguments and the result are the same), in the
+    large-electorate mode described above.
+    """
+    profile_deadline = Deadline(time_limit, parent=deadline)
+    truthful_profile = Profile.from_preferences(all_preferences)
+    electorate = Electorate(truthful_profile, k, method)
+    ranks = get_tie_breaking_ranks(alphabetical_order)
+
+    num_rounds = 0
+    res_dict = {}
+    failed_manipulators = SituationIndex(k, method, alphabetical_order, electorate, truthful_profile)
+    manipulator_voter = None
+    profile_changed = True
+    while True:
+        if profile_changed:  # every voter may be able to manipulate the new profile
+            winner, possible_winners = electorate.get_winners(ranks)
+            scores_of_alternatives = {
+                str(alternative): int(score) for alternative, score in enumerate(electorate.scores(k, method).tolist())
+            }
+            if tracer is not None:
+                tracer.evaluations += 1
+            failed_manipulators.update(electorate, winner, possible_winners)
+            profile_changed = False
+        if profile_deadline.expired():
+            print('skipping profile due to slowness')
+            return 'hard_exit'
+        random_voter = failed_manipulators.draw(manipulator_voter)
+        if random_voter is None:
+            print(f'Convergence is achieved in {num_rounds} rounds!')
+            convergence_happened = True
+            break
+        elif verbose:
+            print(f'\nRandom voter chosen: {random_voter}')
+
+        found_in_cache, result = False, None
+        if cache is not None:
+            cache_key = manipulation_key(
+                electorate[random_voter], truthful_profile[random_voter], scores_of_alternatives, winner,
+                alphabetical_order, k, method, do_additions, do_omissions, do_flips, search, use_oracle
+            )
+            found_in_cache, result = cache.lookup(cache_key)
+            if found_in_cache and tracer is not None:
+                tracer.cache_hits += 1
+
+        if not found_in_cache:
+            man = Manipulation(
+                all_preferences=electorate,
+                preference_idx=random_voter,
+                winner=winner,
+                truthful_profile=truthful_profile,
+                possible_winners=possible_winners,
+                scores_of_alternatives=scores_of_alternatives,
+                alphabetical_order_of_alternatives=alphabetical_order,
+                method=method,
+                k=k,
+                do_additions=do_additions,
+                do_omissions=do_omissions,
+                do_flips=do_flips,
+                verbose=verbose,
+                hard_exit_time_limit=time_limit,
+                deadline=profile_deadline.child(move_time_limit),
+                search=search,
+                use_oracle=use_oracle,
+                tracer=tracer
+            )
+
+            move_start = time.perf_counter()
+            result = man.manipulation_move()
+            if tracer is not None:
+                tracer.move_seconds.append(time.perf_counter() - move_start)
+            if result == 'hard_exit':
+                return 'hard_exit'
+            if result is not None:
+                result = result[0][random_voter], result[1]  # (new preference of the voter, new winner)
+            if cache is not None:
+                cache.put(cache_key, result)
+
+        if result is not None:
+            electorate.set_preference(random_voter, result[0])
+            failed_manipulators.move(random_voter)
+            res_dict[num_rounds] = (result[1], random_voter)
+            num_rounds += 1
+            if verbose:
+                print(f'num of round {num_rounds}')
+            manipulator_voter = random_voter
+            profile_changed = True
+        else:
+            if verbose:
+                print(f'Voter {random_voter} (and the ones in the same situation) cannot manipulate.')
+            failed_manipulators.record_failures([random_voter])
+
+    return convergence_happened, res_dict
@@ -0,0 +1,105 @@
+"""
+This module includes the index of the voters that are known to be unable to manipulate.
+
+A voter can only make an alternative p win if p is the winner for at least one of the 0/1 score vectors the voter can
+contribute, i.e. if p is in the winner table W(base) = [winner(base + x) for all x in {0, 1}^m], where base are the
+total scores without the voter. Every check that can make a manipulation move succeed (the would-win checks and the
+goal of the search) is a lookup in this table. So a voter that does not truthfully prefer any possible winner of its
+table to the current winner cannot manipulate, and the index marks it as failed without running its manipulation
+move. The table only depends on the voter's own scores, so it is calculated once per preference type of the profile.
+
+Every successful move changes the winner and with it the situation of every voter, so after a move the index starts
+over from the voters that are hopeless in the new profile. Skipping them does not change the distribution of the next
+voter that manipulates, since probing them would just mark them as failed.
+"""
+
+import itertools
+from typing import Dict, Optional, Set
+
+import numpy as np
+
+from main.data_processing import get_scores_of_voters, get_tie_breaking_ranks, get_winners_batch
+from main.preference import Preference
+from main.profile import Profile
+
+MAX_ALTERNATIVES_IN_INDEX = 12  # the tables have 2^m entries; for more alternatives no voter is marked in advance
+
+
+def get_winner_table(scores_without_voter: np.ndarray, contributions: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+    """
+    The winner for every possible contribution of the voter to the scores.
+    Args:
+        scores_without_voter: The total scores of the alternatives without the voter.
+        contributions: A (2^m, m) array with all the 0/1 score vectors.
+        ranks: The position of every alternative in the tie-breaking order (the lowest wins the ties).
+    """
+    return get_winners_batch(scores_without_voter + contributions, ranks)
+
+
+class ManipulabilityIndex:
+    """
+    The voters that cannot manipulate the current profile: the ones that failed to and the ones that are hopeless (see
+    above). Supports 'voter in index', like the list of the failed voters that it replaces.
+    """
+
+    def __init__(self, k: int, method: str, alphabetical_order: dict, truthful_profile: Profile):
+        self.k = k
+        self.method = method
+        self.alphabetical_order = alphabetical_order
+        self.truthful_profile = truthful_profile
+        num_of_alternatives = len(alphabetical_order)
+        self.ranks = get_tie_breaking_ranks(alphabetical_order)
+        self.contributions = None
+        if num_of_alternatives <= MAX_ALTERNATIVES_IN_INDEX:
+            self.contributions = np.array(list(itertools.product([0, 1], repeat=num_of_alternatives)), dtype=np.int64)
+        self._failed: Set[int] = set()
+        self._own_scores: Dict[bytes, np.ndarray] = {}
+
+    @property
+    def failed(self) -> Set[int]:
+        return set(self._failed)
+
+    def __contains__(self, voter: int) -> bool:
+        return voter in self._failed
+
+    def __len__(self) -> int:
+        return len(self._failed)
+
+    def own_scores(self, pref: Preference) -> np.ndarray:
+        if pref.key not in self._own_scores:
+            self._own_scores[pref.key] = get_scores_of_voters(pref.matrix, self.k, self.method).astype(np.int64)
+        return self._own_scores[pref.key]
+
+    def winnable_alternatives(self, pref: Preference, profile: Profile) -> Optional[Set[int]]:
+        """
+        The alternatives that a voter with the given preference can make win (at most), or None if it is not known.
+        """
+        if self.contributions is None:
+            return None
+        table = get_winner_table(profile.scores(self.k, self.method) - self.own_scores(pref), self.contributions,
+                                 self.ranks)
+        return set(np.unique(table).tolist())
+
+    def update(self, profile: Profile):
+        """
+        Starts over for a new profile: only the voters that are hopeless in it are marked as failed.
+        """
+        winner, possible_winners, _ = profile.evaluate(self.k, self.method, self.alphabetical_order)
+        self._failed = set()
+        hopeless: Dict[tuple, bool] = {}  # (current type, truthful type) -> whether hopeless
+        for voter in range(len(profile)):
+            types = (profile.type_of(voter), self.truthful_profile.type_of(voter))
+            if types not in hopeless:
+                winnable = self.winnable_alternatives(profile[voter], profile)
+                truthful_preference = self.truthful_profile[voter]
+                hopeless[types] = winnable is not None and not any(
+                    truthful_preference[p, winner] == 1 for p in possible_winners if p in winnable
+                )
+            if hopeless[types]:
+                self._failed.add(voter)
+
+    def record_failures(self, voters: list):
+        """
+        Records that the given voters cannot manipulate the current profile.
+        """
+        self._failed.update(voters)
@@ -3,13 +3,13 @@ This module includes the main logic behind the "manipulation" action. It is basi
 defines how an agent votes in different scenaria and explores efficiently the different options of her.
 """
 
-import copy
 import os
 import random
 import sys
 import time
 from typing import List, Tuple, Union
 
+import numpy as np
 import pandas as pd
 '''
 Simple patch that fixes imports issues in windows OS.
@@ -21,8 +21,18 @@ if curr_path.split('/iterative_voting/main')[0] not in sys.path:
 from iterative_voting.main.manipulation_utils import find_matrices_with_score, get_children_generation_options, \
     one_cost_children_generation, \
     two_cost_children_generation
-from .data_processing import check_transitivity, evaluate_profile, get_score_of_alternative_by_voter, \
-    get_winners_from_scores
+from .data_processing import check_transitivity, get_score_of_alternative_by_voter, get_scores_of_voters, \
+    get_tie_breaking_ranks, get_winners_batch, get_winners_from_scores, stack_profile
+from main.catalogue import get_catalogue, get_preference_id
+from main.deadline import Deadline, DeadlineExceeded
+from main.preference import Preference
+from main.oracle import get_oracle, score_vector_indices
+from main.profile import Profile
+from main.search import ManipulationSearch, get_winning_scores
+from main.tracing import SearchTracer
+from main.transitivity import MAX_ALTERNATIVES_IN_BATCH, check_transitivity_batch
+
+CANDIDATE_BATCH_SIZE = 4096  # the candidate preferences of a tree level are evaluated in batches of this size
 
 
 class Manipulation:
@@ -44,10 +54,10 @@ class Manipulation:
 
     def __init__(
         self,
-        all_preferences: List[pd.DataFrame],
+        all_preferences: List[Union[Preference, pd.DataFrame]],
         preference_idx: int,  # The index for the 'all_preferences' list that corresponds to the preference of the
         # specific voter.
-        truthful_profile: List[pd.DataFrame],
+        truthful_profile: List[Union[Preference, pd.DataFrame]],
         winner: int,
         possible_winners: List[int],
         scores_of_alternatives: dict,
@@ -58,30 +68,55 @@ class Manipulation:
         do_omissions: bool,
         do_flips: bool,
         verbose: bool,
-        hard_exit_time_limit: int
+        hard_exit_time_limit: int,
+        deadline: Deadline = None,
+        search: str = 'levels',
+        use_oracle: bool = True,
+        tracer: SearchTracer = None
     ):
         self.init_total_time = time.time()
-        self.all_preferences = all_preferences  # These are the preferences of all the voters in a list,
-        # in the beginning of the current manipulation round.
+        self.all_preferences = Profile.from_preferences(all_preferences)  # These are the preferences of all the
+        # voters, in the beginning of the current manipulation round. The profile is never changed in place.
         self.preference_idx = preference_idx
-        self.preference = all_preferences[preference_idx]  # The preference of the specific voter.
-        self.truthful_profile = truthful_profile  # This is the original profile, before any manipulation of any voter.
+        self.preference = self.all_preferences[preference_idx]  # The preference of the specific voter.
+        self.truthful_profile = Profile.from_preferences(truthful_profile)  # This is the original profile,
+        # before any manipulation of any voter.
         self.winner = winner
         self.possible_winners = possible_winners
         self.scores_of_alternatives = scores_of_alternatives  # The total scores of the alternatives in the profile,
         # not the voter specific scores.
+        self.scores_without_voter = np.array([
+            scores_of_alternatives[str(alternative)] for alternative in range(len(self.preference))
+        ]) - get_scores_of_voters(self.preference.matrix, k, method)  # The total scores of the alternatives if the
+        # specific voter is left out. Any candidate preference of the voter only adds its own scores to these.
         self.method = method
         self.k = k
         self.alphabetical_order_of_alternatives = alphabetical_order_of_alternatives
-        self.all_generated_matrices: List[Tuple[int, list, pd.DataFrame]] = [(0, [], self.preference)]  # All the
+        self.ranks = get_tie_breaking_ranks(alphabetical_order_of_alternatives)  # see get_winners_batch
+        self.all_generated_matrices: List[Tuple[int, list, Preference]] = [(0, [], self.preference)]  # All the
         # matrices
         # generated as children while exploring the tree of possible manipulations + the original matrix (
         # preference). (cost-label_of_child, indices_changed_from_the_parent, child)
+        self.visited_matrices = {self.preference.key}  # The keys (see Preference.key) of all the matrices in
+        # all_generated_matrices, i.e. of the previous levels of the tree, which the children generations skip.
+        self.level_matrices = {}  # The children generated so far in the current level of the tree by their key (see
+        # drop_generated_matrices), which are generated once with the merged indices_changed_from_the_parent.
         self.do_additions = do_additions
         self.do_omissions = do_omissions
         self.do_flips = do_flips
         self.verbose = verbose  # whether to print debugging messages or not.
         self.hard_exit_time_limit = hard_exit_time_limit
+        self.deadline = deadline if deadline is not None else Deadline(hard_exit_time_limit)  # The search gives up
+        # (i.e. the move returns "hard_exit") when this passes. voting_iteration gives the deadline of the profile
+        # here, otherwise the move alone has hard_exit_time_limit seconds.
+        assert search in ['astar', 'levels']
+        self.search = search  # 'levels': the original search of the paper that generates the tree of useful changes
+        # level by level (tree_generation). 'astar': the cheapest manipulation is found with the A* search of search.py,
+        # which may find other (cheaper) manipulations than the original search, so it has to be asked for.
+        self.oracle = None  # The precomputed cheapest manipulations that replace the A* search for m <= 5.
+        if search == 'astar' and use_oracle:
+            self.oracle = get_oracle(len(self.preference), k, method, do_additions, do_omissions, do_flips)
+        self.tracer = tracer  # If given, the searches report what they do there (see main/tracing.py).
 
     def check_for_possible_manipulation(self) -> bool:
         """
@@ -91,7 +126,7 @@ class Manipulation:
             Whether there is at least one such p.
         """
         for p in self.possible_winners:
-            if self.preference.loc[p, self.winner] == 1:
+            if self.preference[p, self.winner] == 1:
                 return True
         return False
 
@@ -101,34 +136,37 @@ class Manipulation:
         alternative to the least preferred one according to the preference of the voter.
         """
         sorted_alternatives = []
-        pref = self.truthful_profile[self.preference_idx].loc[alternatives, alternatives]
+        truthful_preference = self.truthful_profile[self.preference_idx]
+        remaining = list(alternatives)
         while True:
-            top_ones = pref[pref.apply(lambda row: -1 not in row.values, axis=1)].index.values
-            if top_ones.size > 0:
+            top_ones = [
+                alt for alt in remaining if not any(truthful_preference[alt, other] == -1 for other in remaining)
+            ]
+            if top_ones:
                 sorted_alternatives.append(top_ones[0])
-                pref = pref.drop(top_ones[0]).drop(columns=[top_ones[0]])
+                remaining.remove(top_ones[0])
             else:
-                sorted_alternatives += pref.index.values.tolist()
+                sorted_alternatives += remaining
                 break
 
         assert set(alternatives) == set(sorted_alternatives)
         return sorted_alternatives
 
-    def manipulation_move(self) -> Union[None, Tuple[List[pd.DataFrame], int], str]:
+    def manipulation_move(self) -> Union[None, Tuple[Profile, int], str]:
         """
         Main functionality which checks all the scenaria of possible manipulation of the result by the specific voter
         and if the voter manages to manipulate it returns the voter's updated preference, otherwise returns None.
 
         Returns:
             None if Manipulation cannot happen or the new profile and the winner in a tuple if manipulation happens.
-            Also if it takes more than 30' to work on this profile it returns a string saying "hard_exit"
+            Also if the deadline passes while working on this profile it returns a string saying "hard_exit"
         """
         # alternatives_to_check are all the possible winners that the current voter truthfully prefers to the profile
         # winner (self.w)
         if self.verbose:
             print('Starting manipulation move')
         alternatives_to_check = [
-            x for x in self.possible_winners if self.truthful_profile[self.preference_idx].loc[x, self.winner] == 1
+            x for x in self.possible_winners if self.truthful_profile[self.preference_idx][x, self.winner] == 1
         ]
         sorted_alternatives = self.get_alternatives_order(alternatives_to_check)
         winner_score = get_score_of_alternative_by_voter(self.preference, self.method, self.k, self.winner)
@@ -138,8 +176,8 @@ class Manipulation:
             p_score = get_score_of_alternative_by_voter(self.preference, self.method, self.k, p)
 
             if self.k == len(self.preference) - 1:
-                all_prefs = list(copy.deepcopy(self.all_preferences))
-                scores_of_alternatives = copy.deepcopy(self.scores_of_alternatives)
+                all_prefs = self.all_preferences
+                scores_of_alternatives = dict(self.scores_of_alternatives)
 
                 if self.method == 'approval':
                     if winner_score == 0:
@@ -151,16 +189,14 @@ class Manipulation:
                                 scores_of_alternatives, self.alphabetical_order_of_alternatives
                             )[0] == p
                             if would_win:
-                                dft = copy.deepcopy(all_prefs[self.preference_idx])
-                                if ((dft.loc[self.winner] == 0).sum() != 0 and
-                                    not self.do_additions) or ((dft.loc[self.winner] == 1).sum() != 0 and
-                                                               not self.do_flips):
+                                dft = all_prefs[self.preference_idx]
+                                if (dft.num_zeros(self.winner) != 0 and
+                                    not self.do_additions) or (dft.num_ones(self.winner) != 0 and not self.do_flips):
                                     continue
                                 else:
                                     winner, dft = self.put_winner_on_bottom(all_prefs, dft)
                                     if winner == p:
-                                        all_prefs[self.preference_idx] = dft
-                                        return all_prefs, winner
+                                        return all_prefs.with_preference(self.preference_idx, dft), winner
                                     else:
                                         continue
                             else:
@@ -187,15 +223,13 @@ class Manipulation:
                             )[0] == p
                             if would_win:
                                 dft = all_prefs[self.preference_idx]
-                                if ((dft.loc[self.winner] == 0).sum() != 0 and
-                                    not self.do_additions) or ((dft.loc[self.winner] == 1).sum() != 0 and
-                                                               not self.do_flips):
+                                if (dft.num_zeros(self.winner) != 0 and
+                                    not self.do_additions) or (dft.num_ones(self.winner) != 0 and not self.do_flips):
                                     continue
                                 else:
                                     winner, dft = self.put_winner_on_bottom(all_prefs, dft)
                                     if winner == p:
-                                        all_prefs[self.preference_idx] = dft
-                                        return all_prefs, winner
+                                        return all_prefs.with_preference(self.preference_idx, dft), winner
                                     else:
                                         continue
                             else:
@@ -212,11 +246,11 @@ class Manipulation:
                             )[0] == p
                             if would_win:
                                 dft = all_prefs[self.preference_idx]
-                                if ((dft.loc[p] == 0).sum() != 0 and
-                                    not self.do_additions) or ((dft.loc[p] == -1).sum() != 0 and not self.do_flips):
+                                if (dft.num_zeros(p) != 0 and
+                                    not self.do_additions) or (dft.num_minus_ones(p) != 0 and not self.do_flips):
                                     continue
                                 else:
-                                    winner = self.put_p_on_top(all_prefs, dft, p)
+                                    all_prefs, winner = self.put_p_on_top(all_prefs, dft, p)
                                     return all_prefs, winner
                             else:
                                 continue
@@ -242,11 +276,11 @@ class Manipulation:
                             )[0] == p
                             if would_win:
                                 dft = all_prefs[self.preference_idx]
-                                if ((dft.loc[p] == 0).sum() != 0 and
-                                    not self.do_additions) or ((dft.loc[p] == -1).sum() != 0 and not self.do_flips):
+                                if (dft.num_zeros(p) != 0 and
+                                    not self.do_additions) or (dft.num_minus_ones(p) != 0 and not self.do_flips):
                                     continue
                                 else:
-                                    winner = self.put_p_on_top(all_prefs, dft, p)
+                                    all_prefs, winner = self.put_p_on_top(all_prefs, dft, p)
                                     return all_prefs, winner
                             else:
                                 continue
@@ -259,7 +293,7 @@ class Manipulation:
             if p_score == 0 and winner_score == 0:
                 if self.verbose:
                     print(f'p_score={p_score}, winner_score={winner_score}')
-                scores_of_alternatives = copy.deepcopy(self.scores_of_alternatives)
+                scores_of_alternatives = dict(self.scores_of_alternatives)
                 # check whether p would win with score 1
                 scores_of_alternatives[str(p)] += 1
                 would_win = get_winners_from_scores(scores_of_alternatives,
@@ -279,7 +313,7 @@ class Manipulation:
                 if self.verbose:
                     print(f'p_score={p_score}, winner_score={winner_score}')
                 # check whether p would win if winner had score 0
-                scores_of_alternatives = copy.deepcopy(self.scores_of_alternatives)
+                scores_of_alternatives = dict(self.scores_of_alternatives)
                 scores_of_alternatives[str(self.winner)] -= 1
                 potential_winners = [
                     get_winners_from_scores(scores_of_alternatives, self.alphabetical_order_of_alternatives)[0]
@@ -329,7 +363,7 @@ class Manipulation:
                 # The logic of this section is the same as above
                 # check whether p would win if winner had score 0
 
-                scores_of_alternatives = copy.deepcopy(self.scores_of_alternatives)
+                scores_of_alternatives = dict(self.scores_of_alternatives)
                 scores_of_alternatives[str(self.winner)] -= 1
                 potential_winners = [
                     get_winners_from_scores(scores_of_alternatives, self.alphabetical_order_of_alternatives)[0]
@@ -388,26 +422,29 @@ class Manipulation:
         return None
 
     def put_winner_on_bottom(self, all_prefs, dft):
-        dft.loc[self.winner, :] = -1
-        dft.loc[:, self.winner] = 1
-        dft.loc[self.winner, self.winner] = 0
+        dft = dft.with_alternative_on_bottom(self.winner)
+        if self.tracer is not None:
+            self.tracer.transitivity_checks += 1
         assert check_transitivity(dft)
-        new_prefs = copy.deepcopy(all_prefs)
-        new_prefs[self.preference_idx] = dft
-        winner, *_ = evaluate_profile(new_prefs, self.k, self.method, self.alphabetical_order_of_alternatives)
+        new_prefs = all_prefs.with_preference(self.preference_idx, dft)
+        if self.tracer is not None:
+            self.tracer.evaluations += 1
+        winner, *_ = new_prefs.evaluate(self.k, self.method, self.alphabetical_order_of_alternatives)
         return winner, dft
 
     def put_p_on_top(self, all_prefs, dft, p):
-        dft.loc[p, :] = 1
-        dft.loc[:, p] = -1
-        dft.loc[p, p] = 0
+        dft = dft.with_alternative_on_top(p)
+        if self.tracer is not None:
+            self.tracer.transitivity_checks += 1
         assert check_transitivity(dft)
-        all_prefs[self.preference_idx] = dft
-        winner, *_ = evaluate_profile(all_prefs, self.k, self.method, self.alphabetical_order_of_alternatives)
+        all_prefs = all_prefs.with_preference(self.preference_idx, dft)
+        if self.tracer is not None:
+            self.tracer.evaluations += 1
+        winner, *_ = all_prefs.evaluate(self.k, self.method, self.alphabetical_order_of_alternatives)
         assert winner == p
-        return winner
+        return all_prefs, winner
 
-    def tree_generation(self, p, potential_winners: list = None) -> Tuple[List[pd.DataFrame], bool, bool]:
+    def tree_generation(self, p, potential_winners: list = None) -> Tuple[Profile, bool, bool]:
         """
         Given an alternative p that is a possible winner and is preferred by our voter to the current winner, we want
         to check whether the voter can make p win. In order to do this, we generate matrices that differ from the
@@ -424,40 +461,99 @@ class Manipulation:
         may induce a transitive matrix that makes p win in following levels.
 
         Returns:
-
+            (all_prefs, manipulation_happened, hard_exit), hard_exit being True if the deadline passed during the
+            search.
         """
         if self.verbose:
             print(f'Alternative {p} is preferred. Investigating possible manipulation.')
-        all_prefs = list(copy.deepcopy(self.all_preferences))
-        # first generate all the 1-cost children of the original matrix
-        new_preferences = one_cost_children_generation(
-            parent_matrix=self.preference,
-            cost_of_parent_matrix=0,  # this is always the beggining of the tree so the initial cost is 0
-            alternatives_of_interest=list(set([p, self.winner] + potential_winners)),
-            alternatives_of_only_useful_changes=list(set([p, self.winner] + potential_winners)),
-            index_of_p=p,
-            index_of_w=self.winner,
-            rule=self.method,
+        all_prefs = self.all_preferences
+        try:
+            if self.search == 'astar':
+                return self.cheapest_manipulation(all_prefs, p)
+            level_start = time.perf_counter()
+            self.level_matrices = {}
+            # first generate all the 1-cost children of the original matrix
+            new_preferences = one_cost_children_generation(
+                parent_matrix=self.preference,
+                cost_of_parent_matrix=0,  # this is always the beggining of the tree so the initial cost is 0
+                alternatives_of_interest=list(set([p, self.winner] + potential_winners)),
+                alternatives_of_only_useful_changes=list(set([p, self.winner] + potential_winners)),
+                index_of_p=p,
+                index_of_w=self.winner,
+                rule=self.method,
+                matrices_not_to_generate=self.visited_matrices,
+                level_matrices=self.level_matrices,
+                do_additions=self.do_additions,
+                do_omissions=self.do_omissions,
+                deadline=self.deadline,
+                tracer=self.tracer
+            )
+            self.all_generated_matrices += new_preferences
+            self.visited_matrices.update(child.key for _, _, child in new_preferences)
+            all_prefs, manipulation_happened = self.check_if_manipulation_happened(all_prefs, new_preferences, p)
+            if self.tracer is not None:
+                self.tracer.add_nodes(0)
+                self.tracer.add_level_time(1, time.perf_counter() - level_start)
+            if not manipulation_happened:
+                # since the direct one-cost children of the original didn't work, for every child generate the
+                # 1-cost children and the 2-cost children from the previous matrix.
+                all_prefs, manipulation_happened = self.tree_generation_level_1_onwards(
+                    all_prefs, p, potential_winners
+                )
+        except DeadlineExceeded:
+            # stop and totally discard the profile cause it takes too much time
+            print('skipping profile due to slowness')
+            return all_prefs, False, True
+        return all_prefs, manipulation_happened, False
+
+    def cheapest_manipulation(self, all_prefs: Profile, p: int) -> Tuple[Profile, bool, bool]:
+        """
+        Finds the cheapest changes of the voter's preference that give a transitive preference that makes p win with
+        the A* search of search.py. Unlike tree_generation, all the cells are considered, not only the useful ones.
+        For few alternatives the answer is looked up in the oracle (see oracle.py) instead, if there is one.
+        """
+        winning_scores = get_winning_scores(
+            self.scores_without_voter.tolist(), p, self.alphabetical_order_of_alternatives
+        )
+        if self.oracle is not None:
+            if self.tracer is not None:
+                self.tracer.oracle_lookups += 1
+            preference_id = get_preference_id(self.preference)
+            result = self.oracle.cheapest_manipulations(preference_id, score_vector_indices(winning_scores))
+            if result is None:
+                return all_prefs, False, False
+            if self.verbose:
+                print(f'Manipulation happened with cost {result[0]} (oracle)!')
+            new_preference = get_catalogue(len(self.preference)).preference(random.choice(result[1].tolist()))
+            return all_prefs.with_preference(self.preference_idx, new_preference), True, False
+        search = ManipulationSearch(
+            preference=self.preference,
+            winning_scores=winning_scores,
+            k=self.k,
+            method=self.method,
             do_additions=self.do_additions,
-            do_omissions=self.do_omissions
+            do_omissions=self.do_omissions,
+            do_flips=self.do_flips,
+            deadline=self.deadline,
+            tracer=self.tracer
         )
-        self.all_generated_matrices += new_preferences
-        all_prefs, manipulation_happened = self.check_if_manipulation_happened(all_prefs, new_preferences, p)
-        if not manipulation_happened:
-            # since the direct one-cost children of the original didn't work, for every child generate the
-            # 1-cost children and the 2-cost children from the previous matrix.
-            return self.tree_generation_level_1_onwards(all_prefs, p, potential_winners)
-        return all_prefs, manipulation_happened, False
+        result = search.run()
+        if result is None:
+            return all_prefs, False, False
+        if self.verbose:
+            print(f'Manipulation happened with cost {result[0]}!')
+        return all_prefs.with_preference(self.preference_idx, result[1]), True, False
 
-    def tree_generation_level_1_onwards(self, all_prefs: List[pd.DataFrame], p: int,
-                                        potential_winners: list) -> Tuple[List[pd.DataFrame], bool, bool]:
+    def tree_generation_level_1_onwards(self, all_prefs: Profile, p: int,
+                                        potential_winners: list) -> Tuple[Profile, bool]:
         """
 
         """
         if self.verbose:
             print('in tree_generation_level_1_onwards')
         while True:
-            init_time = time.time()
+            level_start = time.perf_counter()
+            self.level_matrices = {}
             assert self.all_generated_matrices
             old_max_cost_so_far = max([x[0] for x in self.all_generated_matrices])
             if old_max_cost_so_far != 0:
@@ -468,47 +564,49 @@ class Manipulation:
             else:
                 matrices_to_examine_cost_2 = find_matrices_with_score(self.all_generated_matrices, old_max_cost_so_far)
                 matrices_to_examine_cost_1 = []
+            if self.tracer is not None:
+                self.tracer.update_frontier(len(matrices_to_examine_cost_1) + len(matrices_to_examine_cost_2))
 
             func_to_use_first = {
                 0: (self.examine_matrices_cost_2, matrices_to_examine_cost_2),
                 1: (self.examine_matrices_cost_1, matrices_to_examine_cost_1)
             }
             order = random.randint(0, 1)
-            all_prefs, manipulation_happened, new_preferences_1, hard_exit = func_to_use_first[order][0](
-                all_prefs, func_to_use_first[order][1], old_max_cost_so_far, p, potential_winners, init_time
-            )
-            if manipulation_happened or hard_exit:
-                break
-            order = 0 if order else 1
-            all_prefs, manipulation_happened, new_preferences_2, hard_exit = func_to_use_first[order][0](
-                all_prefs, func_to_use_first[order][1], old_max_cost_so_far, p, potential_winners, init_time
+            all_prefs, manipulation_happened, new_preferences_1 = func_to_use_first[order][0](
+                all_prefs, func_to_use_first[order][1], old_max_cost_so_far, p, potential_winners
             )
-            if manipulation_happened or hard_exit:
+            if not manipulation_happened:
+                order = 0 if order else 1
+                all_prefs, manipulation_happened, new_preferences_2 = func_to_use_first[order][0](
+                    all_prefs, func_to_use_first[order][1], old_max_cost_so_far, p, potential_winners
+                )
+            if self.tracer is not None:
+                self.tracer.add_level_time(old_max_cost_so_far + 1, time.perf_counter() - level_start)
+            if manipulation_happened:
                 break
 
             self.all_generated_matrices += new_preferences_1 + new_preferences_2
+            self.visited_matrices.update(child.key for _, _, child in new_preferences_1 + new_preferences_2)
             # We exit the while loop  naturally when all relevant cells (resulting from each relevant
             # alternatives) have been changed and no manipulation happened
             if self.all_generated_matrices:
                 new_max_cost_so_far = max([x[0] for x in self.all_generated_matrices])
             else:
                 new_max_cost_so_far = 0
-            if self.verbose:
-                print(f'new_max_cost_so_far: {new_max_cost_so_far}')
-                print(f'iteration took {time.time() - init_time} sec.')
             if new_max_cost_so_far == old_max_cost_so_far:
                 break
-        return all_prefs, manipulation_happened, hard_exit
+        return all_prefs, manipulation_happened
 
     def examine_matrices_cost_2(
-        self, all_prefs, matrices_to_examine_cost_2, old_max_cost_so_far, p, potential_winners, init_time: float
-    ) -> Tuple[List[pd.DataFrame], bool, List[Tuple[int, list, pd.DataFrame]], bool]:
-        hard_exit = False  # stop and totally discard the profile cause it takes too much time
+        self, all_prefs, matrices_to_examine_cost_2, old_max_cost_so_far, p, potential_winners
+    ) -> Tuple[Profile, bool, List[Tuple[int, list, Preference]]]:
         if self.verbose:
             print('in examine_matrices_cost_2')
         new_preferences = []
         for parent_mat_2 in matrices_to_examine_cost_2:
-            index_of_p, index_of_w, relevant_cells = get_children_generation_options(self.winner, p, parent_mat_2)
+            index_of_p, index_of_w, relevant_cells = get_children_generation_options(
+                self.winner, p, parent_mat_2, self.tracer
+            )
             new_preferences += two_cost_children_generation(
                 parent_matrix=parent_mat_2[2],
                 cost_of_parent_matrix=old_max_cost_so_far - 1,
@@ -517,27 +615,26 @@ class Manipulation:
                 index_of_p=index_of_p,
                 index_of_w=index_of_w,
                 rule=self.method,
-                matrices_not_to_generate=[x[2] for x in self.all_generated_matrices],
-                do_flips=self.do_flips
+                matrices_not_to_generate=self.visited_matrices,
+                level_matrices=self.level_matrices,
+                do_flips=self.do_flips,
+                deadline=self.deadline,
+                tracer=self.tracer
             )
-        if time.time() - init_time > self.hard_exit_time_limit:
-            print('skipping profile due to slowness')
-            return all_prefs, False, [], True
 
-        if self.verbose:
-            print(f'all generated matrices so far {len(self.all_generated_matrices)}')
         all_prefs, manipulation_happened = self.check_if_manipulation_happened(all_prefs, new_preferences, p)
-        return all_prefs, manipulation_happened, new_preferences, hard_exit
+        return all_prefs, manipulation_happened, new_preferences
 
     def examine_matrices_cost_1(
-        self, all_prefs, matrices_to_examine_cost_1, old_max_cost_so_far, p, potential_winners, init_time: float
-    ) -> Tuple[List[pd.DataFrame], bool, List[Tuple[int, list, pd.DataFrame]], bool]:
+        self, all_prefs, matrices_to_examine_cost_1, old_max_cost_so_far, p, potential_winners
+    ) -> Tuple[Profile, bool, List[Tuple[int, list, Preference]]]:
         if self.verbose:
             print('in examine_matrices_cost_1')
         new_preferences = []
-        hard_exit = False  # stop and totally discard the profile cause it takes too much time
         for parent_mat_1 in matrices_to_examine_cost_1:
-            index_of_p, index_of_w, relevant_cells = get_children_generation_options(self.winner, p, parent_mat_1)
+            index_of_p, index_of_w, relevant_cells = get_children_generation_options(
+                self.winner, p, parent_mat_1, self.tracer
+            )
             new_preferences += one_cost_children_generation(
                 parent_matrix=parent_mat_1[2],
                 cost_of_parent_matrix=old_max_cost_so_far,
@@ -547,32 +644,48 @@ class Manipulation:
                 index_of_p=index_of_p,
                 index_of_w=index_of_w,
                 rule=self.method,
-                matrices_not_to_generate=[x[2] for x in self.all_generated_matrices],
+                matrices_not_to_generate=self.visited_matrices,
+                level_matrices=self.level_matrices,
                 do_omissions=self.do_omissions,
-                do_additions=self.do_additions
+                do_additions=self.do_additions,
+                deadline=self.deadline,
+                tracer=self.tracer
             )
 
-            if time.time() - init_time > self.hard_exit_time_limit:
-                print('skipping profile due to slowness')
-                return all_prefs, False, [], True
-
-        if self.verbose:
-            print(f'all generated matrices so far {len(self.all_generated_matrices)}')
         all_prefs, manipulation_happened = self.check_if_manipulation_happened(all_prefs, new_preferences, p)
-        return all_prefs, manipulation_happened, new_preferences, hard_exit
+        return all_prefs, manipulation_happened, new_preferences
 
     def check_if_manipulation_happened(
-        self, all_prefs: List[pd.DataFrame], new_preferences: List[Tuple[int, list, pd.DataFrame]], p: int
-    ) -> Tuple[List[pd.DataFrame], bool]:
+        self, all_prefs: Profile, new_preferences: List[Tuple[int, list, Preference]], p: int
+    ) -> Tuple[Profile, bool]:
         """
-
+        Goes through the candidate preferences of the voter in order and returns the profile with the first one that is
+        transitive and makes p win. Only the voter's own contribution differs between the candidates, so the candidates
+        are stacked into (c, m, m) batches and the winner of every candidate is calculated at once from the scores of
+        the rest of the profile. Transitivity is only checked (also in batch) for the candidates that make p win.
         """
-        all_prefs_tmp = copy.deepcopy(all_prefs)
-        for pref_cost, _, pref in new_preferences:
-            all_prefs_tmp[self.preference_idx] = pref
-            winner, *_ = evaluate_profile(all_prefs_tmp, self.k, self.method, self.alphabetical_order_of_alternatives)
-            if winner == p and check_transitivity(pref):
+        if self.tracer is not None:
+            for cost, _, _ in new_preferences:
+                self.tracer.add_nodes(cost)
+        for start in range(0, len(new_preferences), CANDIDATE_BATCH_SIZE):
+            self.deadline.check()
+            batch = [pref for _, _, pref in new_preferences[start:start + CANDIDATE_BATCH_SIZE]]
+            candidates = stack_profile(batch)
+            winners = get_winners_batch(
+                self.scores_without_voter + get_scores_of_voters(candidates, self.k, self.method), self.ranks
+            )
+            winning = np.flatnonzero(winners == p)
+            if self.tracer is not None:
+                self.tracer.candidate_evaluations += len(batch)
+                self.tracer.transitivity_checks += len(winning)
+            if not len(winning):
+                continue
+            if candidates.shape[-1] <= MAX_ALTERNATIVES_IN_BATCH:
+                transitive = winning[check_transitivity_batch(candidates[winning])]
+            else:
+                transitive = [idx for idx in winning if check_transitivity(batch[idx])]
+            if len(transitive):
                 if self.verbose:
                     print('Manipulation happened!')
-                return all_prefs_tmp, True
+                return all_prefs.with_preference(self.preference_idx, batch[transitive[0]]), True
         return all_prefs, False
@@ -0,0 +1,186 @@
+"""
+This module includes the cache of the outcomes of the manipulation moves.
+
+The outcome of Manipulation.manipulation_move only depends on the current and the truthful preference of the voter, the
+scores of the alternatives, the winner, the tie-breaking order, k, the method, the do_* flags, the search and whether it
+uses the oracle. The same situations come up again and again across rounds, meta counters and profiles (especially under
+2urn, where most voters share one of two preferences), so the outcome (the new preference of the voter and the new
+winner, or that the voter cannot manipulate) is kept in a bounded LRU cache under a key built from exactly these inputs.
+When several manipulations are equally good, the cached one is the one that happened to be picked the first time, so the
+runs that hit the cache do not draw the random choices of the moves again like independent runs (e.g. meta counters)
+would. The cache is therefore only used when it is asked for (see orchestration.py).
+
+The cache can optionally be saved to a file and loaded again, e.g. by the next sweep.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import dill
+
+from main.preference import Preference
+
+DEFAULT_MAX_SIZE = 100000
+
+_loaded_caches: Dict[Optional[str], 'ManipulationCache'] = {}
+
+
+def manipulation_key(
+    preference: Preference, truthful_preference: Preference, scores_of_alternatives: dict, winner: int,
+    alphabetical_order: dict, k: int, method: str, do_additions: bool, do_omissions: bool, do_flips: bool, search: str,
+    use_oracle: bool
+) -> tuple:
+    """
+    The canonical key of a manipulation move: all the inputs its outcome depends on, in hashable form.
+    """
+    return (
+        preference.key, truthful_preference.key,
+        tuple(scores_of_alternatives[str(alternative)] for alternative in range(len(preference))), winner,
+        tuple(alphabetical_order[i] for i in sorted(alphabetical_order)), k, method, do_additions, do_omissions,
+        do_flips, search, use_oracle
+    )
+
+
+class ManipulationCache:
+    """
+    LRU cache of at most 'max_size' outcomes of manipulation moves. An outcome is either (new_preference, new_winner)
+    or None if the voter cannot manipulate. If a path is given, the cache is loaded from there (if the file exists) and
+    'save' writes it back.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE, path: str = None):
+        assert max_size > 0
+        self.max_size = max_size
+        self.path = path
+        self._outcomes: 'OrderedDict[tuple, Optional[Tuple[Preference, int]]]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._unsaved_changes = False
+        if path is not None and os.path.isfile(path):
+            self._add_entries(_load_entries(path))
+
+    def __len__(self) -> int:
+        return len(self._outcomes)
+
+    def __repr__(self) -> str:
+        return f'ManipulationCache({self.stats()})'
+
+    def lookup(self, key: tuple) -> Tuple[bool, Optional[Tuple[Preference, int]]]:
+        """
+        Returns:
+            (found, outcome). The outcome is only meaningful if found is True.
+        """
+        if key in self._outcomes:
+            self._outcomes.move_to_end(key)
+            self.hits += 1
+            return True, self._outcomes[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key: tuple, outcome: Optional[Tuple[Preference, int]]):
+        self._outcomes[key] = outcome
+        self._outcomes.move_to_end(key)
+        if len(self._outcomes) > self.max_size:
+            self._outcomes.popitem(last=False)
+        self._unsaved_changes = True
+
+    def resize(self, max_size: int):
+        """
+        Changes the maximum number of outcomes, dropping the least recently used ones that do not fit anymore.
+        """
+        assert max_size > 0
+        self.max_size = max_size
+        self._add_entries([])
+
+    def _add_entries(self, entries: List[tuple]):
+        for key, outcome in entries:
+            self._outcomes[key] = outcome
+            self._outcomes.move_to_end(key)
+        while len(self._outcomes) > self.max_size:
+            self._outcomes.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.,
+            'size': len(self),
+            'max_size': self.max_size
+        }
+
+    def save(self):
+        """
+        Writes the cache to its path. The entries that other processes have saved there in the meantime are kept too
+        (the ones of this cache count as the most recently used).
+        """
+        if self.path is None or not self._unsaved_changes:
+            return
+        with _file_lock(self.path + '.lock'):
+            own_entries = list(self._outcomes.items())
+            self._outcomes = OrderedDict()
+            if os.path.isfile(self.path):
+                self._add_entries(_load_entries(self.path))
+            self._add_entries(own_entries)
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + '.tmp', 'wb') as f:
+                dill.dump(list(self._outcomes.items()), f)
+            os.replace(self.path + '.tmp', self.path)  # never leave a half-written cache behind
+        self._unsaved_changes = False
+
+
+def _load_entries(path: str) -> List[tuple]:
+    with open(path, 'rb') as f:
+        return dill.load(f)
+
+
+@contextmanager
+def _file_lock(lock_path: str, timeout: float = 30.):
+    """
+    A minimal lock between processes: the lock is held while the lock file exists. A lock that cannot be taken for
+    'timeout' seconds is considered abandoned (e.g. its process was killed) and is taken over.
+    """
+    start = time.monotonic()
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            if time.monotonic() - start > timeout:
+                break
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+
+def get_manipulation_cache(max_size: int = DEFAULT_MAX_SIZE, path: str = None) -> ManipulationCache:
+    """
+    Returns the cache of the current process for the given path (None for a cache that is not saved). It is only
+    created (and loaded) the first time, later calls resize it to the given max_size.
+    """
+    if path not in _loaded_caches:
+        _loaded_caches[path] = ManipulationCache(max_size, path)
+    elif _loaded_caches[path].max_size != max_size:
+        _loaded_caches[path].resize(max_size)
+    return _loaded_caches[path]
+
+
+def get_loaded_manipulation_caches() -> List[ManipulationCache]:
+    return list(_loaded_caches.values())
+
+
+def save_manipulation_caches():
+    """
+    Saves all the caches of the current process that have a path.
+    """
+    for cache in _loaded_caches.values():
+        cache.save()
@@ -4,19 +4,19 @@ subfunctionalities of the "tree_generation" method in 'manipulation.py', i.e. th
 the agent considers when trying to manipulate.
 """
 
-import copy
 import random
-from typing import List, Tuple, Union
-
-import pandas as pd
+from typing import Dict, List, Set, Tuple, Union
 
 from main.data_processing import check_transitivity
+from main.deadline import Deadline
+from main.preference import Preference
+from main.tracing import SearchTracer
 
 
 def useful_change(
-    parent_matrix: pd.DataFrame, index: int, col: int, type_of_alternative: str, rule: str, cost: int,
+    parent_matrix: Preference, index: int, col: int, type_of_alternative: str, rule: str, cost: int,
     do_additions: bool, do_omissions: bool, do_flips: bool
-) -> Union[List[pd.DataFrame], None]:
+) -> Union[List[Preference], None]:
     """
     Gets a parent matrix and creates its child for the case of the relevant change concerning either the possible
     winner p, the current winner w or any a potential winner (for which we make the same useful change as we do for w).
@@ -39,65 +39,48 @@ def useful_change(
 
     if rule == 'approval':
         if type_of_alternative == 'p':
-            new_matrix = copy.copy(parent_matrix)
-            if parent_matrix.loc[index, col] == -1:
+            if parent_matrix[index, col] == -1:
                 if cost == 1 and do_omissions:
-                    new_matrix.loc[index, col] = 0
-                    new_matrix.loc[col, index] = 0  # symmetry constraint
-                    new_matrices.append(new_matrix)
+                    new_matrices.append(parent_matrix.with_cell(index, col, 0))
                 elif do_flips:
-                    new_matrix.loc[index, col] = 1
-                    new_matrix.loc[col, index] = -1  # symmetry constraint
-                    new_matrices.append(new_matrix)
+                    new_matrices.append(parent_matrix.with_cell(index, col, 1))
         else:
-            new_matrix = copy.copy(parent_matrix)
-            if parent_matrix.loc[index, col] == 0 and cost == 1 and do_additions:
-                new_matrix.loc[index, col] = -1
-                new_matrix.loc[col, index] = 1  # symmetry constraint
-                new_matrices.append(new_matrix)
-            elif parent_matrix.loc[index, col] == 1 and cost == 2 and do_flips:
-                new_matrix.loc[index, col] = -1
-                new_matrix.loc[col, index] = 1  # symmetry constraint
-                new_matrices.append(new_matrix)
+            if parent_matrix[index, col] == 0 and cost == 1 and do_additions:
+                new_matrices.append(parent_matrix.with_cell(index, col, -1))
+            elif parent_matrix[index, col] == 1 and cost == 2 and do_flips:
+                new_matrices.append(parent_matrix.with_cell(index, col, -1))
 
     else:
         if type_of_alternative == 'p':
-            new_matrix = copy.copy(parent_matrix)
-            if parent_matrix.loc[index, col] == 0 and cost == 1 and do_additions:
-                new_matrix.loc[index, col] = 1
-                new_matrix.loc[col, index] = -1  # symmetry constraint
-                new_matrices.append(new_matrix)
-            elif (parent_matrix.loc[index, col] == -1 and cost == 2) and do_flips:
-                new_matrix.loc[index, col] = 1
-                new_matrix.loc[col, index] = -1  # symmetry constraint
-                new_matrices.append(new_matrix)
+            if parent_matrix[index, col] == 0 and cost == 1 and do_additions:
+                new_matrices.append(parent_matrix.with_cell(index, col, 1))
+            elif (parent_matrix[index, col] == -1 and cost == 2) and do_flips:
+                new_matrices.append(parent_matrix.with_cell(index, col, 1))
         else:
-            new_matrix = copy.copy(parent_matrix)
-            if parent_matrix.loc[index, col] == 1:
+            if parent_matrix[index, col] == 1:
                 if cost == 1 and do_omissions:
-                    new_matrix.loc[index, col] = 0
-                    new_matrix.loc[col, index] = 0  # symmetry constraint
-                    new_matrices.append(new_matrix)
+                    new_matrices.append(parent_matrix.with_cell(index, col, 0))
                 elif do_flips:
-                    new_matrix.loc[index, col] = -1
-                    new_matrix.loc[col, index] = 1  # symmetry constraint
-                    new_matrices.append(new_matrix)
+                    new_matrices.append(parent_matrix.with_cell(index, col, -1))
 
     return new_matrices
 
 
 def one_cost_children_generation(
-    parent_matrix: pd.DataFrame,
+    parent_matrix: Preference,
     cost_of_parent_matrix: int,
     alternatives_of_interest: List[int],
     alternatives_of_only_useful_changes: List[int],
     index_of_p: int = None,
     index_of_w: int = None,
     rule: str = None,
-    matrices_not_to_generate: List[pd.DataFrame] = None,
+    matrices_not_to_generate: Set[bytes] = None,
+    level_matrices: Dict[bytes, Tuple[int, list, Preference]] = None,
     do_additions: bool = None,
-    do_omissions: bool = None
-) -> List[Tuple[int, list, pd.DataFrame]]:
+    do_omissions: bool = None,
+    deadline: Deadline = None,
+    tracer: SearchTracer = None
+) -> List[Tuple[int, list, Preference]]:
     """
     Generates all the matrices coming of a parent matrix with cost 1.
     Args:
@@ -111,8 +94,16 @@ def one_cost_children_generation(
         index_of_p: If the index of possible winner is provided only the useful changes will be done for this row.
         index_of_w: If the index of the winner is provided only the useful changes will be done for this row.
         rule: Either "approval" or "veto". Only relevant if index_of_p or index_of_w is provided.
-        matrices_not_to_generate: Skip these matrices. Useful to avoid generate matrices that had been generated
-        somewhere else in the tree.
+        matrices_not_to_generate: Skip the matrices with these keys (see Preference.key). Useful to avoid generate
+        matrices that had been generated in the previous levels of the tree (the set is not changed here, the caller
+        adds the keys of the children once the whole level is generated).
+        level_matrices: The children generated so far in the current level of the tree by their key. A child that is
+        already there is dropped and its indices_changed_from_the_parent are merged into those of the kept one, and
+        the new children are added to it (see drop_generated_matrices).
+        deadline: If provided, it is checked for every row of the parent matrix, i.e. DeadlineExceeded is raised if
+        the deadline passes while generating the children.
+        tracer: If provided, the children that are dropped because they had already been generated are counted there
+        (see main/tracing.py).
 
     Returns:
         A list of tuples: (cost-label_of_child, indices_changed_from_the_parent, child)
@@ -123,11 +114,12 @@ def one_cost_children_generation(
     assert do_omissions is not None
     assert set(alternatives_of_only_useful_changes).issubset(set(alternatives_of_interest))
 
-    relevant_rows = parent_matrix.index.isin(alternatives_of_interest)
     children_matrices = []
-    for rel, row in zip(relevant_rows, parent_matrix.index):
-        for col in parent_matrix.columns:
-            if rel and row != col:
+    for row in range(len(parent_matrix)):
+        if deadline is not None:
+            deadline.check()
+        for col in range(len(parent_matrix)):
+            if row in alternatives_of_interest and row != col:
                 if row == index_of_p:
                     new_matrices = useful_change(
                         parent_matrix=parent_matrix,
@@ -177,53 +169,50 @@ def one_cost_children_generation(
                             col, cost_of_parent_matrix, do_additions, parent_matrix, row
                         )
 
-    if matrices_not_to_generate:
-        return [x for x in children_matrices if not True in [x[2].equals(y) for y in matrices_not_to_generate]]
+    if matrices_not_to_generate is not None:
+        return drop_generated_matrices(children_matrices, matrices_not_to_generate, level_matrices, tracer)
     else:
         return children_matrices
 
 
 def do_omissions_func(col, cost_of_parent_matrix, do_omissions, parent_matrix,
-                      row) -> List[Tuple[int, list, pd.DataFrame]]:
+                      row) -> List[Tuple[int, list, Preference]]:
     children_matrices = []
-    if (parent_matrix.loc[row, col] == 1 or parent_matrix.loc[row, col] == -1) and do_omissions:
-        new_matrix = copy.copy(parent_matrix)
-        new_matrix.loc[row, col] = 0
-        new_matrix.loc[col, row] = 0  # symmetry constraint
+    if (parent_matrix[row, col] == 1 or parent_matrix[row, col] == -1) and do_omissions:
+        new_matrix = parent_matrix.with_cell(row, col, 0)
 
         children_matrices.append((cost_of_parent_matrix + 1, [row], new_matrix))
     return children_matrices
 
 
 def do_additions_func(col, cost_of_parent_matrix, do_additions, parent_matrix,
-                      row) -> List[Tuple[int, list, pd.DataFrame]]:
+                      row) -> List[Tuple[int, list, Preference]]:
     children_matrices = []
-    if parent_matrix.loc[row, col] == 0 and do_additions:
-        new_matrix = copy.copy(parent_matrix)
-        new_matrix.loc[row, col] = 1
-        new_matrix.loc[col, row] = -1  # symmetry constraint
+    if parent_matrix[row, col] == 0 and do_additions:
+        new_matrix = parent_matrix.with_cell(row, col, 1)
 
         children_matrices.append((cost_of_parent_matrix + 1, [row], new_matrix))
 
-        new_matrix = copy.copy(parent_matrix)
-        new_matrix.loc[row, col] = -1
-        new_matrix.loc[col, row] = 1  # symmetry constraint
+        new_matrix = parent_matrix.with_cell(row, col, -1)
 
         children_matrices.append((cost_of_parent_matrix + 1, [row], new_matrix))
     return children_matrices
 
 
 def two_cost_children_generation(
-    parent_matrix: pd.DataFrame,
+    parent_matrix: Preference,
     cost_of_parent_matrix: int,
     alternatives_of_interest: List[int],
     alternatives_of_only_useful_changes: List[int],
     index_of_p: int = None,
     index_of_w: int = None,
     rule: str = None,
-    matrices_not_to_generate: List[pd.DataFrame] = None,
-    do_flips: bool = True
-) -> List[Tuple[int, list, pd.DataFrame]]:
+    matrices_not_to_generate: Set[bytes] = None,
+    level_matrices: Dict[bytes, Tuple[int, list, Preference]] = None,
+    do_flips: bool = True,
+    deadline: Deadline = None,
+    tracer: SearchTracer = None
+) -> List[Tuple[int, list, Preference]]:
     """
     Generates all the matrices coming of a parent matrix with cost 2.
     Args:
@@ -237,8 +226,16 @@ def two_cost_children_generation(
         index_of_p: If the index of possible winner is provided only the useful changes will be done for this row.
         index_of_w: If the index of the winner is provided only the useful changes will be done for this row.
         rule: Either "approval" or "veto". Only relevant if index_of_p or index_of_w is provided.
-        matrices_not_to_generate: Skip these matrices. Useful to avoid generate matrices that had been generated
-        somewhere else in the tree.
+        matrices_not_to_generate: Skip the matrices with these keys (see Preference.key). Useful to avoid generate
+        matrices that had been generated in the previous levels of the tree (the set is not changed here, the caller
+        adds the keys of the children once the whole level is generated).
+        level_matrices: The children generated so far in the current level of the tree by their key. A child that is
+        already there is dropped and its indices_changed_from_the_parent are merged into those of the kept one, and
+        the new children are added to it (see drop_generated_matrices).
+        deadline: If provided, it is checked for every row of the parent matrix, i.e. DeadlineExceeded is raised if
+        the deadline passes while generating the children.
+        tracer: If provided, the children that are dropped because they had already been generated are counted there
+        (see main/tracing.py).
 
     Returns:
         A list of tuples: (cost-label_of_child, child)
@@ -247,11 +244,12 @@ def two_cost_children_generation(
         assert rule in ['veto', 'approval']
     assert set(alternatives_of_only_useful_changes).issubset(set(alternatives_of_interest))
 
-    relevant_rows = parent_matrix.index.isin(alternatives_of_interest)
     children_matrices = []
-    for rel, row in zip(relevant_rows, parent_matrix.index):
-        for col in parent_matrix.columns:
-            if rel and row != col:
+    for row in range(len(parent_matrix)):
+        if deadline is not None:
+            deadline.check()
+        for col in range(len(parent_matrix)):
+            if row in alternatives_of_interest and row != col:
                 if row == index_of_p:
                     new_matrices = useful_change(
                         parent_matrix=parent_matrix,
@@ -286,21 +284,48 @@ def two_cost_children_generation(
                         ]
                 else:
                     # do flips
-                    if (parent_matrix.loc[row, col] == 1 or parent_matrix.loc[row, col] == -1) and do_flips:
-                        new_matrix = copy.copy(parent_matrix)
-                        new_matrix.loc[row, col] = parent_matrix.loc[col, row]
-                        new_matrix.loc[col, row] = parent_matrix.loc[row, col]  # symmetry constraint
+                    if (parent_matrix[row, col] == 1 or parent_matrix[row, col] == -1) and do_flips:
+                        new_matrix = parent_matrix.with_cell(row, col, parent_matrix[col, row])
 
                         children_matrices.append((cost_of_parent_matrix + 2, [row], new_matrix))
 
-    if matrices_not_to_generate:
-        return [x for x in children_matrices if not True in [x[2].equals(y) for y in matrices_not_to_generate]]
+    if matrices_not_to_generate is not None:
+        return drop_generated_matrices(children_matrices, matrices_not_to_generate, level_matrices, tracer)
     else:
         return children_matrices
 
 
-def find_matrices_with_score(matrices: List[Tuple[int, list, pd.DataFrame]],
-                             score: int) -> List[Tuple[int, list, pd.DataFrame]]:
+def drop_generated_matrices(children_matrices: List[Tuple[int, list, Preference]],
+                            matrices_not_to_generate: Set[bytes],
+                            level_matrices: Dict[bytes, Tuple[int, list, Preference]] = None,
+                            tracer: SearchTracer = None) -> List[Tuple[int, list, Preference]]:
+    """
+    Drops the children whose matrix has already been generated in a previous level, i.e. its key is in
+    matrices_not_to_generate, and those already generated in the current level, i.e. its key is in level_matrices.
+    The indices_changed_from_the_parent of the latter are merged into those of the kept child, since they decide which
+    cells the children of a non-transitive matrix may change (see get_children_generation_options): the kept child
+    then gets all the children that the dropped copies would have got. The remaining children are added to
+    level_matrices.
+    """
+    new_children_matrices = []
+    for cost, indices_changed, child in children_matrices:
+        if child.key in matrices_not_to_generate:
+            continue
+        if level_matrices is None:
+            new_children_matrices.append((cost, indices_changed, child))
+        elif child.key in level_matrices:
+            kept_indices_changed = level_matrices[child.key][1]
+            kept_indices_changed += [index for index in indices_changed if index not in kept_indices_changed]
+        else:
+            level_matrices[child.key] = (cost, list(indices_changed), child)
+            new_children_matrices.append(level_matrices[child.key])
+    if tracer is not None:
+        tracer.duplicates_pruned += len(children_matrices) - len(new_children_matrices)
+    return new_children_matrices
+
+
+def find_matrices_with_score(matrices: List[Tuple[int, list, Preference]],
+                             score: int) -> List[Tuple[int, list, Preference]]:
     """
     Gets a list of preferences with their absolute scores and returns a subset of this list with the matrices having
     only the score provided.
@@ -311,17 +336,20 @@ def find_matrices_with_score(matrices: List[Tuple[int, list, pd.DataFrame]],
     return [x for x in matrices if x[0] == score]
 
 
-def get_children_generation_options(w: int, p: int, parent_mat: Tuple[int, list,
-                                                                      pd.DataFrame]) -> Tuple[int, int, list]:
+def get_children_generation_options(w: int, p: int, parent_mat: Tuple[int, list, Preference],
+                                    tracer: SearchTracer = None) -> Tuple[int, int, list]:
     """
 
     Args:
         w: winner
         p: possible_winner
         parent_mat: (cost-label_of_child, indices_changed_from_the_parent, child)
+        tracer: If provided, the transitivity check of the parent matrix is counted there (see main/tracing.py).
     Returns:
     the index of p and of w in the given matrix, and all relevant cells in that matrix
     """
+    if tracer is not None:
+        tracer.transitivity_checks += 1
     if check_transitivity(parent_mat[2]):
         relevant_cells = [p, w]
         index_of_p = p
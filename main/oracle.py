@@ -0,0 +1,147 @@
+"""
+This module includes the offline manipulation oracle: the precomputed cheapest manipulations for small m.
+
+For m <= 5 every preference of a voter is one of the partial preferences of the catalogue (see main/catalogue.py). The
+A* search of search.py answers "what are the cheapest changes of this preference that give a transitive preference
+whose scores are one of these score vectors", and the cost of changing a preference into another one is just the sum
+of the costs of the cells they differ in:
+    - incomparable -> preferred either way: 1 (addition)
+    - preferred either way -> incomparable: 1 (omission)
+    - preferred one way -> preferred the other way: 2 (a flip, or an omission and an addition)
+So, for a rule, a k and the allowed changes, the oracle keeps for every preference of the catalogue and every 0/1 score
+vector x the minimum cost of changing the preference into one that gives the scores x, together with all the
+preferences that achieve it. A manipulation move then only looks up the winning score vectors of the voter instead of
+searching. The tables are built the first time they are needed and are saved under data/oracle.
+"""
+
+import os
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from main.catalogue import get_catalogue
+
+MAX_ALTERNATIVES_IN_ORACLE = 5
+ORACLE_DIR = 'data/oracle'
+IMPOSSIBLE = np.iinfo(np.uint8).max  # the cost in the tables when no preference gives the scores
+
+_loaded_oracles: Dict[tuple, 'ManipulationOracle'] = {}
+
+
+def score_vector_indices(score_vectors: np.ndarray) -> np.ndarray:
+    """
+    The index of every 0/1 score vector of a (..., m) array, in the order of itertools.product([0, 1], repeat=m) (the
+    order of get_winning_scores).
+    """
+    num_of_alternatives = score_vectors.shape[-1]
+    return np.asarray(score_vectors, dtype=np.int64) @ (1 << np.arange(num_of_alternatives - 1, -1, -1))
+
+
+def get_cell_costs(do_additions: bool, do_omissions: bool, do_flips: bool) -> np.ndarray:
+    """
+    The (3, 3) array with the cost of changing a cell from the value a to the value b at [a + 1, b + 1].
+    """
+    costs = np.full((3, 3), IMPOSSIBLE, dtype=np.int64)
+    for value in [-1, 0, 1]:
+        costs[value + 1, value + 1] = 0
+    if do_additions:
+        costs[1, 0] = costs[1, 2] = 1
+    if do_omissions:
+        costs[0, 1] = costs[2, 1] = 1
+    if do_flips or (do_additions and do_omissions):
+        costs[0, 2] = costs[2, 0] = 2
+    return costs
+
+
+class ManipulationOracle:
+    """
+    The cheapest changes of every preference of the catalogue for every score vector, under a rule, a k and the
+    allowed changes. min_costs[preference_id, x] is the minimum cost (IMPOSSIBLE if there is none) and the ids of the
+    preferences that achieve it are targets[offsets[preference_id * 2^m + x]:offsets[preference_id * 2^m + x + 1]].
+    """
+
+    def __init__(self, min_costs: np.ndarray, offsets: np.ndarray, targets: np.ndarray):
+        self.min_costs = min_costs  # (number_of_preferences, 2^m) uint8 array
+        self.offsets = offsets
+        self.targets = targets
+        self.num_of_score_vectors = min_costs.shape[1]
+
+    @classmethod
+    def build(
+        cls, num_of_alternatives: int, k: int, method: str, do_additions: bool, do_omissions: bool, do_flips: bool
+    ) -> 'ManipulationOracle':
+        catalogue = get_catalogue(num_of_alternatives)
+        num_of_score_vectors = 2**num_of_alternatives
+        cell_costs = get_cell_costs(do_additions, do_omissions, do_flips)
+        upper_rows, upper_columns = np.triu_indices(num_of_alternatives, 1)
+        cells = catalogue.matrices[:, upper_rows, upper_columns].astype(np.int64) + 1  # the matrices are antisymmetric
+        score_indices = score_vector_indices(catalogue.scores(method, k))
+        # the preferences grouped by their score vector
+        order = np.argsort(score_indices, kind='stable')
+        score_vectors, group_starts, group_sizes = np.unique(
+            score_indices[order], return_index=True, return_counts=True
+        )
+
+        min_costs = np.full((len(catalogue), num_of_score_vectors), IMPOSSIBLE, dtype=np.uint8)
+        counts = np.zeros((len(catalogue), num_of_score_vectors), dtype=np.int64)
+        targets = []
+        for source in range(len(catalogue)):
+            costs = cell_costs[cells[source], cells].sum(axis=1)[order]
+            group_min_costs = np.minimum.reduceat(costs, group_starts)
+            group_min_costs[group_min_costs >= IMPOSSIBLE] = IMPOSSIBLE
+            min_costs[source, score_vectors] = group_min_costs
+            optimal = (costs == np.repeat(group_min_costs, group_sizes)) & (costs < IMPOSSIBLE)
+            counts[source, score_vectors] = np.add.reduceat(optimal, group_starts)
+            targets.append(order[optimal])  # in the order of the score vectors, like the offsets
+        offsets = np.concatenate([[0], np.cumsum(counts.ravel())])
+        return cls(min_costs, offsets, np.concatenate(targets).astype(np.int32))
+
+    def cheapest_manipulations(self, preference_id: int,
+                               winning_score_indices: np.ndarray) -> Optional[Tuple[int, np.ndarray]]:
+        """
+        Returns:
+            (cost, ids_of_preferences) of the cheapest manipulations of the given preference that give one of the given
+            score vectors (see score_vector_indices), or None if there is no such manipulation at all.
+        """
+        if not len(winning_score_indices):
+            return None
+        costs = self.min_costs[preference_id, winning_score_indices]
+        best_cost = costs.min()
+        if best_cost == IMPOSSIBLE:
+            return None
+        cells = preference_id * self.num_of_score_vectors + winning_score_indices[costs == best_cost]
+        return int(best_cost), np.concatenate([self.targets[self.offsets[c]:self.offsets[c + 1]] for c in cells])
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, min_costs=self.min_costs, offsets=self.offsets, targets=self.targets)
+        os.replace(path + '.tmp', path)  # several processes may build the same oracle at the same time
+
+    @classmethod
+    def load(cls, path: str) -> 'ManipulationOracle':
+        with np.load(path) as arrays:
+            return cls(arrays['min_costs'], arrays['offsets'], arrays['targets'])
+
+
+def get_oracle(
+    num_of_alternatives: int, k: int, method: str, do_additions: bool, do_omissions: bool, do_flips: bool
+) -> Optional[ManipulationOracle]:
+    """
+    Returns the oracle of the given configuration, or None if there are too many alternatives. It is loaded from disk
+    (or built and saved there if it does not exist yet) only the first time in every process.
+    """
+    if num_of_alternatives > MAX_ALTERNATIVES_IN_ORACLE:
+        return None
+    assert method in ['approval', 'veto']
+    configuration = (num_of_alternatives, k, method, do_additions, do_omissions, do_flips)
+    if configuration not in _loaded_oracles:
+        flags = ''.join(str(int(flag)) for flag in [do_additions, do_omissions, do_flips])
+        path = os.path.join(ORACLE_DIR, f'oracle_{num_of_alternatives}_{method}_{k}_{flags}.npz')
+        if os.path.isfile(path):
+            oracle = ManipulationOracle.load(path)
+        else:
+            oracle = ManipulationOracle.build(*configuration)
+            oracle.save(path)
+        _loaded_oracles[configuration] = oracle
+    return _loaded_oracles[configuration]
@@ -3,11 +3,15 @@ This module contains the high level orchestration, i.e. calling of functions in
 iteration cycle.
 """
 
-from copy import copy
+import time
 from typing import Dict, Tuple, Union
 
-from main.data_processing import evaluate_profile
+from main.deadline import Deadline
+from main.manipulability import ManipulabilityIndex
 from main.manipulation import Manipulation
+from main.manipulation_cache import ManipulationCache, manipulation_key
+from main.profile import Profile, get_identical_voters
+from main.tracing import SearchTracer
 import numpy as np
 
 
@@ -23,24 +27,49 @@ def select_new_random_voter(failed, total_num, voter_to_exclude):
 
 
 def voting_iteration(
-    all_preferences, verbose, k, method, alphabetical_order, do_additions, do_omissions, do_flips, time_limit
+    all_preferences,
+    verbose,
+    k,
+    method,
+    alphabetical_order,
+    do_additions,
+    do_omissions,
+    do_flips,
+    time_limit,
+    move_time_limit: float = None,
+    deadline: Deadline = None,
+    search: str = 'levels',
+    cache: ManipulationCache = None,
+    use_oracle: bool = True,
+    tracer: SearchTracer = None
 ) -> Union[str, Tuple[bool, Dict[int, Tuple[int, int]]]]:
     """
     Full iteration per profile. 0 to many manipulations happens and ends either with convergence or not.
+    The profile has time_limit seconds (from the start of the profile) and every manipulation move at most
+    move_time_limit of them. If a deadline is given (e.g. the one of a whole sweep), neither goes beyond it. search is
+    the search that the manipulations use (see Manipulation) and use_oracle whether they look the cheapest
+    manipulations up in the oracle (see main/oracle.py) when there is one. If a cache is given, the outcomes of the
+    manipulation moves are looked up there first and the new ones are added to it. If a tracer is given, the
+    iteration and its manipulation moves report what they do there (see main/tracing.py).
 
     Returns:
     (whether_convergence, {round: (winner, voter) for all rounds}) or the string "hard_exit" if more than time_limit
      passed trying to converge on this profile. Voter is the last voter that was able to manipulate before convergence happened.
     """
-    current_profile = copy(
-        all_preferences
-    )  # Initialize the current profile of preferences for all voters.to be the same as the truthful profile.
+    profile_deadline = Deadline(time_limit, parent=deadline)
+    all_preferences = Profile.from_preferences(all_preferences)
+    current_profile = all_preferences  # Initialize the current profile of preferences for all voters.to be the same as
+    # the truthful profile.
 
     num_rounds = 0
     res_dict = {}
-    failed_manipulators = []
+    failed_manipulators = ManipulabilityIndex(k, method, alphabetical_order, all_preferences)
+    failed_manipulators.update(current_profile)  # the voters that cannot manipulate anyway are not probed
     manipulator_voter = None
     while True:
+        if profile_deadline.expired():
+            print('skipping profile due to slowness')
+            return 'hard_exit'
         random_voter = select_new_random_voter(failed_manipulators, len(all_preferences), manipulator_voter)
         if random_voter is None:
             print(f'Convergence is achieved in {num_rounds} rounds!')
@@ -48,44 +77,70 @@ def voting_iteration(
             break
         elif verbose:
             print(f'\nRandom voter chosen: {random_voter}')
-        winner, possible_winners, scores_of_alternatives = evaluate_profile(
-            graphs=current_profile, k=k, method=method, alphabetical_order=alphabetical_order
+        winner, possible_winners, scores_of_alternatives = current_profile.evaluate(
+            k=k, method=method, alphabetical_order=alphabetical_order
         )
+        if tracer is not None:
+            tracer.evaluations += 1
         if verbose:
             print(f'scores of alternatives: {scores_of_alternatives}')
 
-        man = Manipulation(
-            all_preferences=current_profile,
-            preference_idx=random_voter,
-            winner=winner,
-            truthful_profile=all_preferences,
-            possible_winners=possible_winners,
-            scores_of_alternatives=scores_of_alternatives,
-            alphabetical_order_of_alternatives=alphabetical_order,
-            method=method,
-            k=k,
-            do_additions=do_additions,
-            do_omissions=do_omissions,
-            do_flips=do_flips,
-            verbose=verbose,
-            hard_exit_time_limit=time_limit
-        )
+        found_in_cache, result = False, None
+        if cache is not None:
+            cache_key = manipulation_key(
+                current_profile[random_voter], all_preferences[random_voter], scores_of_alternatives, winner,
+                alphabetical_order, k, method, do_additions, do_omissions, do_flips, search, use_oracle
+            )
+            found_in_cache, result = cache.lookup(cache_key)
+            if found_in_cache and tracer is not None:
+                tracer.cache_hits += 1
 
-        result = man.manipulation_move()
-        if result == 'hard_exit':
-            return 'hard_exit'
+        if not found_in_cache:
+            man = Manipulation(
+                all_preferences=current_profile,
+                preference_idx=random_voter,
+                winner=winner,
+                truthful_profile=all_preferences,
+                possible_winners=possible_winners,
+                scores_of_alternatives=scores_of_alternatives,
+                alphabetical_order_of_alternatives=alphabetical_order,
+                method=method,
+                k=k,
+                do_additions=do_additions,
+                do_omissions=do_omissions,
+                do_flips=do_flips,
+                verbose=verbose,
+                hard_exit_time_limit=time_limit,
+                deadline=profile_deadline.child(move_time_limit),
+                search=search,
+                use_oracle=use_oracle,
+                tracer=tracer
+            )
+
+            move_start = time.perf_counter()
+            result = man.manipulation_move()
+            if tracer is not None:
+                tracer.move_seconds.append(time.perf_counter() - move_start)
+            if result == 'hard_exit':
+                return 'hard_exit'
+            if result is not None:
+                result = result[0][random_voter], result[1]  # (new preference of the voter, new winner)
+            if cache is not None:
+                cache.put(cache_key, result)
 
         if result is not None:
-            current_profile = result[0]
+            current_profile = current_profile.with_preference(random_voter, result[0])
             res_dict[num_rounds] = (result[1], random_voter)
             num_rounds += 1
             if verbose:
                 print(f'num of round {num_rounds}')
-            failed_manipulators = []
+            failed_manipulators.update(current_profile)
             manipulator_voter = random_voter
         else:
+            # The voters with the same current and truthful preference as this one cannot manipulate either.
+            identical_voters = get_identical_voters(random_voter, current_profile, all_preferences)
             if verbose:
-                print(f'Voter: {random_voter} cannot manipulate.')
-            failed_manipulators.append(random_voter)
+                print(f'Voters: {identical_voters} cannot manipulate.')
+            failed_manipulators.record_failures(identical_voters)
 
     return convergence_happened, res_dict
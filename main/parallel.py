@@ -0,0 +1,155 @@
+"""
+This module includes the small process pool that is used to run the voting iterations of many profiles in parallel.
+
+Every worker process gets its own pipe to the main process, so the main process hands out the jobs one at a time and
+stays the only process that touches the results (e.g. the only writer of the results file). A job is a generator
+function: every item it yields is sent back to the main process as soon as it is produced.
+
+The jobs are expected to respect their own deadlines (see deadline.py). As a last resort, a worker that has not sent
+anything for longer than the message_timeout of the pool is killed and replaced by a new one.
+"""
+
+import multiprocessing
+import random
+import time
+import traceback
+from multiprocessing.connection import wait
+from typing import Any, Callable, Hashable, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+_MESSAGE = 'message'
+_JOB_DONE = 'done'
+_JOB_FAILED = 'failed'
+JOB_TIMED_OUT = 'timed_out'  # The message of a job whose worker was killed for not responding in time.
+
+
+def _worker_loop(connection, job_function: Callable[..., Iterable], finalizer: Optional[Callable[[], Any]]):
+    # The workers are forked from the main process, so they would all share the same random state without this.
+    random.seed()
+    np.random.seed()
+    while True:
+        job = connection.recv()
+        if job is None:
+            break
+        job_id, job_args = job
+        try:
+            for message in job_function(*job_args):
+                connection.send((job_id, _MESSAGE, message))
+        except Exception:
+            connection.send((job_id, _JOB_FAILED, traceback.format_exc()))
+        else:
+            connection.send((job_id, _JOB_DONE, None))
+    if finalizer is not None:
+        finalizer()
+    connection.close()
+
+
+class WorkerPool:
+    """
+    A pool of 'num_workers' processes that run 'job_function' for every job given to 'imap_unordered'. If
+    'message_timeout' is given, a job that sends nothing (neither a message nor its end) for that many seconds is
+    considered stuck: its worker is killed and replaced. If 'finalizer' is given, every worker calls it when the pool
+    is closed (e.g. to save what the worker has cached).
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        job_function: Callable[..., Iterable],
+        message_timeout: Optional[float] = None,
+        finalizer: Optional[Callable[[], Any]] = None
+    ):
+        assert num_workers > 0
+        self.num_workers = num_workers
+        self.job_function = job_function
+        self.message_timeout = message_timeout
+        self.finalizer = finalizer
+        self._context = multiprocessing.get_context()
+        self._workers = {}  # connection -> process
+
+    def __enter__(self) -> 'WorkerPool':
+        for _ in range(self.num_workers):
+            self._start_worker()
+        return self
+
+    def __exit__(self, *exc_info):
+        for connection, process in self._workers.items():
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for connection, process in self._workers.items():
+            process.join(timeout=60 if self.finalizer is not None else 5)
+            if process.is_alive():
+                process.terminate()
+            connection.close()
+        self._workers = {}
+
+    def _start_worker(self):
+        main_end, worker_end = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_loop, args=(worker_end, self.job_function, self.finalizer), daemon=True
+        )
+        process.start()
+        worker_end.close()
+        self._workers[main_end] = process
+        return main_end
+
+    def _kill_worker(self, connection):
+        process = self._workers.pop(connection)
+        process.terminate()
+        process.join(timeout=5)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        connection.close()
+
+    def imap_unordered(self, jobs: Iterable[Tuple[Hashable, tuple]]) -> Iterator[Tuple[Hashable, Any, bool]]:
+        """
+        Runs all the jobs, given as (job_id, arguments_of_job_function) tuples, on the workers.
+
+        Returns:
+            An iterator over (job_id, message, job_finished) tuples, in the order the messages arrive. Every message
+            yielded by a job is forwarded with job_finished=False and, when the job is over, a last (job_id, None, True)
+            tuple follows. If the worker of the job had to be killed, that last tuple is (job_id, JOB_TIMED_OUT, True).
+        """
+        jobs = iter(jobs)
+        idle_connections = list(self._workers)
+        busy_connections = {}  # connection -> (job_id, time of the last message)
+
+        while True:
+            while idle_connections:
+                job = next(jobs, None)
+                if job is None:
+                    break
+                connection = idle_connections.pop()
+                connection.send(job)
+                busy_connections[connection] = (job[0], time.monotonic())
+            if not busy_connections:
+                return
+
+            timeout = None
+            if self.message_timeout is not None:
+                oldest_message_time = min(last_message_time for _, last_message_time in busy_connections.values())
+                timeout = max(0., oldest_message_time + self.message_timeout - time.monotonic())
+            for connection in wait(list(busy_connections), timeout=timeout):
+                job_id, kind, message = connection.recv()
+                if kind == _JOB_DONE:
+                    del busy_connections[connection]
+                    idle_connections.append(connection)
+                    yield job_id, None, True
+                elif kind == _JOB_FAILED:
+                    raise RuntimeError(f'Job {job_id} failed in a worker process:\n{message}')
+                else:
+                    busy_connections[connection] = (job_id, time.monotonic())
+                    yield job_id, message, False
+
+            if self.message_timeout is not None:
+                now = time.monotonic()
+                for connection, (job_id, last_message_time) in list(busy_connections.items()):
+                    if now - last_message_time > self.message_timeout and not connection.poll():
+                        del busy_connections[connection]
+                        self._kill_worker(connection)
+                        idle_connections.append(self._start_worker())
+                        yield job_id, JOB_TIMED_OUT, True
@@ -0,0 +1,171 @@
+"""
+This module includes the compact representation of a single (partial) preference that is used throughout the engine.
+
+A preference over m alternatives is an m x m matrix where the cell (i, j) is 1 if alternative i is preferred to
+alternative j, -1 if j is preferred to i and 0 if the two alternatives are incomparable (and on the diagonal). The
+matrix is stored as a small read-only int8 NumPy array, so that preferences can be shared freely between voters,
+profiles and the tree of possible manipulations without ever being copied.
+"""
+
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+from main.transitivity import is_transitive_masks, successor_masks
+
+
+class Preference:
+    """
+    Immutable m x m preference matrix. Every "change" of a cell returns a new Preference. The number of 1s and -1s of
+    every row (needed for the approval/veto scores) and whether the preference is transitive are computed once, the
+    first time they are needed.
+    """
+
+    __slots__ = ('_matrix', '_ones_per_row', '_minus_ones_per_row', '_successor_masks', '_transitive', '_key')
+
+    def __init__(self, matrix: Union[np.ndarray, list]):
+        matrix = np.array(matrix, dtype=np.int8)
+        assert matrix.ndim == 2 and matrix.shape[0] == matrix.shape[1]
+        matrix.flags.writeable = False
+        self._matrix = matrix
+        self._ones_per_row = None
+        self._minus_ones_per_row = None
+        self._successor_masks = None
+        self._transitive = None
+        self._key = None
+
+    @classmethod
+    def from_dataframe(cls, graph: pd.DataFrame) -> 'Preference':
+        return cls(graph.to_numpy())
+
+    def to_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(self._matrix.astype(int))
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """
+        The underlying (read-only) int8 array.
+        """
+        return self._matrix
+
+    def __len__(self) -> int:
+        return len(self._matrix)
+
+    def __getitem__(self, cell: tuple) -> int:
+        return int(self._matrix[cell])
+
+    def __repr__(self) -> str:
+        return f'Preference({self._matrix.tolist()})'
+
+    @property
+    def key(self) -> bytes:
+        """
+        Canonical hashable encoding of the preference (the raw bytes of the int8 matrix). Two preferences over the same
+        alternatives are equal if and only if their keys are equal.
+        """
+        if self._key is None:
+            self._key = self._matrix.tobytes()
+        return self._key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Preference):
+            return NotImplemented
+        return self.key == other.key
+
+    def __reduce__(self) -> tuple:
+        return Preference, (self._matrix, )
+
+    def __copy__(self) -> 'Preference':
+        return self
+
+    def __deepcopy__(self, memo: dict) -> 'Preference':
+        return self
+
+    def equals(self, other: 'Preference') -> bool:
+        return self.key == other.key
+
+    def row(self, alternative: int) -> np.ndarray:
+        return self._matrix[alternative]
+
+    def num_ones(self, alternative: int) -> int:
+        """
+        Number of alternatives that the given alternative is preferred to.
+        """
+        if self._ones_per_row is None:
+            self._ones_per_row = tuple((self._matrix == 1).sum(axis=1).tolist())
+        return self._ones_per_row[alternative]
+
+    def num_minus_ones(self, alternative: int) -> int:
+        """
+        Number of alternatives that are preferred to the given alternative.
+        """
+        if self._minus_ones_per_row is None:
+            self._minus_ones_per_row = tuple((self._matrix == -1).sum(axis=1).tolist())
+        return self._minus_ones_per_row[alternative]
+
+    def num_zeros(self, alternative: int) -> int:
+        """
+        Number of zeros in the row of the given alternative (the diagonal cell included).
+        """
+        return len(self) - self.num_ones(alternative) - self.num_minus_ones(alternative)
+
+    @property
+    def successor_masks(self) -> tuple:
+        """
+        The bitmask of the alternatives that every alternative is preferred to (see main/transitivity.py).
+        """
+        if self._successor_masks is None:
+            self._successor_masks = successor_masks(self._matrix)
+        return self._successor_masks
+
+    @property
+    def is_transitive(self) -> bool:
+        if self._transitive is None:
+            self._transitive = is_transitive_masks(self.successor_masks)
+        return self._transitive
+
+    def with_cell(self, row: int, col: int, value: int) -> 'Preference':
+        """
+        Returns a new preference where the cell (row, col) has the given value. The symmetric cell (col, row) gets the
+        opposite value so that the symmetry constraint keeps holding.
+        """
+        new_matrix = self._matrix.copy()
+        new_matrix[row, col] = value
+        new_matrix[col, row] = -value  # symmetry constraint
+        return Preference(new_matrix)
+
+    def with_alternative_on_top(self, alternative: int) -> 'Preference':
+        """
+        Returns a new preference where the given alternative is preferred to every other alternative.
+        """
+        new_matrix = self._matrix.copy()
+        new_matrix[alternative, :] = 1
+        new_matrix[:, alternative] = -1
+        new_matrix[alternative, alternative] = 0
+        return Preference(new_matrix)
+
+    def with_alternative_on_bottom(self, alternative: int) -> 'Preference':
+        """
+        Returns a new preference where every other alternative is preferred to the given alternative.
+        """
+        new_matrix = self._matrix.copy()
+        new_matrix[alternative, :] = -1
+        new_matrix[:, alternative] = 1
+        new_matrix[alternative, alternative] = 0
+        return Preference(new_matrix)
+
+
+def as_preference(graph: Union[Preference, pd.DataFrame, np.ndarray]) -> Preference:
+    """
+    Converts a preference given in any of the supported forms (e.g. the pd.DataFrame form used in the stored data) to a
+    Preference. Preferences are returned as they are.
+    """
+    if isinstance(graph, Preference):
+        return graph
+    if isinstance(graph, pd.DataFrame):
+        return Preference.from_dataframe(graph)
+    return Preference(graph)
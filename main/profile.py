@@ -0,0 +1,175 @@
+"""
+This module includes the representation of a whole profile (the preferences of all the voters) as a multiset.
+
+Under 2urn most of the voters share one of two preferences and under IC with few alternatives many voters share a
+preference too, so a profile is kept as its distinct preferences (types), the number of voters of every type and the
+type of every voter. The scores of the alternatives are then calculated in O(types * m) instead of O(n * m) and all the
+voters of a type can be handled at once.
+
+Profiles are persistent: changing the preference of a voter returns a new profile that shares the preferences and all
+the chunks of the voter types but one with the old one, and whose scores are updated from the old ones in O(m^2) per
+rule calculated so far. It still copies the list of the chunks and the counts of the types, i.e. a change costs
+O(n / CHUNK_SIZE + types) (plus O(types) for the index of the types if the preference is a new type), which is far less
+than the deep copy of the n matrices of a whole profile that the manipulation moves and the voting iterations made.
+"""
+
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from main.data_processing import get_scores_of_voters, get_winners_from_scores, stack_profile
+from main.preference import Preference, as_preference
+
+CHUNK_SIZE = 64  # the types of the voters are stored in chunks of this many voters
+
+
+class Profile:
+    """
+    Immutable profile of n voters. Changing the preference of a voter (see 'with_preference') returns a new profile.
+    """
+
+    __slots__ = ('types', '_type_of_key', '_counts', '_chunks', '_num_voters', '_scores', '_members')
+
+    def __init__(self, preferences: Sequence[Union[Preference, pd.DataFrame, np.ndarray]]):
+        self.types: List[Preference] = []
+        self._type_of_key: Dict[bytes, int] = {}
+        self._counts: List[int] = []  # the number of voters of every type
+        self._scores: Dict[Tuple[str, int], np.ndarray] = {}
+        self._members: Dict[int, List[int]] = None  # the voters of every type, only calculated if needed
+        type_of_voter = []
+        for pref in preferences:
+            pref = as_preference(pref)
+            if pref.key not in self._type_of_key:
+                self._type_of_key[pref.key] = len(self.types)
+                self.types.append(pref)
+                self._counts.append(0)
+            type_of_voter.append(self._type_of_key[pref.key])
+            self._counts[type_of_voter[-1]] += 1
+        self._num_voters = len(type_of_voter)
+        self._chunks = [
+            tuple(type_of_voter[start:start + CHUNK_SIZE]) for start in range(0, len(type_of_voter), CHUNK_SIZE)
+        ]
+
+    @classmethod
+    def from_preferences(cls, preferences: Union['Profile', Sequence]) -> 'Profile':
+        """
+        Converts a list of preferences (in any of the forms as_preference supports) to a Profile. Profiles are
+        returned as they are.
+        """
+        if isinstance(preferences, Profile):
+            return preferences
+        return cls(preferences)
+
+    def __len__(self) -> int:
+        return self._num_voters
+
+    def __getitem__(self, voter: int) -> Preference:
+        return self.types[self.type_of(voter)]
+
+    def __iter__(self) -> Iterator[Preference]:
+        return (self.types[type_] for chunk in self._chunks for type_ in chunk)
+
+    def __repr__(self) -> str:
+        return f'Profile(voters={len(self)}, types={self.num_types})'
+
+    def __reduce__(self) -> tuple:
+        return Profile, (list(self), )
+
+    def __copy__(self) -> 'Profile':
+        return self
+
+    def __deepcopy__(self, memo: dict) -> 'Profile':
+        return self
+
+    @property
+    def num_types(self) -> int:
+        return len(self.types)
+
+    @property
+    def counts(self) -> np.ndarray:
+        """
+        The number of voters of every type.
+        """
+        return np.array(self._counts, dtype=np.int64)
+
+    def type_of(self, voter: int) -> int:
+        if not 0 <= voter < self._num_voters:
+            raise IndexError(voter)
+        return self._chunks[voter // CHUNK_SIZE][voter % CHUNK_SIZE]
+
+    def voters_of_type(self, type_: int) -> List[int]:
+        """
+        The voters of the given type, in increasing order. Calculated in O(n) the first time it is needed.
+        """
+        if self._members is None:
+            self._members = {}
+            for voter, voter_type in enumerate(type_ for chunk in self._chunks for type_ in chunk):
+                self._members.setdefault(voter_type, []).append(voter)
+        return self._members.get(type_, [])
+
+    def scores(self, k: int, method: str) -> np.ndarray:
+        """
+        The total score of every alternative, i.e. the score every type gives weighted by the voters of the type.
+        """
+        if (method, k) not in self._scores:
+            type_scores = get_scores_of_voters(stack_profile(self.types), k, method)
+            self._scores[(method, k)] = self.counts @ type_scores
+        return self._scores[(method, k)]
+
+    def evaluate(self, k: int, method: str, alphabetical_order: dict) -> Tuple[int, List[int], dict]:
+        """
+        The same as 'evaluate_profile' of data_processing.py: (winner, possible_winners, scores_of_alternatives).
+        """
+        scores_of_alternatives = {
+            str(alternative): int(score) for alternative, score in enumerate(self.scores(k, method).tolist())
+        }
+        winner, possible_winners = get_winners_from_scores(scores_of_alternatives, alphabetical_order)
+        return winner, possible_winners, scores_of_alternatives
+
+    def with_preference(self, voter: int, pref: Union[Preference, pd.DataFrame, np.ndarray]) -> 'Profile':
+        """
+        Returns a new profile where the given voter has the given preference and everything else stays the same. The
+        chunk of the voter is copied and the scores calculated so far are updated with the difference of the two
+        preferences of the voter. The list of the chunks and the counts of the types are copied too (and the index of
+        the types if the preference is a new type), so this takes O(n / CHUNK_SIZE + types).
+        """
+        pref = as_preference(pref)
+        old_type = self.type_of(voter)
+        new_profile = Profile.__new__(Profile)
+        new_profile.types = self.types
+        new_profile._type_of_key = self._type_of_key
+        if pref.key not in self._type_of_key:
+            new_profile.types = self.types + [pref]
+            new_profile._type_of_key = {**self._type_of_key, pref.key: len(self.types)}
+        new_type = new_profile._type_of_key[pref.key]
+
+        new_profile._counts = self._counts + [0] * (len(new_profile.types) - len(self.types))
+        new_profile._counts[old_type] -= 1
+        new_profile._counts[new_type] += 1
+        new_profile._num_voters = self._num_voters
+        new_profile._chunks = list(self._chunks)
+        chunk = list(self._chunks[voter // CHUNK_SIZE])
+        chunk[voter % CHUNK_SIZE] = new_type
+        new_profile._chunks[voter // CHUNK_SIZE] = tuple(chunk)
+        new_profile._members = None
+
+        old_pref = self.types[old_type]
+        new_profile._scores = {
+            (method, k): scores - get_scores_of_voters(old_pref.matrix, k, method) +
+            get_scores_of_voters(pref.matrix, k, method)
+            for (method, k), scores in self._scores.items()
+        }
+        return new_profile
+
+
+def get_identical_voters(voter: int, current_profile: Profile, truthful_profile: Profile) -> List[int]:
+    """
+    All the voters (the given one included) whose current and truthful preferences are both the same as the ones of
+    the given voter. Such voters are in exactly the same situation in every manipulation move.
+    """
+    truthful_type = truthful_profile.type_of(voter)
+    return [
+        other for other in current_profile.voters_of_type(current_profile.type_of(voter))
+        if truthful_profile.type_of(other) == truthful_type
+    ]
@@ -0,0 +1,270 @@
+"""
+This module includes the store of the results of the experiments.
+
+The results used to be kept in one dict, dumped as a whole to data/results/total_result.pkl after every single run. The
+store keeps them in an SQLite table instead, with one row per run and the key tuple of the dict as its primary key, so
+adding a result is a single (transactional) insert and checking whether a key is already computed is an index lookup.
+`to_dict` returns the results in the exact shape of the old dict. Next to the pickled result, every row also keeps a
+few summary columns (hard_exit, convergence, num_rounds, final_winner), so that tables of all the runs (see 'to_frame'
+and main/analytics.py) are read straight from SQLite without unpickling any result. Runs made with a tracer (see
+main/tracing.py) also keep the summary of what their searches did, as JSON in the metrics column (see
+'metrics_to_frame').
+
+The runs of the large-electorate mode (see main/electorate.py) are not the same single runs as the ones of the default
+mode, so the mode is part of the key too (the large_electorate column). The keys of the legacy dict and of the stores
+created before that column existed have no mode; they are the keys of the default mode and are still accepted as such.
+"""
+
+import json
+import os
+import sqlite3
+from typing import Iterator, Optional, Tuple, Union
+
+import dill
+import pandas as pd
+
+RESULTS_PATH = 'data/results/total_result.sqlite'
+LEGACY_RESULTS_PATH = 'data/results/total_result.pkl'
+KEY_COLUMNS = (
+    'num_alt', 'num_voters', 'data_type', 'profile', 'k', 'method', 'meta_counter', 'do_additions', 'do_omissions',
+    'do_flips', 'complete_profiles', 'large_electorate'
+)
+SUMMARY_COLUMNS = ('hard_exit', 'convergence', 'num_rounds', 'final_winner')
+_BOOLEAN_KEY_COLUMNS = ('do_additions', 'do_omissions', 'do_flips', 'complete_profiles', 'large_electorate')
+_COLUMNS = KEY_COLUMNS + SUMMARY_COLUMNS + ('result', 'metrics')
+
+
+class ResultsStore:
+    """
+    Dict-like store of the results: store[key] = result, key in store, store[key], len(store), store.items().
+
+    The keys are the tuples (num_alt, num_voters, data_type, profile, k, method, meta_counter, do_additions,
+    do_omissions, do_flips, complete_profiles, large_electorate) and the results are either (convergence_happened,
+    res_dict) or 'hard_exit', as returned by voting_iteration. A key without large_electorate is the one of the default
+    mode (see get_full_key).
+    """
+
+    def __init__(self, path: str = RESULTS_PATH, legacy_path: str = LEGACY_RESULTS_PATH):
+        """
+        Opens (or creates) the store. A new store is filled with the results of the legacy pickle file, if it exists.
+        """
+        is_new = not os.path.isfile(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self._create_table('results')
+        self.connection.commit()
+        self._add_final_winner_column()
+        self._add_metrics_column()
+        self._add_large_electorate_column()
+        if is_new and legacy_path and os.path.isfile(legacy_path):
+            with open(legacy_path, 'rb') as f:
+                self.update(dill.load(f))
+
+    def __enter__(self) -> 'ResultsStore':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def _create_table(self, name: str):
+        self.connection.execute(
+            f'CREATE TABLE IF NOT EXISTS {name} ({", ".join(KEY_COLUMNS)}, hard_exit INTEGER, '
+            f'convergence INTEGER, num_rounds INTEGER, result BLOB, final_winner INTEGER, metrics TEXT, '
+            f'PRIMARY KEY ({", ".join(KEY_COLUMNS)}))'
+        )
+
+    def _add_final_winner_column(self):
+        """
+        Stores created before the final_winner column existed get it here, filled from their results.
+        """
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(results)')]
+        if 'final_winner' in columns:
+            return
+        with self.connection:
+            self.connection.execute('ALTER TABLE results ADD COLUMN final_winner INTEGER')
+            self.connection.executemany(
+                'UPDATE results SET final_winner = ? WHERE rowid = ?',
+                [(get_final_winner(dill.loads(result)), rowid)
+                 for rowid, result in self.connection.execute('SELECT rowid, result FROM results').fetchall()]
+            )
+
+    def _add_metrics_column(self):
+        """
+        Stores created before the metrics column existed get it here, empty (their runs were not traced).
+        """
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(results)')]
+        if 'metrics' not in columns:
+            with self.connection:
+                self.connection.execute('ALTER TABLE results ADD COLUMN metrics TEXT')
+
+    def _add_large_electorate_column(self):
+        """
+        Stores created before the large_electorate column existed get it here, all their runs being of the default
+        mode. The column is part of the primary key, so the table is copied into a new one.
+        """
+        columns = [row[1] for row in self.connection.execute('PRAGMA table_info(results)')]
+        if 'large_electorate' in columns:
+            return
+        with self.connection:
+            self._create_table('results_with_mode')
+            self.connection.execute(
+                f'INSERT INTO results_with_mode ({", ".join(columns)}, large_electorate) '
+                f'SELECT {", ".join(columns)}, 0 FROM results'
+            )
+            self.connection.execute('DROP TABLE results')
+            self.connection.execute('ALTER TABLE results_with_mode RENAME TO results')
+
+    @staticmethod
+    def _row_of(key: tuple, result: Union[str, tuple], metrics: dict = None) -> tuple:
+        return get_full_key(key) + get_summary(result) + (
+            dill.dumps(result), None if metrics is None else json.dumps(metrics)
+        )
+
+    @staticmethod
+    def _key_of(row: tuple) -> tuple:
+        key = dict(zip(KEY_COLUMNS, row))
+        for column in _BOOLEAN_KEY_COLUMNS:
+            key[column] = bool(key[column])
+        return tuple(key.values())
+
+    def __setitem__(self, key: tuple, result: Union[str, tuple]):
+        self.put(key, result)
+
+    def put(self, key: tuple, result: Union[str, tuple], metrics: dict = None):
+        """
+        Adds (or replaces) the result of a run, together with the summary of its tracer (see main/tracing.py) if it
+        was traced.
+        """
+        self.connection.execute(
+            f'INSERT OR REPLACE INTO results ({", ".join(_COLUMNS)}) VALUES ({", ".join(["?"] * len(_COLUMNS))})',
+            self._row_of(key, result, metrics)
+        )
+        self.connection.commit()
+
+    def update(self, results: dict):
+        """
+        Adds many results in a single transaction.
+        """
+        with self.connection:
+            self.connection.executemany(
+                f'INSERT OR REPLACE INTO results ({", ".join(_COLUMNS)}) VALUES ({", ".join(["?"] * len(_COLUMNS))})',
+                [self._row_of(key, result) for key, result in results.items()]
+            )
+
+    def _where_key(self) -> str:
+        return ' AND '.join(f'{column} = ?' for column in KEY_COLUMNS)
+
+    def __contains__(self, key: tuple) -> bool:
+        return self.connection.execute(f'SELECT 1 FROM results WHERE {self._where_key()}',
+                                       get_full_key(key)).fetchone() is not None
+
+    def __getitem__(self, key: tuple) -> Union[str, tuple]:
+        row = self.connection.execute(f'SELECT result FROM results WHERE {self._where_key()}',
+                                      get_full_key(key)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return dill.loads(row[0])
+
+    def get(self, key: tuple, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def get_metrics(self, key: tuple) -> Optional[dict]:
+        """
+        The summary of the tracer of the run, or None if the run was not traced.
+        """
+        row = self.connection.execute(f'SELECT metrics FROM results WHERE {self._where_key()}',
+                                      get_full_key(key)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return None if row[0] is None else json.loads(row[0])
+
+    def __len__(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def items(self) -> Iterator[Tuple[tuple, Union[str, tuple]]]:
+        for row in self.connection.execute(f'SELECT {", ".join(KEY_COLUMNS)}, result FROM results'):
+            yield self._key_of(row[:-1]), dill.loads(row[-1])
+
+    def keys(self) -> Iterator[tuple]:
+        for row in self.connection.execute(f'SELECT {", ".join(KEY_COLUMNS)} FROM results'):
+            yield self._key_of(row)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        The keys and the summary columns of all the runs (without the results themselves), one row per run.
+        """
+        return pd.read_sql_query(f'SELECT {", ".join(KEY_COLUMNS + SUMMARY_COLUMNS)} FROM results', self.connection)
+
+    def metrics_to_frame(self) -> pd.DataFrame:
+        """
+        The keys, the summary columns and the metrics of all the traced runs, one row per run. The nested metrics are
+        flattened into one column per entry, e.g. 'nodes_per_cost.2' and 'level_seconds.2'.
+        """
+        frame = pd.read_sql_query(
+            f'SELECT {", ".join(KEY_COLUMNS + SUMMARY_COLUMNS)}, metrics FROM results WHERE metrics IS NOT NULL',
+            self.connection
+        )
+        metrics = pd.json_normalize([json.loads(metrics) for metrics in frame.pop('metrics')])
+        return pd.concat([frame, metrics], axis=1)
+
+    def to_dict(self) -> dict:
+        """
+        All the results in the same dict shape as the legacy total_result.pkl.
+        """
+        return dict(self.items())
+
+    def export_pickle(self, path: str = LEGACY_RESULTS_PATH):
+        """
+        Writes all the results to a pickle file in the legacy format.
+        """
+        with open(path, 'wb') as f:
+            dill.dump(self.to_dict(), f)
+
+
+def get_full_key(key: tuple) -> tuple:
+    """
+    The key with all the KEY_COLUMNS: a key without the large_electorate column (of the legacy dict or of the runs made
+    before the column existed) is the one of the default mode.
+    """
+    key = tuple(key)
+    if len(key) == len(KEY_COLUMNS) - 1:
+        key += (False,)
+    assert len(key) == len(KEY_COLUMNS)
+    return key
+
+
+def get_final_winner(result: Union[str, tuple]) -> Union[int, None]:
+    """
+    The winner after the last manipulation of a run, or None if nobody manipulated (or the run was a hard exit).
+    """
+    if result == 'hard_exit' or not result[1]:
+        return None
+    return int(result[1][max(result[1])][0])
+
+
+def get_summary(result: Union[str, tuple]) -> tuple:
+    """
+    The values of the SUMMARY_COLUMNS of a result.
+    """
+    if result == 'hard_exit':
+        return 1, None, None, None
+    convergence_happened, res_dict = result
+    return 0, int(convergence_happened), len(res_dict), get_final_winner(result)
+
+
+def load_total_result(path: str = RESULTS_PATH) -> dict:
+    """
+    Loads all the results as the total_result dict that the notebook works with.
+    """
+    with ResultsStore(path) as store:
+        return store.to_dict()
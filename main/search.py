@@ -0,0 +1,205 @@
+"""
+This module includes the best-first (A*) search for the cheapest manipulation of a voter, i.e. the cheapest set of
+additions, omissions and flips of the voter's preference that gives a transitive preference that makes p win.
+
+A preference is searched as the tuple of the successor bitmasks of its alternatives (see main/transitivity.py). Every
+edge of the search changes the value of a single pair of alternatives:
+    - addition (incomparable -> preferred either way), cost 1
+    - omission (preferred either way -> incomparable), cost 1
+    - flip (preferred one way -> preferred the other way), cost 2
+so the cost of a path is the cost of the changes as in the paper, and the first goal that is popped from the priority
+queue is a cheapest manipulation. Among equally cheap ones, the one that is returned is picked at random.
+
+The heuristic is the number of changes that the rows of the preference need at least for the scores of the voter to
+be one of the score vectors that make p win. Under approval the score of an alternative only depends on the number of
+alternatives preferred to it and under veto on the number of alternatives it is preferred to. A change of cost 1 moves
+exactly one of these numbers by one and a flip (cost 2) moves two of them by one, so the heuristic never overestimates
+and never drops by more than the cost of an edge, i.e. it is admissible and consistent.
+"""
+
+import heapq
+import itertools
+import random
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from main.data_processing import get_winners_from_scores
+from main.deadline import Deadline
+from main.preference import Preference
+from main.tracing import SearchTracer
+from main.transitivity import is_transitive_masks, masks_to_matrix
+
+
+def get_winning_scores(scores_without_voter: Sequence[int], p: int, alphabetical_order: dict) -> np.ndarray:
+    """
+    Returns all the 0/1 score vectors that the voter can give to the alternatives such that p wins, given the total
+    scores of the alternatives without the voter, as a (number_of_vectors, m) int array.
+    """
+    winning_scores = []
+    for voter_scores in itertools.product([0, 1], repeat=len(scores_without_voter)):
+        scores = {
+            str(alternative): score + voter_score
+            for alternative, (score, voter_score) in enumerate(zip(scores_without_voter, voter_scores))
+        }
+        if get_winners_from_scores(scores, alphabetical_order)[0] == p:
+            winning_scores.append(voter_scores)
+    return np.array(winning_scores, dtype=np.int64).reshape(-1, len(scores_without_voter))
+
+
+class ManipulationSearch:
+    """
+    A* search from the preference of a voter to the cheapest transitive preference whose scores are one of the
+    'winning_scores' (see get_winning_scores).
+    """
+
+    def __init__(
+        self,
+        preference: Preference,
+        winning_scores: np.ndarray,
+        k: int,
+        method: str,
+        do_additions: bool,
+        do_omissions: bool,
+        do_flips: bool,
+        deadline: Deadline = None,
+        tracer: SearchTracer = None
+    ):
+        assert method in ['approval', 'veto']
+        self.preference = preference
+        self.num_of_alternatives = len(preference)
+        self.winning_scores = winning_scores
+        self.k = k
+        self.method = method
+        self.do_additions = do_additions
+        self.do_omissions = do_omissions
+        self.do_flips = do_flips
+        self.deadline = deadline if deadline is not None else Deadline()
+        self.tracer = tracer  # see main/tracing.py
+        self.pairs = list(itertools.combinations(range(self.num_of_alternatives), 2))
+        self._heuristics: Dict[Tuple[int, ...], int] = {}
+        self.expanded_nodes = 0
+
+    def count_of_pair(self, better: int, worse: int) -> int:
+        """
+        The alternative whose count (see 'counts') changes when the relation "better is preferred to worse" is added or
+        removed.
+        """
+        return worse if self.method == 'approval' else better
+
+    def counts(self, masks: Sequence[int]) -> Tuple[int, ...]:
+        """
+        The number per alternative that its score depends on: the number of alternatives preferred to it (approval) or
+        the number of alternatives it is preferred to (veto).
+        """
+        if self.method == 'approval':
+            return tuple(sum(mask >> alternative & 1 for mask in masks) for alternative in range(len(masks)))
+        return tuple(bin(mask).count('1') for mask in masks)
+
+    def heuristic(self, counts: Tuple[int, ...]) -> int:
+        """
+        The minimum number of changes of the counts such that the scores of the voter become one of the winning
+        scores. 0 if and only if the scores are already winning ones.
+        """
+        if counts not in self._heuristics:
+            counts_array = np.array(counts)
+            if self.method == 'approval':  # score 1 if less than k alternatives are preferred to the alternative
+                changes_for_score_1 = np.maximum(0, counts_array - self.k + 1)
+                changes_for_score_0 = np.maximum(0, self.k - counts_array)
+            else:  # score 1 if the alternative is preferred to at least k alternatives
+                changes_for_score_1 = np.maximum(0, self.k - counts_array)
+                changes_for_score_0 = np.maximum(0, counts_array - self.k + 1)
+            changes = self.winning_scores @ (changes_for_score_1 - changes_for_score_0) + changes_for_score_0.sum()
+            self._heuristics[counts] = int(changes.min())
+        return self._heuristics[counts]
+
+    def children(self, masks: Tuple[int, ...],
+                 counts: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...], Tuple[int, ...]]]:
+        """
+        All the preferences that differ from the given one in a single pair of alternatives.
+
+        Returns:
+            A list of (cost_of_the_change, masks_of_child, counts_of_child) tuples.
+        """
+        children = []
+        for i, j in self.pairs:
+            if masks[i] >> j & 1:
+                better, worse = i, j
+            elif masks[j] >> i & 1:
+                better, worse = j, i
+            else:
+                if self.do_additions:
+                    for better, worse in [(i, j), (j, i)]:
+                        child_masks = list(masks)
+                        child_masks[better] |= 1 << worse
+                        child_counts = list(counts)
+                        child_counts[self.count_of_pair(better, worse)] += 1
+                        children.append((1, tuple(child_masks), tuple(child_counts)))
+                continue
+            if self.do_omissions:
+                child_masks = list(masks)
+                child_masks[better] &= ~(1 << worse)
+                child_counts = list(counts)
+                child_counts[self.count_of_pair(better, worse)] -= 1
+                children.append((1, tuple(child_masks), tuple(child_counts)))
+            if self.do_flips:
+                child_masks = list(masks)
+                child_masks[better] &= ~(1 << worse)
+                child_masks[worse] |= 1 << better
+                child_counts = list(counts)
+                child_counts[self.count_of_pair(better, worse)] -= 1
+                child_counts[self.count_of_pair(worse, better)] += 1
+                children.append((2, tuple(child_masks), tuple(child_counts)))
+        return children
+
+    def run(self) -> Optional[Tuple[int, Preference]]:
+        """
+        Runs the search. Raises DeadlineExceeded if the deadline passes before it finishes.
+
+        Returns:
+            (cost, preference) of a cheapest manipulation or None if there is no manipulation at all.
+        """
+        if not len(self.winning_scores):
+            return None
+        masks = self.preference.successor_masks
+        counts = self.counts(masks)
+        tie_breaker = itertools.count()
+        # (cost + heuristic, -cost, random tie-break among equally good nodes, insertion order, cost, masks, counts)
+        queue = [(self.heuristic(counts), 0, random.random(), next(tie_breaker), 0, masks, counts)]
+        best_costs = {masks: 0}
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.add_nodes(0)
+        while queue:
+            self.deadline.check()
+            _, _, _, _, cost, masks, counts = heapq.heappop(queue)
+            if best_costs[masks] < cost:
+                if tracer is not None:
+                    tracer.duplicates_pruned += 1
+                continue  # a cheaper path to the same preference has already been expanded
+            if self.heuristic(counts) == 0:
+                if tracer is not None:
+                    tracer.transitivity_checks += 1
+                if is_transitive_masks(masks):
+                    return cost, Preference(masks_to_matrix(masks))
+            self.expanded_nodes += 1
+            expansion_start = time.perf_counter() if tracer is not None else 0.0
+            for change_cost, child_masks, child_counts in self.children(masks, counts):
+                child_cost = cost + change_cost
+                if child_cost < best_costs.get(child_masks, child_cost + 1):
+                    best_costs[child_masks] = child_cost
+                    heapq.heappush(
+                        queue, (
+                            child_cost + self.heuristic(child_counts), -child_cost, random.random(), next(tie_breaker),
+                            child_cost, child_masks, child_counts
+                        )
+                    )
+                    if tracer is not None:
+                        tracer.add_nodes(child_cost)
+                elif tracer is not None:
+                    tracer.duplicates_pruned += 1
+            if tracer is not None:
+                tracer.add_level_time(cost, time.perf_counter() - expansion_start)
+                tracer.update_frontier(len(queue))
+        return None
@@ -0,0 +1,78 @@
+"""
+This module includes the tracer of the manipulation searches: structured counters of what the searches of a voting
+iteration did, so that slow profiles can be analysed offline (and across many runs) instead of reading the verbose
+prints.
+
+voting_iteration and Manipulation (and the searches and the children generations they run) report into the tracer
+that they are given. Without one (the default) every report is skipped by a single `is not None` check, so tracing
+costs nothing when it is off. `SearchTracer.summary` gives the counters of a whole run as a JSON-friendly dict, which
+orchestration.py stores next to the result with `--trace true` (see ResultsStore.get_metrics).
+"""
+
+import time
+from typing import Dict, List
+
+
+class SearchTracer:
+    """
+    The counters of the searches of one voting iteration:
+        - nodes: the preferences generated by the searches, per cost (of the changes from the voter's preference),
+        - duplicates_pruned: the preferences that were generated again and dropped (the tree of the original search) or
+          that were reached again without a cheaper path (the A* search),
+        - transitivity_checks: all the preferences whose transitivity was checked, i.e. the candidates that make p win
+          and the parents of the children generations (the original search), the popped preferences whose scores make
+          p win (the A* search) and the preferences of the moves that put p on top or the winner at the bottom,
+        - evaluations: the evaluations of the whole profile (Profile.evaluate),
+        - candidate_evaluations: the candidate preferences whose winner was calculated (in batch) by the original
+          search,
+        - oracle_lookups and cache_hits: the manipulations looked up in the oracle and the moves found in the cache,
+        - level_seconds: the wall time spent per cost level (the A* search attributes the time of every expansion to
+          the cost of the expanded preference),
+        - move_seconds: the wall time of every manipulation move that ran,
+        - max_frontier: the largest number of preferences waiting to be expanded (the priority queue of the A* search
+          or a tree level of the original search).
+    """
+
+    def __init__(self):
+        self.nodes: Dict[int, int] = {}
+        self.duplicates_pruned = 0
+        self.transitivity_checks = 0
+        self.evaluations = 0
+        self.candidate_evaluations = 0
+        self.oracle_lookups = 0
+        self.cache_hits = 0
+        self.level_seconds: Dict[int, float] = {}
+        self.move_seconds: List[float] = []
+        self.max_frontier = 0
+        self.start = time.perf_counter()
+
+    def add_nodes(self, cost: int, count: int = 1):
+        self.nodes[cost] = self.nodes.get(cost, 0) + count
+
+    def add_level_time(self, cost: int, seconds: float):
+        self.level_seconds[cost] = self.level_seconds.get(cost, 0.0) + seconds
+
+    def update_frontier(self, size: int):
+        if size > self.max_frontier:
+            self.max_frontier = size
+
+    def summary(self) -> dict:
+        """
+        All the counters of the run (with str keys, so that it can be dumped to JSON as is).
+        """
+        return {
+            'seconds': time.perf_counter() - self.start,
+            'moves': len(self.move_seconds),
+            'move_seconds_total': sum(self.move_seconds),
+            'move_seconds_max': max(self.move_seconds, default=0.0),
+            'nodes': sum(self.nodes.values()),
+            'nodes_per_cost': {str(cost): count for cost, count in sorted(self.nodes.items())},
+            'duplicates_pruned': self.duplicates_pruned,
+            'transitivity_checks': self.transitivity_checks,
+            'evaluations': self.evaluations,
+            'candidate_evaluations': self.candidate_evaluations,
+            'oracle_lookups': self.oracle_lookups,
+            'cache_hits': self.cache_hits,
+            'level_seconds': {str(cost): seconds for cost, seconds in sorted(self.level_seconds.items())},
+            'max_frontier': self.max_frontier
+        }
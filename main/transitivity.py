@@ -0,0 +1,107 @@
+"""
+This module includes the bitset kernels used to check (and enforce) the transitivity of preferences.
+
+Every row i of a preference matrix is encoded as an integer bitmask whose bit j is set if alternative i is preferred to
+alternative j (i.e. the cell (i, j) is 1), the so called successors of i. A preference is transitive if for every
+alternative i, the union of the successor masks of all the successors of i is a subset of the successor mask of i.
+Single preferences use Python integers (so any m works), the batch variants use uint64 arrays and cover m up to 64.
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+MAX_ALTERNATIVES_IN_BATCH = 64
+_POWERS_OF_TWO = np.left_shift(1, np.arange(62, dtype=np.int64))
+
+
+def successor_masks(matrix: np.ndarray) -> Tuple[int, ...]:
+    """
+    Returns the successor bitmask of every row of a preference matrix.
+    """
+    matrix = np.asarray(matrix)
+    if len(matrix) < 63:
+        return tuple(((matrix == 1) @ _POWERS_OF_TWO[:len(matrix)]).tolist())
+    packed = np.packbits(matrix == 1, axis=-1, bitorder='little')
+    return tuple(int.from_bytes(row.tobytes(), 'little') for row in packed)
+
+
+def masks_to_matrix(masks: Sequence[int]) -> np.ndarray:
+    """
+    The inverse of 'successor_masks'. Returns the int8 preference matrix of the given successor bitmasks.
+    """
+    num_of_alternatives = len(masks)
+    matrix = np.zeros((num_of_alternatives, num_of_alternatives), dtype=np.int8)
+    for i, mask in enumerate(masks):
+        for j in iterate_bits(mask):
+            matrix[i, j] = 1
+            matrix[j, i] = -1
+    return matrix
+
+
+def iterate_bits(mask: int):
+    """
+    Yields the indices of the set bits of a mask, from the lowest to the highest.
+    """
+    while mask:
+        lowest_bit = mask & -mask
+        yield lowest_bit.bit_length() - 1
+        mask ^= lowest_bit
+
+
+def is_transitive_masks(masks: Sequence[int]) -> bool:
+    for mask in masks:
+        union_of_successors = 0
+        for j in iterate_bits(mask):
+            union_of_successors |= masks[j]
+        if union_of_successors & ~mask:
+            return False
+    return True
+
+
+def transitive_closure(masks: Sequence[int]) -> Tuple[int, ...]:
+    """
+    Returns the successor masks of the transitive closure of the given masks (Warshall's algorithm on bitsets).
+    """
+    closure = list(masks)
+    for k in range(len(closure)):
+        bit_k = 1 << k
+        for i in range(len(closure)):
+            if closure[i] & bit_k:
+                closure[i] |= closure[k]
+    return tuple(closure)
+
+
+def repair_transitivity(matrix: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Returns the smallest transitive preference that contains all the strict preferences of the given matrix (i.e. only
+    additions are made), or None if that is not possible because the strict preferences form a cycle.
+    """
+    closure = transitive_closure(successor_masks(matrix))
+    if any(mask >> i & 1 for i, mask in enumerate(closure)):
+        return None
+    return masks_to_matrix(closure)
+
+
+def successor_masks_batch(matrices: np.ndarray) -> np.ndarray:
+    """
+    Batch variant of 'successor_masks'. Gets a (c, m, m) stack of preference matrices and returns a (c, m) uint64 array.
+    """
+    num_of_alternatives = matrices.shape[-1]
+    assert num_of_alternatives <= MAX_ALTERNATIVES_IN_BATCH
+    powers_of_two = np.left_shift(np.uint64(1), np.arange(num_of_alternatives, dtype=np.uint64))
+    # the bits are distinct so summing them is the same as OR-ing them.
+    return ((matrices == 1) * powers_of_two).sum(axis=-1, dtype=np.uint64)
+
+
+def check_transitivity_batch(matrices: np.ndarray) -> np.ndarray:
+    """
+    Batch variant of the transitivity check. Gets a (c, m, m) stack of preference matrices and returns a (c,) boolean
+    array that says which of them are transitive.
+    """
+    masks = successor_masks_batch(matrices)
+    union_of_successors = np.zeros_like(masks)
+    for j in range(matrices.shape[-1]):
+        has_successor_j = (masks >> np.uint64(j)) & np.uint64(1)
+        union_of_successors |= has_successor_j * masks[..., j, None]
+    return ~(union_of_successors & ~masks).any(axis=-1)
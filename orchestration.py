@@ -7,74 +7,206 @@ E.g. of script call:
 ```
  python orchestration.py --num_alt 5 --num_voter 10 --data_type 2urn --k 4 --method approval --time_limit 900
  ```
+Passing e.g. `--workers 8` runs the profiles in parallel in 8 worker processes.
+
+`--time_limit` is the time budget (in seconds) of every profile and `--move_time_limit` the optional budget of every
+single manipulation move. A profile that runs out of time is saved as "hard_exit". When running with workers, a worker
+that does not respond within WORKER_GRACE_PERIOD seconds after the time limit is killed and the profile is saved as
+"hard_exit" too.
+
+With `--manipulation_cache_size N` the outcomes of the manipulation moves are cached in every process (at most N of
+them). The cache is off by default (0): a cached move replays the manipulation that was picked the first time instead of
+drawing again among the equally good ones, so the meta counters of a profile would no longer be independent runs. With
+`--manipulation_cache_path` the cache is also saved to that file and used by the next runs.
+
+With `--trace true` every voting iteration runs with a tracer (see main/tracing.py) and the summary of what its searches
+did (nodes per cost, duplicates pruned, transitivity checks, evaluations, wall time per level and per move, ...) is
+stored next to its result, see ResultsStore.metrics_to_frame.
+
+With `--large_electorate true` the voting iterations run in the large-electorate mode (see main/electorate.py), which
+is built for profiles of thousands of voters. The iterations are the same (and so are the distributions of their
+results), but a random seed does not give the same single runs as the default mode, so the mode is part of the key of
+the results (see main/results_store.py).
 """
 
 import argparse
-import os
+from typing import Union
 
-import dill
 from tqdm import tqdm
 
+from main.dataset import load_profiles
+from main.deadline import Deadline
+from main.electorate import large_electorate_iteration
+from main.manipulation_cache import get_loaded_manipulation_caches, get_manipulation_cache, save_manipulation_caches
 from main.orchestration import voting_iteration
+from main.parallel import JOB_TIMED_OUT, WorkerPool
+from main.results_store import ResultsStore
+from main.tracing import SearchTracer
+
+WORKER_GRACE_PERIOD = 60
+
+
+def str2bool(value: Union[str, bool]) -> bool:
+    if isinstance(value, bool):
+        return value
+    if value.lower() in ['true', '1', 'yes']:
+        return True
+    if value.lower() in ['false', '0', 'no']:
+        return False
+    raise argparse.ArgumentTypeError(f'{value} is not a boolean')
+
+
+def get_key(args, random_profile: int, meta_counter: int) -> tuple:
+    return (
+        args.num_alt, args.num_voters, args.data_type, random_profile, args.k, args.method, meta_counter,
+        args.do_additions, args.do_omissions, args.do_flips, args.complete_profiles,
+        getattr(args, 'large_electorate', False)
+    )
+
+
+def should_calculate(key: tuple, total_result: ResultsStore, args) -> bool:
+    calculate_it = False
+    if key not in total_result:
+        calculate_it = True
+    elif total_result[key] == 'hard_exit' and args.retry_slow_ones:
+        calculate_it = True
+    elif args.overwrite:
+        calculate_it = True
+    return calculate_it
+
+
+def run_profile(
+    all_preferences,
+    random_profile: int,
+    meta_counters_to_calculate: list,
+    args,
+    alphabetical_order,
+    deadline: Deadline = None
+):
+    """
+    Runs the voting iterations of one profile for all the meta counters that need to be calculated and yields the
+    (key, result, metrics) of every one of them as soon as it is ready, metrics being the summary of the tracer of the
+    iteration if args.trace, otherwise None. If the (e.g. sweep) deadline passes, it stops without yielding the result
+    that was cut short, so that it is calculated again in the next run.
+    """
+    cache = None
+    if getattr(args, 'manipulation_cache_size', 0):
+        cache = get_manipulation_cache(args.manipulation_cache_size, getattr(args, 'manipulation_cache_path', None))
+    iteration = large_electorate_iteration if getattr(args, 'large_electorate', False) else voting_iteration
+    for meta_counter in meta_counters_to_calculate:
+        key = get_key(args, random_profile, meta_counter)
+        tracer = SearchTracer() if getattr(args, 'trace', False) else None
+        result = iteration(
+            all_preferences,
+            args.verbose,
+            args.k,
+            args.method,
+            alphabetical_order,
+            args.do_additions,
+            args.do_omissions,
+            args.do_flips,
+            args.time_limit,
+            move_time_limit=getattr(args, 'move_time_limit', None),
+            deadline=deadline,
+            cache=cache,
+            tracer=tracer
+        )
+        if result == 'hard_exit' and deadline is not None and deadline.expired():
+            break
+        yield key, result, None if tracer is None else tracer.summary()
+        if result == 'hard_exit':
+            break
+        # if it cannot manipulate for this profile then it doesn't make sense running the profile
+        # multiple times cause the random order doesn't play a role
+        if not result[1]:
+            break
+
+
+def save_result(total_result: ResultsStore, key: tuple, result, metrics: dict = None):
+    # a single insert, committed right away, instead of rewriting all the results
+    total_result.put(key, result, metrics)
+
+
+def open_results_store() -> ResultsStore:
+    """
+    The results store that the runs are saved to (see main.results_store.load_total_result for the results as a dict).
+    """
+    return ResultsStore()
+
+
+def get_alphabetical_order(num_alt: int) -> dict:
+    alphabetical_order = {}
+    for i in range(num_alt):
+        alphabetical_order[i] = i
+    return alphabetical_order
+
+
+def get_jobs(
+    args, data_to_use, total_result: ResultsStore, prof_indices_to_run: list, deadline: Deadline = None
+) -> list:
+    """
+    Returns the (job_id, arguments_of_run_profile) of every profile that has at least one meta counter left to
+    calculate. The job_id is the key of the first meta counter of the profile.
+    """
+    alphabetical_order = get_alphabetical_order(args.num_alt)
+    jobs = []
+    for random_profile in prof_indices_to_run:
+        meta_counters_to_calculate = [
+            meta_counter for meta_counter in range(args.num_iterations)
+            if should_calculate(get_key(args, random_profile, meta_counter), total_result, args)
+        ]
+        if meta_counters_to_calculate:
+            jobs.append((
+                get_key(args, random_profile, meta_counters_to_calculate[0]),
+                (
+                    data_to_use[random_profile], random_profile, meta_counters_to_calculate, args, alphabetical_order,
+                    deadline
+                )
+            ))
+    return jobs
+
+
+def run_jobs(jobs: list, workers: int, total_result: ResultsStore, desc: str = 'random profiles'):
+    if workers > 1:
+        # The workers only run the voting iterations, the results file is written by this process alone.
+        # Every voting iteration stops by itself at its time limit, so a worker that is silent for longer than the
+        # largest time limit (plus a grace period) is stuck and gets killed.
+        message_timeout = max(job_args[3].time_limit for _, job_args in jobs) + WORKER_GRACE_PERIOD if jobs else None
+        keys_left = {
+            job_id: [get_key(job_args[3], job_args[1], meta_counter) for meta_counter in job_args[2]]
+            for job_id, job_args in jobs
+        }
+        with WorkerPool(workers, run_profile, message_timeout, save_manipulation_caches) as pool, \
+                tqdm(total=len(jobs), desc=desc) as pbar:
+            for job_id, message, job_finished in pool.imap_unordered(jobs):
+                if job_finished:
+                    if message == JOB_TIMED_OUT:
+                        print(f'killed the worker of {keys_left[job_id][0]} due to slowness')
+                        save_result(total_result, keys_left[job_id][0], 'hard_exit')
+                    pbar.update()
+                else:
+                    keys_left[job_id].remove(message[0])
+                    save_result(total_result, *message)
+    else:
+        for _, job_args in tqdm(jobs, desc=desc):
+            for message in run_profile(*job_args):
+                save_result(total_result, *message)
+        save_manipulation_caches()
+        for cache in get_loaded_manipulation_caches():
+            print(f'manipulation cache: {cache.stats()}')
 
 
 def main(args):
-    if args.complete_profiles:
-        suffix = '_complete'
-    else:
-        suffix = '_incomplete'
-    with open(f'data/our_data{suffix}.pkl', 'rb') as f:
-        all_data = dill.load(f)
-
-    alphabetical_order = {}
-    for i in range(args.num_alt):
-        alphabetical_order[i] = i
+    all_data = load_profiles(args.complete_profiles)
 
     data_to_use = all_data[(args.num_voters, args.num_alt, args.data_type)]
     print(f'running {args}')
 
-    if os.path.isfile('data/results/total_result.pkl'):
-        with open('data/results/total_result.pkl', 'rb') as f:
-            total_result = dill.load(f)
-    else:
-        total_result = {}
+    total_result = open_results_store()
 
     prof_indices_to_run = list(range(len(data_to_use))) if args.random_choice is None else [args.random_choice]
 
-    for random_profile in tqdm(prof_indices_to_run, desc='random profiles'):
-        all_preferences = data_to_use[random_profile]
-        for meta_counter in range(args.num_iterations):
-            key = (
-                args.num_alt, args.num_voters, args.data_type, random_profile, args.k, args.method, meta_counter,
-                args.do_additions, args.do_omissions, args.do_flips, args.complete_profiles
-            )
-            calculate_it = False
-            if key not in total_result.keys():
-                calculate_it = True
-            elif total_result[key] == 'hard_exit' and args.retry_slow_ones:
-                calculate_it = True
-            elif args.overwrite:
-                calculate_it = True
-
-            if calculate_it:
-                result = voting_iteration(
-                    all_preferences, args.verbose, args.k, args.method, alphabetical_order, args.do_additions,
-                    args.do_omissions, args.do_flips, args.time_limit
-                )
-                if result == 'hard_exit':
-                    total_result[key] = 'hard_exit'
-                    with open('data/results/total_result.pkl', 'wb') as f:
-                        dill.dump(total_result, f)
-                    break
-                else:
-                    convergence_happened, res_dict = result
-                    total_result[key] = (convergence_happened, res_dict)
-                    # if it cannot manipulate for this profile then it doesn't make sense running the profile
-                    # multiple times cause the random order doesn't play a role
-                    with open('data/results/total_result.pkl', 'wb') as f:
-                        dill.dump(total_result, f)
-                    if not res_dict:
-                        break
+    run_jobs(get_jobs(args, data_to_use, total_result, prof_indices_to_run), args.workers, total_result)
 
 
 if __name__ == '__main__':
@@ -93,8 +225,14 @@ if __name__ == '__main__':
     parser.add_argument('--verbose', type=bool, default=False)
     parser.add_argument('--retry_slow_ones', type=bool, default=False)
     parser.add_argument('--time_limit', type=int, default=900)
+    parser.add_argument('--move_time_limit', type=int, default=None)
     parser.add_argument('--overwrite', type=bool, default=False)
     parser.add_argument('--complete_profiles', type=bool, default=False)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--manipulation_cache_size', type=int, default=0)
+    parser.add_argument('--manipulation_cache_path', type=str, default=None)
+    parser.add_argument('--trace', type=str2bool, default=False)
+    parser.add_argument('--large_electorate', type=str2bool, default=False)
 
     args = parser.parse_args()
     assert args.k <= args.num_alt
@@ -0,0 +1,163 @@
+"""
+This is the entrypoint script that runs a whole grid of experiment configurations (e.g. all the ones of the paper) in a
+single process. Every dataset and the results are loaded only once, the profiles of all the configurations are
+scheduled on one shared pool of workers and whatever is already in the results is skipped (see `should_calculate` in
+orchestration.py).
+
+E.g. of script calls:
+```
+ python sweep.py --grid grid.json --workers 8
+ python sweep.py --num_alt 3 4 5 --num_voters 10 20 50 --data_type ic 2urn --k 1 m-1 --method approval veto
+  --complete_profiles true false --workers 8
+ ```
+A grid file is a JSON (or YAML, if PyYAML is installed) object with a list of values for any of the grid parameters and
+single values for any of the other settings, e.g.:
+```
+ {"num_alt": [3, 4, 5], "num_voters": [10, 20, 50], "data_type": ["ic", "2urn"], "k": [1, "m-1"],
+  "method": ["approval", "veto"], "complete_profiles": [true, false], "time_limit": 900}
+ ```
+Values given in the command line override the ones of the grid file. k can also be given relative to the number of
+alternatives, e.g. "m-1". `--sweep_time_limit` bounds the whole sweep: the profiles still running when it passes are
+stopped and left for the next run.
+"""
+
+import argparse
+import itertools
+import json
+import re
+from typing import List, Union
+
+from main.deadline import Deadline
+from orchestration import get_jobs, load_profiles, open_results_store, run_jobs, str2bool
+
+GRID_PARAMETERS = {
+    'num_alt': [3],
+    'num_voters': [10],
+    'data_type': ['ic'],
+    'k': [1],
+    'method': ['approval'],
+    'do_additions': [True],
+    'do_omissions': [True],
+    'do_flips': [True],
+    'complete_profiles': [False],
+}
+SETTINGS = {
+    'num_iterations': 1,
+    'time_limit': 900,
+    'move_time_limit': None,
+    'sweep_time_limit': None,
+    'manipulation_cache_size': 0,
+    'manipulation_cache_path': None,
+    'retry_slow_ones': False,
+    'overwrite': False,
+    'verbose': False,
+    'trace': False,
+    'large_electorate': False,
+}
+
+
+def resolve_k(k: Union[int, str], num_alt: int) -> int:
+    """
+    Gets a k given either as a number or relative to the number of alternatives (e.g. "m", "m-1" or "m+1") and returns
+    the number.
+    """
+    if isinstance(k, int):
+        return k
+    k = k.replace(' ', '')
+    match = re.fullmatch(r'm(?:([+-])(\d+))?', k)
+    if match is None:
+        return int(k)
+    operator, offset = match.groups()
+    if operator is None:
+        return num_alt
+    return num_alt + int(offset) if operator == '+' else num_alt - int(offset)
+
+
+def load_grid(path: str) -> dict:
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml  # optional dependency, only needed for YAML grid files
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def get_grid_cells(grid: dict) -> List[argparse.Namespace]:
+    """
+    Expands the grid to all the combinations of its parameters. Every combination is returned as the same kind of
+    arguments that orchestration.py gets for a single run.
+    """
+    unknown = set(grid) - set(GRID_PARAMETERS) - set(SETTINGS)
+    assert not unknown, f'unknown grid parameters: {unknown}'
+    settings = {name: grid.get(name, default) for name, default in SETTINGS.items()}
+    values = [grid.get(name, default) for name, default in GRID_PARAMETERS.items()]
+    values = [value if isinstance(value, list) else [value] for value in values]
+
+    cells = []
+    seen = set()
+    for combination in itertools.product(*values):
+        cell = dict(zip(GRID_PARAMETERS, combination))
+        cell['k'] = resolve_k(cell['k'], cell['num_alt'])
+        for name in ['do_additions', 'do_omissions', 'do_flips', 'complete_profiles']:
+            cell[name] = str2bool(cell[name])
+        if not 1 <= cell['k'] <= cell['num_alt']:
+            print(f'skipping {cell}: invalid k')
+            continue
+        if tuple(cell.values()) in seen:
+            continue
+        seen.add(tuple(cell.values()))
+        cells.append(argparse.Namespace(**cell, **settings))
+    return cells
+
+
+def main(args):
+    grid = load_grid(args.grid) if args.grid else {}
+    for name in list(GRID_PARAMETERS) + list(SETTINGS):
+        if getattr(args, name) is not None:
+            grid[name] = getattr(args, name)
+    cells = get_grid_cells(grid)
+    print(f'running {len(cells)} configurations')
+
+    deadline = Deadline(cells[0].sweep_time_limit if cells else None)
+    total_result = open_results_store()
+    all_data = {}
+    jobs = []
+    for cell in cells:
+        if cell.complete_profiles not in all_data:
+            all_data[cell.complete_profiles] = load_profiles(cell.complete_profiles)
+        data_to_use = all_data[cell.complete_profiles].get((cell.num_voters, cell.num_alt, cell.data_type))
+        if data_to_use is None:
+            print(f'skipping {cell}: no data')
+            continue
+        jobs += get_jobs(cell, data_to_use, total_result, list(range(len(data_to_use))), deadline)
+    print(f'{len(jobs)} profiles to run')
+
+    run_jobs(jobs, args.workers, total_result, desc='grid profiles')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--grid', type=str, default=None)
+    parser.add_argument('--num_alt', type=int, nargs='+', default=None)
+    parser.add_argument('--num_voters', type=int, nargs='+', default=None)
+    parser.add_argument('--data_type', type=str, nargs='+', default=None)
+    parser.add_argument('--k', type=str, nargs='+', default=None)
+    parser.add_argument('--method', type=str, nargs='+', default=None)
+    parser.add_argument('--do_additions', type=str2bool, nargs='+', default=None)
+    parser.add_argument('--do_omissions', type=str2bool, nargs='+', default=None)
+    parser.add_argument('--do_flips', type=str2bool, nargs='+', default=None)
+    parser.add_argument('--complete_profiles', type=str2bool, nargs='+', default=None)
+    parser.add_argument('--num_iterations', type=int, default=None)
+    parser.add_argument('--time_limit', type=int, default=None)
+    parser.add_argument('--move_time_limit', type=int, default=None)
+    parser.add_argument('--sweep_time_limit', type=int, default=None)
+    parser.add_argument('--manipulation_cache_size', type=int, default=None)
+    parser.add_argument('--manipulation_cache_path', type=str, default=None)
+    parser.add_argument('--retry_slow_ones', type=str2bool, default=None)
+    parser.add_argument('--overwrite', type=str2bool, default=None)
+    parser.add_argument('--verbose', type=str2bool, default=None)
+    parser.add_argument('--trace', type=str2bool, default=None)
+    parser.add_argument('--large_electorate', type=str2bool, default=None)
+    parser.add_argument('--workers', type=int, default=1)
+
+    main(parser.parse_args())
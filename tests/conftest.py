@@ -0,0 +1,17 @@
+"""
+The fixtures shared by the tests.
+"""
+
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def data_dirs(tmp_path_factory):
+    """
+    The catalogues and the oracles that the tests build are saved to a temporary directory instead of data/.
+    """
+    data_dir = tmp_path_factory.mktemp('data')
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr('main.catalogue.CATALOGUE_DIR', str(data_dir / 'catalogue'))
+        patch.setattr('main.oracle.ORACLE_DIR', str(data_dir / 'oracle'))
+        yield data_dir
@@ -0,0 +1,60 @@
+"""
+Tests of the catalogue of the partial preferences (main/catalogue.py).
+"""
+
+import numpy as np
+import pytest
+
+from main.catalogue import PreferenceCatalogue, enumerate_partial_preferences, get_catalogue
+from main.transitivity import check_transitivity_batch, successor_masks
+
+NUMBERS_OF_PARTIAL_PREFERENCES = {1: 1, 2: 3, 3: 19, 4: 219, 5: 4231, 6: 130023}  # OEIS A001035
+
+
+@pytest.mark.parametrize('num_alt, expected', NUMBERS_OF_PARTIAL_PREFERENCES.items())
+def test_number_of_partial_preferences(num_alt, expected):
+    matrices = enumerate_partial_preferences(num_alt)
+    assert len(matrices) == expected
+    assert check_transitivity_batch(matrices).all()
+    assert (matrices == -matrices.swapaxes(1, 2)).all()
+    keys = [matrix.tobytes() for matrix in matrices]
+    assert keys == sorted(set(keys))  # all different and sorted by key
+
+
+@pytest.mark.parametrize('num_alt', [3, 4])
+def test_complete_preferences_are_the_rankings(num_alt):
+    assert len(get_catalogue(num_alt).complete_ids) == np.prod(range(1, num_alt + 1))
+
+
+@pytest.mark.parametrize('complete', [False, True])
+@pytest.mark.parametrize('weighted', [False, True])
+def test_sample_ids_is_reproducible(complete, weighted):
+    catalogue = PreferenceCatalogue(enumerate_partial_preferences(4))
+    weights = np.arange(len(catalogue), dtype=float) if weighted else None
+    ids = catalogue.sample_ids(200, complete, weights, rng=np.random.default_rng(7))
+    assert (ids == catalogue.sample_ids(200, complete, weights, rng=np.random.default_rng(7))).all()
+    np.random.seed(7)
+    global_ids = catalogue.sample_ids(200, complete, weights)
+    np.random.seed(7)
+    assert (global_ids == catalogue.sample_ids(200, complete, weights)).all()
+    for sampled in [ids, global_ids]:
+        assert ((0 <= sampled) & (sampled < len(catalogue))).all()
+        if complete:
+            assert np.isin(sampled, catalogue.complete_ids).all()
+        if weighted:
+            assert 0 not in sampled  # the weight of the first preference is 0
+
+
+@pytest.mark.parametrize('complete, expected_ids, expected_masks', [
+    (False, [186, 139, 111, 59, 67, 8],
+     [(4, 5, 0, 7), (14, 0, 2, 6), (6, 0, 0, 0), (4, 0, 0, 5), (0, 0, 1, 2), (0, 4, 0, 4)]),
+    (True, [212, 186, 182, 141], [(0, 5, 1, 7), (4, 5, 0, 7), (12, 13, 8, 0), (6, 4, 0, 7)]),
+])
+def test_sampled_preferences_do_not_change(complete, expected_ids, expected_masks):
+    """
+    The datasets are stored as ids, so the ids and the preferences behind them must stay the same for a seed.
+    """
+    catalogue = PreferenceCatalogue(enumerate_partial_preferences(4))
+    ids = catalogue.sample_ids(len(expected_ids), complete, rng=np.random.default_rng(0))
+    assert ids.tolist() == expected_ids
+    assert [successor_masks(catalogue.matrices[i]) for i in ids] == expected_masks
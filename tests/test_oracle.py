@@ -0,0 +1,48 @@
+"""
+Tests of the manipulation oracle (main/oracle.py) against the A* search that it replaces.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from main.catalogue import get_catalogue
+from main.oracle import get_cell_costs, get_oracle, score_vector_indices
+from main.preference import Preference
+from main.search import ManipulationSearch, get_winning_scores
+
+
+def get_cost(preference: Preference, new_preference: Preference, flags: tuple) -> int:
+    upper_rows, upper_columns = np.triu_indices(len(preference), 1)
+    old_cells = preference.matrix[upper_rows, upper_columns].astype(np.int64) + 1
+    new_cells = new_preference.matrix[upper_rows, upper_columns].astype(np.int64) + 1
+    return int(get_cell_costs(*flags)[old_cells, new_cells].sum())
+
+
+@pytest.mark.parametrize('num_alt, k', [(3, 1), (3, 2), (4, 1), (4, 3), (5, 2)])
+@pytest.mark.parametrize('method', ['approval', 'veto'])
+@pytest.mark.parametrize('flags', [(True, True, True), (True, False, True), (False, True, False)])
+def test_oracle_agrees_with_astar(num_alt, k, method, flags):
+    catalogue = get_catalogue(num_alt)
+    oracle = get_oracle(num_alt, k, method, *flags)
+    rng = np.random.default_rng(num_alt * 10 + k)
+    random.seed(0)
+    for _ in range(30):
+        preference_id = int(rng.integers(len(catalogue)))
+        preference = catalogue.preference(preference_id)
+        scores_without_voter = rng.integers(0, 4, size=num_alt).tolist()
+        winning_scores = get_winning_scores(
+            scores_without_voter, int(rng.integers(num_alt)), {i: i for i in range(num_alt)}
+        )
+        result = ManipulationSearch(preference, winning_scores, k, method, *flags).run()
+        looked_up = oracle.cheapest_manipulations(preference_id, score_vector_indices(winning_scores))
+        if result is None:
+            assert looked_up is None
+            continue
+        cost, ids = looked_up
+        assert cost == result[0]
+        assert catalogue.preference_id(result[1]) in ids
+        for target in ids:
+            assert get_cost(preference, catalogue.preference(int(target)), flags) == cost
+            assert (winning_scores == catalogue.scores(method, k)[target]).all(axis=-1).any()
@@ -0,0 +1,87 @@
+"""
+Tests of the results store (main/results_store.py).
+"""
+
+import json
+import sqlite3
+
+import dill
+
+from main.results_store import KEY_COLUMNS, ResultsStore, load_total_result
+
+DEFAULT_KEY = (3, 10, 'ic', 0, 1, 'approval', 0, True, True, True, False)  # without the mode, as in the legacy dict
+RESULTS = {
+    DEFAULT_KEY: (True, {0: (1, 2), 1: (0, 4)}),
+    (3, 10, 'ic', 1, 1, 'approval', 0, True, True, True, False): (False, {}),
+    (4, 20, '2urn', 0, 2, 'veto', 3, False, True, True, True): 'hard_exit',
+}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    with ResultsStore(path, None) as store:
+        for key, result in RESULTS.items():
+            store[key] = result
+        store.put((4, 20, '2urn', 1, 2, 'veto', 0, True, True, True, True), (True, {}), {'moves': 0})
+    with ResultsStore(path, None) as store:
+        assert len(store) == 4
+        for key, result in RESULTS.items():
+            assert key in store
+            assert store[key] == result
+            assert store.get_metrics(key) is None
+        assert store.get_metrics((4, 20, '2urn', 1, 2, 'veto', 0, True, True, True, True)) == {'moves': 0}
+        assert store.get((5, 20, '2urn', 1, 2, 'veto', 0, True, True, True, True)) is None
+        frame = store.to_frame().set_index('profile')
+        assert frame.loc[0, 'hard_exit'].tolist() == [0, 1]
+        assert frame.loc[0, 'num_rounds'].tolist()[0] == 2
+        assert frame.loc[0, 'final_winner'].tolist()[0] == 0
+        store[DEFAULT_KEY] = 'hard_exit'  # replaces the result
+        assert store[DEFAULT_KEY] == 'hard_exit' and len(store) == 4
+
+
+def test_legacy_pickle_is_imported_into_a_new_store(tmp_path):
+    legacy_path = str(tmp_path / 'total_result.pkl')
+    with open(legacy_path, 'wb') as f:
+        dill.dump(RESULTS, f)
+    path = str(tmp_path / 'results.sqlite')
+    with ResultsStore(path, legacy_path) as store:
+        assert {key[:-1]: result for key, result in store.items()} == RESULTS
+        assert all(not key[-1] for key in store.keys())  # the legacy runs are of the default mode
+        store[DEFAULT_KEY] = 'hard_exit'
+    with ResultsStore(path, legacy_path) as store:  # an existing store is not filled again
+        assert store[DEFAULT_KEY] == 'hard_exit'
+    assert load_total_result(path)[DEFAULT_KEY + (False,)] == 'hard_exit'
+    with ResultsStore(path, None) as store:
+        store.export_pickle(str(tmp_path / 'exported.pkl'))
+    with ResultsStore(str(tmp_path / 'reimported.sqlite'), str(tmp_path / 'exported.pkl')) as store:
+        assert store.to_dict() == load_total_result(path)
+
+
+def test_the_mode_is_part_of_the_key(tmp_path):
+    with ResultsStore(str(tmp_path / 'results.sqlite'), None) as store:
+        store[DEFAULT_KEY] = (True, {0: (1, 2)})
+        store[DEFAULT_KEY + (True,)] = 'hard_exit'
+        assert len(store) == 2
+        assert store[DEFAULT_KEY] == store[DEFAULT_KEY + (False,)] == (True, {0: (1, 2)})
+        assert store[DEFAULT_KEY + (True,)] == 'hard_exit'
+        assert sorted(store.keys()) == [DEFAULT_KEY + (False,), DEFAULT_KEY + (True,)]
+
+
+def test_a_store_without_the_mode_gets_it(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    old_key_columns = KEY_COLUMNS[:-1]
+    connection = sqlite3.connect(path)
+    connection.execute(
+        f'CREATE TABLE results ({", ".join(old_key_columns)}, hard_exit INTEGER, convergence INTEGER, '
+        f'num_rounds INTEGER, result BLOB, final_winner INTEGER, metrics TEXT, '
+        f'PRIMARY KEY ({", ".join(old_key_columns)}))'
+    )
+    connection.execute('INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, 0, 0, ?, NULL, ?)',
+                       DEFAULT_KEY + (dill.dumps((False, {})), json.dumps({'moves': 0})))
+    connection.commit()
+    connection.close()
+    with ResultsStore(path, None) as store:
+        store[DEFAULT_KEY + (True,)] = (True, {})
+        assert store[DEFAULT_KEY] == (False, {})
+        assert store.get_metrics(DEFAULT_KEY + (False,)) == {'moves': 0}
+        assert len(store) == 2
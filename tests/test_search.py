@@ -0,0 +1,97 @@
+"""
+Tests of the A* search for the cheapest manipulation (main/search.py).
+"""
+
+import contextlib
+import io
+import random
+
+import numpy as np
+import pytest
+
+from main.catalogue import get_catalogue
+from main.data_processing import evaluate_profile
+from main.manipulation import Manipulation
+from main.oracle import IMPOSSIBLE, get_cell_costs
+from main.preference import Preference
+from main.search import ManipulationSearch, get_winning_scores
+
+FLAGS = [(True, True, True), (True, True, False), (False, True, True), (True, False, True)]
+
+
+def get_cost(preference: Preference, new_preference: Preference, flags: tuple = (True, True, True)) -> int:
+    """
+    The cost of changing the preference into the new one (IMPOSSIBLE or more if the flags do not allow it).
+    """
+    upper_rows, upper_columns = np.triu_indices(len(preference), 1)
+    old_cells = preference.matrix[upper_rows, upper_columns].astype(np.int64) + 1
+    new_cells = new_preference.matrix[upper_rows, upper_columns].astype(np.int64) + 1
+    return int(get_cell_costs(*flags)[old_cells, new_cells].sum())
+
+
+def brute_force_cost(preference: Preference, winning_scores: np.ndarray, k: int, method: str, flags: tuple):
+    """
+    The cost of the cheapest manipulation over all the preferences of the catalogue, or None if there is none.
+    """
+    catalogue = get_catalogue(len(preference))
+    winning = (catalogue.scores(method, k)[:, None, :] == winning_scores[None, :, :]).all(axis=-1).any(axis=-1)
+    costs = [get_cost(preference, catalogue.preference(i), flags) for i in np.flatnonzero(winning)]
+    costs = [cost for cost in costs if cost < IMPOSSIBLE]
+    return min(costs) if costs else None
+
+
+@pytest.mark.parametrize('num_alt', [3, 4])
+@pytest.mark.parametrize('method', ['approval', 'veto'])
+@pytest.mark.parametrize('flags', FLAGS)
+def test_astar_finds_the_cheapest_manipulation(num_alt, method, flags):
+    catalogue = get_catalogue(num_alt)
+    rng = np.random.default_rng(num_alt)
+    random.seed(0)
+    for _ in range(40):
+        preference = catalogue.preference(int(rng.integers(len(catalogue))))
+        k = int(rng.integers(1, num_alt))
+        scores_without_voter = rng.integers(0, 4, size=num_alt).tolist()
+        p = int(rng.integers(num_alt))
+        winning_scores = get_winning_scores(scores_without_voter, p, {i: i for i in range(num_alt)})
+        result = ManipulationSearch(preference, winning_scores, k, method, *flags).run()
+        expected = brute_force_cost(preference, winning_scores, k, method, flags)
+        if expected is None:
+            assert result is None
+            continue
+        cost, new_preference = result
+        assert cost == expected
+        assert new_preference.is_transitive
+        assert get_cost(preference, new_preference, flags) == cost
+        new_scores = catalogue.scores(method, k)[catalogue.preference_id(new_preference)]
+        assert (winning_scores == new_scores).all(axis=-1).any()
+
+
+def test_astar_search_is_never_more_expensive_than_the_level_search():
+    catalogue = get_catalogue(3)
+    rng = np.random.default_rng(0)
+    order = {i: i for i in range(3)}
+    compared = 0
+    for _ in range(10):
+        preferences = [catalogue.preference(int(i)) for i in catalogue.sample_ids(5, rng=rng)]
+        for method, k in [('approval', 1), ('veto', 1), ('approval', 2), ('veto', 2)]:
+            winner, possible_winners, scores = evaluate_profile(preferences, k, method, order)
+            for voter in range(len(preferences)):
+                for p in possible_winners:
+                    if p == winner or preferences[voter][p, winner] != 1:
+                        continue
+                    found = {}
+                    for search in ['levels', 'astar']:
+                        manipulation = Manipulation(
+                            preferences, voter, preferences, winner, possible_winners, scores, order, method, k,
+                            True, True, True, False, 600, search=search, use_oracle=False
+                        )
+                        random.seed(0)
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            all_prefs, manipulation_happened, hard_exit = manipulation.tree_generation(p, [])
+                        assert not hard_exit
+                        if manipulation_happened:
+                            found[search] = get_cost(preferences[voter], all_prefs[voter])
+                    if 'levels' in found:
+                        assert 'astar' in found and found['astar'] <= found['levels']
+                        compared += 1
+    assert compared
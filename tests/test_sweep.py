@@ -0,0 +1,30 @@
+"""
+Tests of the parsing of the grid of sweep.py.
+"""
+
+import pytest
+
+from sweep import get_grid_cells, resolve_k
+
+
+@pytest.mark.parametrize('k, num_alt, expected', [
+    (2, 5, 2),
+    ('3', 5, 3),
+    ('m', 5, 5),
+    ('m-1', 5, 4),
+    ('m - 2', 5, 3),
+    ('m+1', 5, 6),
+    ('m + 1', 4, 5),
+])
+def test_resolve_k(k, num_alt, expected):
+    assert resolve_k(k, num_alt) == expected
+
+
+def test_resolve_k_rejects_other_expressions():
+    with pytest.raises(ValueError):
+        resolve_k('m*2', 5)
+
+
+def test_grid_skips_k_above_the_number_of_alternatives():
+    cells = get_grid_cells({'num_alt': [3, 4], 'k': ['m-1', 'm+1']})
+    assert [(cell.num_alt, cell.k) for cell in cells] == [(3, 2), (4, 3)]
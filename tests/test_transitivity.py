@@ -0,0 +1,86 @@
+"""
+Tests of the bitset transitivity kernels (main/transitivity.py) against the DataFrame-based reference check.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.reference import check_transitivity as reference_check_transitivity
+from main.data_processing import check_transitivity
+from main.preference import Preference
+from main.transitivity import check_transitivity_batch, is_transitive_masks, repair_transitivity, successor_masks, \
+    transitive_closure
+
+NUM_ALTERNATIVES = [3, 4, 6, 9, 17, 40, 64]
+MAX_ALTERNATIVES_OF_REFERENCE = 17  # the DataFrame check is too slow for more
+
+
+def get_closure(strict: np.ndarray) -> np.ndarray:
+    """
+    The transitive closure of a boolean relation, by repeated squaring of its matrix.
+    """
+    closure = strict.copy()
+    while True:
+        new_closure = closure | ((closure.astype(np.int64) @ closure.astype(np.int64)) > 0)
+        if (new_closure == closure).all():
+            return closure
+        closure = new_closure
+
+
+def to_matrix(strict: np.ndarray) -> np.ndarray:
+    return strict.astype(np.int8) - strict.T.astype(np.int8)
+
+
+def random_matrices(num_alt: int, size: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Random antisymmetric {-1, 0, 1} matrices: transitive ones (the closures of random relations that agree with a random
+    ranking), the same with one random cell changed (which mostly breaks the transitivity) and uniformly random ones.
+    """
+    matrices = []
+    for i in range(size):
+        ranking = rng.permutation(num_alt)
+        position = np.empty(num_alt, dtype=np.int64)
+        position[ranking] = np.arange(num_alt)
+        density = rng.uniform(0.02, 0.5)
+        strict = (position[:, None] < position[None, :]) & (rng.random((num_alt, num_alt)) < density)
+        matrix = to_matrix(get_closure(strict))
+        if i % 3 == 1:
+            row, col = rng.choice(num_alt, size=2, replace=False)
+            matrix[row, col] = rng.integers(-1, 2)
+            matrix[col, row] = -matrix[row, col]
+        elif i % 3 == 2:
+            upper = np.triu(rng.integers(-1, 2, size=(num_alt, num_alt)), 1).astype(np.int8)
+            matrix = upper - upper.T
+        matrices.append(matrix)
+    return np.stack(matrices)
+
+
+def is_transitive(matrix: np.ndarray) -> bool:
+    strict = matrix == 1
+    return not ((strict.astype(np.int64) @ strict.astype(np.int64) > 0) & ~strict).any()
+
+
+@pytest.mark.parametrize('num_alt', NUM_ALTERNATIVES)
+def test_transitivity_checks_agree(num_alt):
+    matrices = random_matrices(num_alt, 30, np.random.default_rng(num_alt))
+    expected = [is_transitive(matrix) for matrix in matrices]
+    assert any(expected) and not all(expected)
+    if num_alt <= MAX_ALTERNATIVES_OF_REFERENCE:
+        assert [reference_check_transitivity(pd.DataFrame(matrix)) for matrix in matrices] == expected
+    assert check_transitivity_batch(matrices).tolist() == expected
+    assert [check_transitivity(Preference(matrix)) for matrix in matrices] == expected
+    assert [is_transitive_masks(successor_masks(matrix)) for matrix in matrices] == expected
+
+
+@pytest.mark.parametrize('num_alt', NUM_ALTERNATIVES)
+def test_closure_and_repair(num_alt):
+    for matrix in random_matrices(num_alt, 30, np.random.default_rng(num_alt + 1)):
+        closure = get_closure(matrix == 1)
+        assert transitive_closure(successor_masks(matrix)) == successor_masks(closure.astype(np.int8))
+        repaired = repair_transitivity(matrix)
+        if closure.diagonal().any():  # the strict preferences form a cycle
+            assert repaired is None
+        else:
+            assert (repaired == to_matrix(closure)).all()
+            assert is_transitive(repaired)